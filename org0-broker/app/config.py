@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import json
 import os
 from pathlib import Path
@@ -15,19 +16,28 @@ def _read_card(path: Path) -> Optional[dict]:
     return None
 
 
+# Each org's directory in this monorepo, for its cards/agent.json
+ORG_DIRS = {"org1": "org1-companyA-maylim", "org2": "org2-companyB-kumar"}
+
+
+@functools.lru_cache(maxsize=None)
+def local_card(org: str) -> Optional[dict]:
+    """``org``'s card from the monorepo, read once; None when the file is missing or unreadable."""
+    return _read_card(Path(__file__).resolve().parents[2] / ORG_DIRS[org] / "cards" / "agent.json")
+
+
+@functools.lru_cache(maxsize=1)
 def resolve_org_urls() -> Tuple[str, str]:
+    """Org base URLs from ORG1_URL/ORG2_URL, else the monorepo agent cards; resolved once, on first use."""
     org1_env = os.getenv("ORG1_URL")
     org2_env = os.getenv("ORG2_URL")
     if org1_env and org2_env:
         return org1_env, org2_env
 
     # Try resolve from agent cards within monorepo
-    root = Path(__file__).resolve().parents[2]
-    org1_card = _read_card(root / "org1-companyA-maylim" / "cards" / "agent.json")
-    org2_card = _read_card(root / "org2-companyB-kumar" / "cards" / "agent.json")
+    org1_card = local_card("org1")
+    org2_card = local_card("org2")
 
     org1_url = org1_env or (org1_card.get("endpoint") if org1_card else None) or "http://127.0.0.1:8101"
     org2_url = org2_env or (org2_card.get("endpoint") if org2_card else None) or "http://127.0.0.1:8102"
     return org1_url, org2_url
-
-
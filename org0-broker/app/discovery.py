@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from app.config import local_card, resolve_org_urls
+from a2a_common.wire import JSON_MEDIA, MSGPACK_MEDIA, msgpack_available
+
+
+logger = logging.getLogger("org0-broker")
+
+# ORG_WIRE_FORMAT: "auto" (default) sends msgpack to an org whose card offers it (and JSON otherwise);
+#   "json" always sends JSON, "msgpack" is the same as "auto".
+# ORG_STREAMING=1: use an org's SSE turn endpoint when its card offers it.
+# ORG_CARD_TIMEOUT_S: timeout of one card fetch.
+# ORG_CARD_MAX_AGE_S: how long a card is reused when its response carries no Cache-Control max-age.
+ORG_WIRE_FORMAT = os.getenv("ORG_WIRE_FORMAT", "auto").lower()
+ORG_STREAMING = os.getenv("ORG_STREAMING", "0") == "1"
+CARD_TIMEOUT_S = float(os.getenv("ORG_CARD_TIMEOUT_S", "3"))
+CARD_MAX_AGE_S = float(os.getenv("ORG_CARD_MAX_AGE_S", "60"))
+
+CARD_PATH = "/.well-known/agent.json"
+PROTOCOL = "a2a-http"
+# What each side's card must list before the broker sends it a task
+REQUIRED_CAPABILITIES = {
+    "org1": ("negotiate_price", "inventory_lookup"),
+    "org2": ("negotiate_price", "pricing_lookup"),
+}
+# Assumed for a card without ``features``: an org server from before the well-known endpoint
+BASELINE_FEATURES = {"wire_formats": [JSON_MEDIA], "streaming": False, "line_items": False}
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class IncompatibleOrg(Exception):
+    """An org's card lacks a required capability or speaks another protocol."""
+
+
+class OrgLink:
+    """One org's checked card and the protocol features the broker uses with it."""
+
+    __slots__ = ("org", "base_url", "card", "etag", "source", "problems", "wire_format", "streaming", "line_items", "checked_at", "max_age_s")
+
+    def __init__(self, org: str, base_url: str, card: Dict[str, Any], etag: Optional[str], source: str, max_age_s: float):
+        self.org = org
+        self.base_url = base_url
+        self.card = card
+        self.etag = etag
+        # "well-known" (fetched from the org), "local" (monorepo file) or "none"
+        self.source = source
+        self.max_age_s = max_age_s
+        self.checked_at = time.monotonic()
+
+        features = card.get("features") or BASELINE_FEATURES
+        self.problems: List[str] = []
+        if card.get("protocol") != PROTOCOL:
+            self.problems.append(f"protocol {card.get('protocol')!r} is not {PROTOCOL!r}")
+        missing = [c for c in REQUIRED_CAPABILITIES[org] if c not in (card.get("capabilities") or [])]
+        if missing:
+            self.problems.append(f"missing capabilities {', '.join(missing)}")
+        # Fastest features both sides have
+        msgpack_ok = MSGPACK_MEDIA in (features.get("wire_formats") or []) and msgpack_available()
+        self.wire_format = "msgpack" if msgpack_ok and ORG_WIRE_FORMAT != "json" else "json"
+        self.streaming = ORG_STREAMING and bool(features.get("streaming"))
+        self.line_items = bool(features.get("line_items"))
+
+    def fresh(self, base_url: str, now: float) -> bool:
+        return self.base_url == base_url and now - self.checked_at < self.max_age_s
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "org": self.org,
+            "base_url": self.base_url,
+            "id": self.card.get("id"),
+            "source": self.source,
+            "etag": self.etag,
+            "ok": not self.problems,
+            "problems": self.problems,
+            "wire_format": self.wire_format,
+            "streaming": self.streaming,
+            "line_items": self.line_items,
+            "checked_s_ago": round(time.monotonic() - self.checked_at, 1),
+            "max_age_s": self.max_age_s,
+        }
+
+
+def _max_age(res: httpx.Response) -> float:
+    match = _MAX_AGE_RE.search(res.headers.get("cache-control") or "")
+    return float(match.group(1)) if match else CARD_MAX_AGE_S
+
+
+class OrgDirectory:
+    """Both orgs' cards, checked once and reused by every session until they go stale.
+
+    A stale card is revalidated with If-None-Match, so an unchanged one costs a 304 with no
+    body. An org without the well-known endpoint is checked against its monorepo card with
+    baseline features (JSON, blocking turns); an unreachable one is retried by the next
+    session instead of being cached.
+    """
+
+    def __init__(self):
+        self._links: Dict[str, OrgLink] = {}
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self, client: httpx.AsyncClient, org: str, base_url: str) -> Optional[OrgLink]:
+        old = self._links.get(org)
+        headers = {"Accept": JSON_MEDIA}
+        if old is not None and old.etag and old.base_url == base_url:
+            headers["If-None-Match"] = old.etag
+        try:
+            res = await client.get(f"{base_url}{CARD_PATH}", headers=headers, timeout=CARD_TIMEOUT_S)
+            if res.status_code == 304 and "If-None-Match" in headers:
+                old.checked_at = time.monotonic()
+                old.max_age_s = _max_age(res)
+                return old
+            if res.status_code == 404:
+                link = OrgLink(org, base_url, local_card(org) or {}, None, "local", CARD_MAX_AGE_S)
+            else:
+                res.raise_for_status()
+                link = OrgLink(org, base_url, res.json(), res.headers.get("etag"), "well-known", _max_age(res))
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("org_card_unavailable org=%s url=%s error=%s", org, base_url, e)
+            return None
+        log = logger.error if link.problems else logger.info
+        log(
+            "org_card org=%s source=%s wire=%s streaming=%s line_items=%s problems=%s",
+            org, link.source, link.wire_format, link.streaming, link.line_items, link.problems,
+        )
+        return link
+
+    async def connect(self, client: httpx.AsyncClient) -> Dict[str, OrgLink]:
+        """Links to both orgs; fresh ones come from the cache, with no request at all.
+
+        Raises ``IncompatibleOrg`` when a card fails its checks.
+        """
+        urls = dict(zip(("org1", "org2"), resolve_org_urls()))
+        now = time.monotonic()
+        if any(org not in self._links or not self._links[org].fresh(url, now) for org, url in urls.items()):
+            async with self._lock:
+                now = time.monotonic()
+                stale = [org for org, url in urls.items() if org not in self._links or not self._links[org].fresh(url, now)]
+                for org, link in zip(stale, await asyncio.gather(*(self._fetch(client, org, urls[org]) for org in stale))):
+                    if link is not None:
+                        self._links[org] = link
+        links = {}
+        for org, url in urls.items():
+            link = self._links.get(org)
+            if link is None or link.base_url != url:
+                # Unreachable and never seen: let the session's first request report the error
+                link = OrgLink(org, url, local_card(org) or {}, None, "none", 0.0)
+            if link.problems and link.source != "none":
+                raise IncompatibleOrg(f"{org} at {url}: {'; '.join(link.problems)}")
+            links[org] = link
+        return links
+
+    def refusal(self, line_items: bool) -> Optional[str]:
+        """Why a session would be refused, judging by the cards already checked; None if it would not."""
+        for org, link in self._links.items():
+            if link.problems:
+                return f"{org} at {link.base_url}: {'; '.join(link.problems)}"
+            if line_items and not link.line_items:
+                return f"{org} at {link.base_url} does not support multi-line orders"
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {org: link.to_dict() for org, link in sorted(self._links.items())}
+
+    async def discover(self) -> None:
+        """Startup hook: check both cards so the first session finds them cached; failures are only logged."""
+        try:
+            async with httpx.AsyncClient() as client:
+                await self.connect(client)
+        except Exception:
+            logger.warning("org_discovery_failed", exc_info=True)
@@ -4,12 +4,13 @@ import json
 import os
 from typing import Any, Dict, List
 
-from groq import Groq
+from a2a_common.llm_cassette import CassetteMiss, replaying
+from a2a_common.rate_limit import RateLimitTimeout, deal_priority, get_client, limited_completion
 
 
 def conclude_with_groq(transcript: List[Dict[str, Any]], artifact: Dict[str, Any] | None) -> Dict[str, str]:
     api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
+    if not api_key and not replaying():
         # Fallback conclusion
         return {
             "content": "Broker conclusion: agreement reached, proceed with paperwork.",
@@ -21,7 +22,7 @@ def conclude_with_groq(transcript: List[Dict[str, Any]], artifact: Dict[str, Any
     temperature = float(os.getenv("GROQ_TEMPERATURE", "0.3"))
     max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512"))
 
-    client = Groq(api_key=api_key)
+    client = get_client("GROQ_API_KEY")
 
     sys = (
         "You are the broker. Summarize if the negotiation concluded with a valid agreement (price & quantity present). "
@@ -31,15 +32,32 @@ def conclude_with_groq(transcript: List[Dict[str, Any]], artifact: Dict[str, Any
 
     usr = json.dumps({"transcript": transcript, "artifact": artifact}, ensure_ascii=False)
 
-    res = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": sys},
-            {"role": "user", "content": usr},
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens,
+    # Conclusions close a deal, so they outrank any in-flight turn of the same value
+    priority = deal_priority(
+        int((artifact or {}).get("data", {}).get("quantity") or 0),
+        (artifact or {}).get("data", {}).get("unit_price"),
+        1,
+        1,
     )
+    try:
+        res = limited_completion(
+            client,
+            "GROQ_API_KEY",
+            priority,
+            model=model,
+            messages=[
+                {"role": "system", "content": sys},
+                {"role": "user", "content": usr},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    except (RateLimitTimeout, CassetteMiss):
+        return {
+            "content": "Broker conclusion: agreement reached, proceed with paperwork.",
+            "rationale": "LLM unavailable; default conclusion used.",
+            "transcript_response": "Okay team, we proceed with PO and invoice, can?",
+        }
     content = res.choices[0].message.content or "{}"
     try:
         obj = json.loads(content)
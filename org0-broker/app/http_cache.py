@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import gzip
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+
+# Bodies smaller than this are sent as-is; compression overhead outweighs the savings
+MIN_COMPRESS_BYTES = 512
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag`` (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+    return weights
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Best content-coding the client accepts: ``br`` (if brotli is installed), ``gzip`` or ``identity``."""
+    weights = _accepted(accept_encoding or "")
+    offered = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = "identity", 0.0
+    for name in offered:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> Tuple[bytes, str]:
+    """``(body, encoding)`` after applying ``encoding``; small bodies stay ``identity``."""
+    if encoding == "identity" or len(body) < MIN_COMPRESS_BYTES:
+        return body, "identity"
+    if encoding == "br":
+        return brotli.compress(body, quality=5), "br"
+    # Low level keeps CPU per turn small; transcripts are repetitive text and compress well anyway
+    return gzip.compress(body, compresslevel=5, mtime=0), "gzip"
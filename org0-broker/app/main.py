@@ -1,21 +1,49 @@
 from __future__ import annotations
 
+import asyncio
+import itertools
+import math
 import os
-import logging
-import re
 import time
-from typing import Any, Dict, List, Optional
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
-from app.state.store import save_artifact, save_transcript
-from app.remote import RemoteA2aAgent
+from app.state.store import (
+    append_narrative_patch,
+    append_transcript_journal,
+    load_checkpoint,
+    load_transcript_journal,
+    save_artifact,
+    save_checkpoint,
+    save_transcript,
+    truncate_transcript_journal,
+    update_checkpoint_status,
+)
+from app.state.analytics import Analytics
+from app.state.export import export_stream, parse_time, session_time
+from app.state.price_index import PriceIndex
+from app.negotiation import FAILED, LineItemEngine, NegotiationEngine, Side
+from app.discovery import IncompatibleOrg, OrgDirectory
+from app.remote import OrgBusy, RemoteA2aAgent
+from app.scheduler import DEFAULT_DEADLINE_S, DeadlineExpired, Overloaded, SessionScheduler, session_priority
 from app.groq_conclude import conclude_with_groq
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.schemas import Part, Message, Task, Artifact, Transcript
+from fastapi.responses import StreamingResponse
+from app.schemas import LINE_ITEM, Part, Message, Task, Artifact, TaskOutcome, TranscriptRecord
+from a2a_common.wire import FastJSONResponse, dumps_json
+from app.http_cache import compress, etag_matches, negotiate_encoding
+from a2a_common.llm_cassette import cassette_mode
+from a2a_common.log_setup import setup_logging
+from a2a_common.profiling import PROFILING, install_profiling
+from a2a_common.rate_limit import get_client
+from a2a_common.warmup import prewarm
+from pydantic import BaseModel
 
 
-app = FastAPI(title="A2A Broker (org0)")
+app = FastAPI(title="A2A Broker (org0)", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,20 +55,47 @@ app.add_middleware(
 
 
 STATE: Dict[str, Any] = {
+    # Latest session; what /api/transcript shows when no session_id is given
     "session_id": None,
-    "status": "idle",
-    "transcript": [],
-    "artifact": None,
+    # session_id -> {"session_id", "status", "transcript", "artifact"}
+    "sessions": {},
+    "backpressure": {"org1": {}, "org2": {}},
 }
+MAX_SESSIONS = int(os.getenv("BROKER_MAX_SESSIONS", "1000"))
+# Sessions that have not finished yet; never evicted from STATE["sessions"]
+LIVE_STATUSES = ("queued", "running")
+# Global so a session id reused by /api/resume never repeats an old ETag
+_VERSIONS = itertools.count(1)
 
 # Logger
-logger = logging.getLogger("org0-broker")
-if not logger.handlers:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [org0] %(message)s")
+logger = setup_logging("org0-broker", tag="org0")
 
 
 from app.config import resolve_org_urls
-ORG1_URL, ORG2_URL = resolve_org_urls()
+# Org cards, checked at startup and reused by every session until stale
+ORG_LINKS = OrgDirectory()
+# Loaded by the warm-up below or on first use, so importing the broker reads no history
+PRICE_INDEX = PriceIndex()
+ANALYTICS = Analytics()
+# Bounded pool of negotiation workers; /api/start and /api/resume queue here by priority
+SCHEDULER = SessionScheduler()
+app.router.on_shutdown.append(ANALYTICS.save)
+app.router.on_shutdown.append(PRICE_INDEX.save)
+# Read the agent cards, build the Groq client and load the price index and analytics before the first request needs them
+app.router.on_startup.append(prewarm(
+    ("org_urls", resolve_org_urls),
+    ("llm_client", lambda: get_client("GROQ_API_KEY")),
+    ("price_index", PRICE_INDEX.load),
+    ("analytics", ANALYTICS.load),
+))
+app.router.on_startup.append(ORG_LINKS.discover)
+# Debug only: ?profile=1 / X-Profile: 1 on any request, GET /debug/profile and GET /debug/memory
+if PROFILING:
+    install_profiling(app, {
+        "sessions": lambda: len(STATE["sessions"]),
+        "transcript_entries": lambda: sum(len(s["transcript"]) for s in list(STATE["sessions"].values())),
+        "scheduler_queue": lambda: SCHEDULER.snapshot()["queue_depth"],
+    })
 
 
 @app.get("/")
@@ -48,50 +103,201 @@ def root():
     return {"ok": True, "service": "org0-broker"}
 
 
+class LineRequest(BaseModel):
+    sku: str
+    quantity: int
+    target_price: float
+
+
+class StartRequest(BaseModel):
+    sku: str = "MACBOOK-PRO-14"
+    quantity: int = 20
+    target_price: float = 1789.0
+    turn_limit: int = 7
+    # Share past agreed prices for the SKU with both agents via Task.context
+    use_price_history: bool = True
+    # Seconds the negotiation may wait for a worker before it is dropped (default SCHED_DEFAULT_DEADLINE_S)
+    deadline_s: Optional[float] = None
+    # Times this request was already refused with 429; each one moves it up the queue
+    attempt: int = 0
+    # Several SKUs in one task, each line negotiated on its own; replaces sku/quantity/target_price
+    lines: List[LineRequest] = []
+
+
+def new_session(session_id: str, status: str = "running") -> Dict[str, Any]:
+    """Register a live session, evicting the oldest finished ones past BROKER_MAX_SESSIONS."""
+    sessions = STATE["sessions"]
+    sess = {
+        "session_id": session_id,
+        "status": status,
+        "transcript": [],
+        "artifact": None,
+        # Bumped on every visible change; drives the transcript ETag and render cache
+        "version": next(_VERSIONS),
+        "rendered": {},
+    }
+    sessions[session_id] = sess
+    STATE["session_id"] = session_id
+    if len(sessions) > MAX_SESSIONS:
+        for sid in [sid for sid, s in sessions.items() if s["status"] not in LIVE_STATUSES][: len(sessions) - MAX_SESSIONS]:
+            del sessions[sid]
+    return sess
+
+
+def touch(sess: Dict[str, Any]) -> None:
+    sess["version"] = next(_VERSIONS)
+
+
+def append_entry(sess: Dict[str, Any], record: TranscriptRecord) -> None:
+    sess["transcript"].append(record)
+    touch(sess)
+
+
+def set_status(sess: Dict[str, Any], status: str) -> None:
+    sess["status"] = status
+    touch(sess)
+
+
 @app.post("/api/reset")
 def reset():
     STATE["session_id"] = None
-    STATE["status"] = "idle"
-    STATE["transcript"] = []
-    STATE["artifact"] = None
+    for sid in [sid for sid, s in STATE["sessions"].items() if s["status"] not in LIVE_STATUSES]:
+        del STATE["sessions"][sid]
     return {"ok": True}
 
 
-@app.get("/api/transcript")
-def get_transcript():
-    return Transcript(
-        session_id=STATE["session_id"],
-        status=STATE["status"],
-        transcript=list(STATE["transcript"]),
-        artifact=STATE["artifact"],
-    )
-
+@app.get("/api/price-index")
+def get_price_index(sku: Optional[str] = None):
+    """Agreed-price summary per SKU (count, mean, last, min/max, p25/p50/p75)."""
+    if sku:
+        return {sku: PRICE_INDEX.summary(sku)}
+    return {name: PRICE_INDEX.summary(name) for name in PRICE_INDEX.names()}
 
-def extract_price(text: str) -> Optional[float]:
-    match = re.search(r"(\$|USD\s*)?(\d{3,5})(?:\.(\d{2}))?", text)
-    if not match:
-        return None
-    dollars = float(match.group(2))
-    cents = match.group(3)
-    if cents:
-        return float(f"{int(dollars)}.{cents}")
-    return float(dollars)
 
+@app.get("/api/analytics")
+def get_analytics(
+    group_by: str = Query("sku", pattern="^(total|sku|day|sku_day)$"),
+    sku: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """Agreement rate, average discount from the opening quote, turns to close, org latency and
+    LLM calls, grouped by SKU and/or UTC day.
 
-def build_history_summary(max_items: int = 4) -> str:
+    Served from rollups updated as each session closes, so cost does not depend on how many
+    sessions exist. ``since``/``until`` take ISO dates or epoch seconds (``until`` exclusive).
+    """
     try:
-        import json as _json
-        tail = STATE["transcript"][-max_items:]
-        compact: List[Dict[str, Any]] = []
-        for m in tail:
-            compact.append({
-                "role": getattr(m, "role", ""),
-                "content": getattr(m, "content", ""),
-                "rationale": getattr(m, "rationale", ""),
-            })
-        return _json.dumps(compact, ensure_ascii=False)
-    except Exception:
-        return "[]"
+        days = [
+            datetime.fromtimestamp(ts, tz=timezone.utc).date().isoformat() if ts is not None else None
+            for ts in (parse_time(since), parse_time(until))
+        ]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="since/until must be ISO dates or epoch seconds")
+    return ANALYTICS.query(group_by, sku, *days)
+
+
+@app.post("/api/analytics/rebuild")
+def rebuild_analytics():
+    """Recompute the rollups from every saved session (e.g. after restoring or compacting history)."""
+    sessions, elapsed = ANALYTICS.rebuild()
+    logger.info("analytics_rebuilt sessions=%s elapsed_s=%.2f", sessions, elapsed)
+    return {"ok": True, "sessions": sessions, "elapsed_s": round(elapsed, 3)}
+
+
+@app.get("/api/export")
+def export_sessions(
+    kind: str = Query("sessions", pattern="^(sessions|messages)$"),
+    format: str = Query("jsonl", pattern="^(jsonl|csv)$"),
+    compression: str = Query("gzip", pattern="^(gzip|none)$"),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    sku: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(agreed|no_deal|error)$"),
+    artifact_type: Optional[str] = None,
+):
+    """Stream persisted sessions (one row each) or transcript messages as JSONL/CSV, gzipped by default.
+
+    Reads compacted segments and per-session files lazily, so memory stays flat however
+    many sessions match. ``since``/``until`` take ISO dates or epoch seconds (``until`` is exclusive).
+    """
+    try:
+        window = {"since": parse_time(since), "until": parse_time(until)}
+    except ValueError:
+        raise HTTPException(status_code=422, detail="since/until must be ISO dates or epoch seconds")
+    body = export_stream(kind, format, compression, sku=sku, status=status, artifact_type=artifact_type, **window)
+    filename = f"{kind}-export.{format}" + (".gz" if compression == "gzip" else "")
+    media = "application/gzip" if compression == "gzip" else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(body, media_type=media, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.get("/api/backpressure")
+def get_backpressure():
+    """Latest LLM quota snapshot reported by each org server (queue depth, remaining budget)."""
+    return STATE["backpressure"]
+
+
+@app.get("/api/orgs")
+def get_orgs():
+    """Each org's checked card: where it came from, any failed checks and the wire format and features in use."""
+    return ORG_LINKS.snapshot()
+
+
+@app.get("/api/scheduler")
+def get_scheduler():
+    """Workers in use, queue depth, queue wait percentiles, admission counters and the head of the queue."""
+    return SCHEDULER.snapshot()
+
+
+def render_transcript(sess: Dict[str, Any], offset: int, limit: Optional[int], encoding: str) -> Tuple[bytes, str]:
+    """Encoded (and compressed) transcript page, cached until the session version changes."""
+    cache = sess["rendered"]
+    if cache.get("version") != sess["version"] or len(cache) > 16:
+        cache.clear()
+        cache["version"] = sess["version"]
+    key = (offset, limit, encoding)
+    if key not in cache:
+        entries = sess["transcript"]
+        end = len(entries) if limit is None else min(offset + limit, len(entries))
+        body = dumps_json({
+            "session_id": sess["session_id"],
+            "status": sess["status"],
+            "transcript": [m.to_dict() for m in entries[offset:end]],
+            "artifact": sess["artifact"].model_dump() if sess["artifact"] else None,
+            "offset": offset,
+            "total": len(entries),
+            "next_offset": end if end < len(entries) else None,
+        })
+        cache[key] = compress(body, encoding)
+    return cache[key]
+
+
+@app.get("/api/transcript")
+async def get_transcript(
+    request: Request,
+    session_id: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """Transcript of one session (latest by default), paged with ``offset``/``limit``.
+
+    The ETag changes only when the session does, so pollers sending If-None-Match get an
+    empty 304 between turns. Bodies are gzip/brotli compressed per Accept-Encoding.
+    """
+    sess = STATE["sessions"].get(session_id or STATE["session_id"] or "")
+    if sess is None:
+        if session_id:
+            raise HTTPException(status_code=404, detail="unknown session")
+        return {"session_id": None, "status": "idle", "transcript": [], "artifact": None, "offset": 0, "total": 0, "next_offset": None}
+
+    etag = f'W/"{sess["version"]}-{offset}-{limit or 0}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body, encoding = render_transcript(sess, offset, limit, negotiate_encoding(request.headers.get("accept-encoding")))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 async def org_call_create_task(client: httpx.AsyncClient, base_url: str, task: Task) -> str:
@@ -109,262 +315,459 @@ async def org_call_message(client: httpx.AsyncClient, base_url: str, task_id: st
     return res.json()
 
 
+async def send_turn(
+    sess: Dict[str, Any],
+    client: httpx.AsyncClient,
+    agent: RemoteA2aAgent,
+    task_id: str,
+    message: Message,
+    pending: List["asyncio.Task[None]"],
+    message_id: Optional[str] = None,
+) -> Tuple[Dict[str, Any], TranscriptRecord]:
+    """Send one turn to an org and return its payload and the reply as a transcript record.
+
+    With ORG_STREAMING=1 (and an org that offers it) this returns as soon as the org has parsed action/price; the
+    rationale and transcript_response are patched into the reply by a task in ``pending``.
+    """
+    # Multi-line turns carry their prices in parts, which only the blocking endpoint answers
+    if agent.streaming and not message.parts:
+        try:
+            payload, narrative = await agent.send_message_streaming(client, task_id, message, message_id)
+        except OrgBusy:
+            # Quota exhausted: the blocking endpoint knows how to wait and retry
+            pass
+        else:
+            reply = TranscriptRecord.from_message(Message(**payload["reply"]))
+
+            async def patch_narrative() -> None:
+                data = await narrative
+                reply.rationale = str(data.get("rationale") or "")
+                reply.transcript_response = str(data.get("transcript_response") or "")
+                touch(sess)
+                # Rounds are journaled without waiting for narratives; a late one is journaled as a patch
+                transcript = sess["transcript"]
+                index = next((i for i in range(len(transcript) - 1, -1, -1) if transcript[i] is reply), None)
+                if index is not None and index < sess.get("journaled", 0):
+                    try:
+                        append_narrative_patch(sess["session_id"], index, reply)
+                    except Exception:
+                        logger.exception("narrative_patch_failed session=%s", sess["session_id"])
+
+            pending.append(asyncio.create_task(patch_narrative()))
+            return payload, reply
+
+    payload = await agent.send_message(client, task_id, message, message_id)
+    return payload, TranscriptRecord.from_message(Message(**payload["reply"]))
+
+
+async def drain_narratives(pending: List["asyncio.Task[None]"]) -> None:
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        pending.clear()
+
+
+async def send_outcome(client: httpx.AsyncClient, agent: RemoteA2aAgent, task_id: str, outcome: TaskOutcome) -> bool:
+    """Report ``outcome`` to one org; False only when the org refused it."""
+    try:
+        result = await agent.report_outcome(client, task_id, outcome)
+    except Exception as e:
+        # The org's reservation TTL releases the stock eventually
+        logger.warning("outcome_failed url=%s task=%s error=%s", agent.base_url, task_id, e)
+        return True
+    if not result.get("ok", True):
+        logger.warning("outcome_refused url=%s task=%s reason=%s", agent.base_url, task_id, result.get("reason"))
+        return False
+    return True
+
+
+async def report_outcome(
+    client: httpx.AsyncClient,
+    buyer: Tuple[RemoteA2aAgent, str],
+    seller: Tuple[RemoteA2aAgent, str],
+    artifact: Optional[Artifact],
+) -> bool:
+    """Tell each org how its task ended so it commits or releases the stock it reserved.
+
+    The seller hears first. If it refuses an agreed deal (its stock is gone), the buyer is
+    told the task was rejected, so it releases its reservation, and False is returned.
+    """
+    outcome = TaskOutcome(status="accepted" if artifact is not None else "rejected", artifact=artifact)
+    settled = await send_outcome(client, *seller, outcome)
+    if not settled and artifact is not None:
+        outcome = TaskOutcome(status="rejected")
+    await send_outcome(client, *buyer, outcome)
+    return settled
+
+
+def checkpoint(sess: Dict[str, Any], task: Task, journaled: int, **progress: Any) -> int:
+    """Journal new transcript entries and record the loop position after a completed turn.
+
+    Returns the new journal offset. Org replies are cached by message id, so resuming from
+    here and resending a half-finished turn never triggers a second LLM call. Streamed
+    narratives still on their way are not waited for; they are journaled as patches.
+    """
+    session_id = sess["session_id"]
+    try:
+        append_transcript_journal(session_id, sess["transcript"][journaled:])
+        journaled = sess["journaled"] = len(sess["transcript"])
+        save_checkpoint(session_id, {
+            "session_id": session_id,
+            "status": "running",
+            "task": task.model_dump(),
+            "transcript_offset": journaled,
+            **progress,
+        })
+    except Exception:
+        logger.exception("checkpoint failed session=%s", session_id)
+    return journaled
+
+
+def close_session(sess: Dict[str, Any], task: Task, orgs: Dict[str, RemoteA2aAgent]) -> None:
+    """Close the checkpoint with the session's org timings and fold the session into the analytics rollups.
+
+    ``orgs`` maps org1/org2 to their agents; a session that failed early may have neither.
+    """
+    metrics = {
+        name: {"turns": agent.turns, "ms": round(1000.0 * agent.elapsed_s, 1)}
+        for name, agent in orgs.items()
+    }
+    try:
+        update_checkpoint_status(sess["session_id"], sess["status"], metrics=metrics)
+    except Exception:
+        logger.exception("checkpoint close failed session=%s", sess["session_id"])
+    artifact = sess["artifact"]
+    try:
+        ANALYTICS.record({
+            "session_id": sess["session_id"],
+            "created_at": session_time(sess["session_id"]),
+            "status": "error" if sess["status"] == "error" else ("agreed" if artifact else "no_deal"),
+            "task": task.model_dump(),
+            "artifact": artifact.model_dump() if artifact else None,
+            "transcript": [m.to_dict() for m in sess["transcript"]],
+            "metrics": metrics,
+        })
+    except Exception:
+        logger.exception("analytics_record_failed session=%s", sess["session_id"])
+    turns = sum(agent.turns for agent in orgs.values())
+    if turns:
+        SCHEDULER.observe_org_latency(1000.0 * sum(agent.elapsed_s for agent in orgs.values()) / turns)
+
+
+def fail_session(sess: Dict[str, Any], task: Task, orgs: Dict[str, RemoteA2aAgent]) -> Dict[str, Any]:
+    """End a session as ``error``, keeping its partial transcript."""
+    set_status(sess, "error")
+    try:
+        save_transcript(sess["session_id"], sess["transcript"])
+    except Exception:
+        logger.exception("transcript_save_failed session=%s", sess["session_id"])
+    close_session(sess, task, orgs)
+    return {"session_id": sess["session_id"], "status": sess["status"]}
+
+
+def admit_or_429() -> None:
+    try:
+        SCHEDULER.admit()
+    except Overloaded as e:
+        logger.warning("sched_refused reason=%s retry_after=%.0f", e.reason, e.retry_after)
+        raise HTTPException(
+            status_code=429,
+            detail={"reason": e.reason, "retry_after": math.ceil(e.retry_after), "scheduler": SCHEDULER.snapshot()},
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
+
+async def schedule_negotiation(
+    sess: Dict[str, Any],
+    task: Task,
+    resume_from: Optional[Dict[str, Any]],
+    retries: int,
+    deadline_s: Optional[float],
+    wait: bool,
+):
+    """Queue ``run_negotiation`` on the scheduler; await it when ``wait``, else return the session id."""
+
+    async def run():
+        set_status(sess, "running")
+        return await run_negotiation(sess, task, resume_from)
+
+    def expired():
+        set_status(sess, "expired")
+
+    deadline = time.monotonic() + (DEFAULT_DEADLINE_S if deadline_s is None else deadline_s)
+    priority = session_priority(task.quantity, task.target_price, deadline, retries)
+    job = SCHEDULER.submit(sess["session_id"], run, priority, deadline, on_expired=expired)
+    if not wait:
+        # The scheduler keeps the job referenced; nobody awaits its result
+        job.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return {"session_id": sess["session_id"], "status": sess["status"]}
+    try:
+        return await job
+    except DeadlineExpired as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/api/resume")
+async def resume_negotiation(session_id: Optional[str] = None, wait: bool = True):
+    """Continue a session from its last checkpoint (latest running one if no id is given)."""
+    cp = load_checkpoint(session_id)
+    if cp is None:
+        raise HTTPException(status_code=404, detail="no checkpoint to resume")
+    admit_or_429()
+
+    sess = new_session(cp["session_id"], status="queued")
+    sess["transcript"] = load_transcript_journal(cp["session_id"], cp["transcript_offset"])
+    touch(sess)
+    truncate_transcript_journal(cp["session_id"], cp["transcript_offset"])
+    logger.info("resume session=%s turn=%s offset=%s", cp["session_id"], cp["turn"], cp["transcript_offset"])
+    # A resumed session already lost its place once; it goes ahead of fresh ones of the same value
+    return await schedule_negotiation(sess, Task(**cp["task"]), cp, 1, None, wait)
+
+
+def price_history(sku: str) -> Optional[Dict[str, Any]]:
+    """The SKU's agreed-price summary for a new task's context.
+
+    None while LLM cassettes record or replay: the history ends up in the decision prompts
+    that key the cassettes, and it moves with every deal, so replays would miss.
+    """
+    if cassette_mode() != "off":
+        return None
+    return PRICE_INDEX.summary(sku)
+
+
 @app.post("/api/start")
-async def start_negotiation():
-    STATE["session_id"] = f"session-{int(time.time())}"
-    STATE["status"] = "running"
-    STATE["transcript"] = []
-    STATE["artifact"] = None
-
-    task = Task(
-        subject="Bulk purchase negotiation",
-        sku="MACBOOK-PRO-14",
-        quantity=20,
-        target_price=1789.0,
-        constraints={"turn_limit": 7},
-    )
+async def start_negotiation(req: Optional[StartRequest] = None, wait: bool = True):
+    """Start a negotiation; the body overrides the default task.
+
+    With ``wait=false`` the session runs in the background and its id is returned at once,
+    so clients can poll ``/api/transcript?session_id=...`` while many sessions run.
+
+    Sessions queue for a scheduler worker (status ``queued``). When the queue is full or the
+    orgs are slow, the request is refused with 429 and Retry-After; a queued session that
+    does not start within ``deadline_s`` ends as ``expired`` (503 when waiting).
+    """
+    req = req or StartRequest()
+    refusal = ORG_LINKS.refusal(line_items=bool(req.lines))
+    if refusal:
+        raise HTTPException(status_code=502, detail=refusal)
+    admit_or_429()
+    sess = new_session(f"session-{int(time.time())}-{uuid.uuid4().hex[:6]}", status="queued")
+
+    if req.lines:
+        # sku/quantity/target_price summarise the order: total units at their average target
+        quantity = sum(line.quantity for line in req.lines)
+        task = Task(
+            subject="Bulk purchase negotiation",
+            sku="MULTI",
+            quantity=quantity,
+            target_price=round(sum(line.quantity * line.target_price for line in req.lines) / max(quantity, 1), 2),
+            constraints={"turn_limit": req.turn_limit},
+            parts=[Part(type=LINE_ITEM, data={"line": f"L{n}", **line.model_dump()}) for n, line in enumerate(req.lines, 1)],
+        )
+        if req.use_price_history:
+            histories = {line.sku: price_history(line.sku) for line in req.lines}
+            task.context["price_history_by_sku"] = {sku: h for sku, h in histories.items() if h}
+    else:
+        task = Task(
+            subject="Bulk purchase negotiation",
+            sku=req.sku,
+            quantity=req.quantity,
+            target_price=req.target_price,
+            constraints={"turn_limit": req.turn_limit},
+        )
+        history = price_history(task.sku) if req.use_price_history else None
+        if history:
+            task.context["price_history"] = history
     logger.info(
         "start session=%s sku=%s qty=%s target=%s constraints=%s",
-        STATE["session_id"], task.sku, task.quantity, task.target_price, task.constraints,
+        sess["session_id"], task.sku, task.quantity, task.target_price, task.constraints,
     )
 
     # Seed transcript with MayLim stating purchase intent and target price
-    intro_msg = Message(
-        role="MayLim",
-        content=(
-            f"We want to buy {task.quantity} units of {task.sku}. "
-            f"Our target unit price is ${task.target_price:.2f}. Can you quote your best price?"
-        ),
-        rationale="State requirement and target to anchor negotiation.",
-        transcript_response=(
-            f"Hello boss, need {task.quantity} units — can do at ${task.target_price:.2f} ah?"
-        ),
-    )
-    STATE["transcript"].append(intro_msg)
-
-    async with httpx.AsyncClient(timeout=httpx.Timeout(20.0, connect=5.0)) as client:
-        org1 = RemoteA2aAgent(ORG1_URL)
-        org2 = RemoteA2aAgent(ORG2_URL)
-        org1_task_id = await org1.create_task(client, task)
-        org2_task_id = await org2.create_task(client, task)
-
-        # Ask seller (org2) for opening quote
-        msg_to_org2 = Message(
-            role="broker",
+    if req.lines:
+        wanted = "; ".join(f"{line.quantity} units of {line.sku} at ${line.target_price:.2f}" for line in req.lines)
+        intro_msg = TranscriptRecord(
+            role="MayLim",
+            content=f"We want to buy {wanted} (target unit prices). Can you quote your best price per line?",
+            rationale="State requirement and target per line to anchor negotiation.",
+            transcript_response=f"Hello boss, need {len(req.lines)} items this round — can quote each one ah?",
+        )
+    else:
+        intro_msg = TranscriptRecord(
+            role="MayLim",
             content=(
-                f"Request quote for {task.quantity} units of {task.sku}.\n"
-                f"History:\n{build_history_summary()}"
+                f"We want to buy {task.quantity} units of {task.sku}. "
+                f"Our target unit price is ${task.target_price:.2f}. Can you quote your best price?"
+            ),
+            rationale="State requirement and target to anchor negotiation.",
+            transcript_response=(
+                f"Hello boss, need {task.quantity} units — can do at ${task.target_price:.2f} ah?"
             ),
         )
-        try:
-            r2 = await org2.send_message(client, org2_task_id, msg_to_org2)
-            reply2 = Message(**r2["reply"])
-            STATE["transcript"].append(reply2)
-            logger.info(
-                "recv org2 role=%s content=%s rationale=%s speak=%s",
-                reply2.role, reply2.content, getattr(reply2, "rationale", ""), getattr(reply2, "transcript_response", ""),
-            )
-        except Exception as e:
-            logger.exception("org2 initial quote failed")
-            err_msg = Message(
-                role="broker",
-                content="Cannot proceed: seller (org2) did not respond in time.",
-                rationale="Intervention: broker halted flow due to timeout.",
-                transcript_response="Cannot proceed, seller agent got issue."
-            )
-            STATE["transcript"].append(err_msg)
-            STATE["status"] = "error"
-            # Persist partial transcript
-            try:
-                save_transcript(STATE["session_id"], STATE["transcript"])
-            except Exception:
-                pass
-            return {"session_id": STATE["session_id"], "status": STATE["status"]}
-        logger.info(
-            "recv org2 role=%s content=%s rationale=%s speak=%s",
-            reply2.role, reply2.content, getattr(reply2, "rationale", ""), getattr(reply2, "transcript_response", ""),
-        )
+    append_entry(sess, intro_msg)
+    return await schedule_negotiation(sess, task, None, req.attempt, req.deadline_s, wait)
 
-        current_price = extract_price(reply2.content)
-        if current_price is None:
-            # Fallback
-            current_price = 1900.0
 
-        status = "in_progress"
-        turn = 0
-        price_agreed: Optional[float] = None
+def line_quote(engine: LineItemEngine) -> Optional[Artifact]:
+    """Quote for the agreed lines of a multi-SKU task, or None when no line was agreed.
 
-        while status == "in_progress" and turn < int(task.constraints.get("turn_limit", 7)):
-            # Send seller's offer to buyer (org1)
-            msg_to_org1 = Message(
-                role="broker",
-                content=(
-                    f"Seller offer: ${current_price:.2f}\n"
-                    f"History:\n{build_history_summary()}"
-                ),
-            )
-            try:
-                r1 = await org1.send_message(client, org1_task_id, msg_to_org1)
-                reply1 = Message(**r1["reply"])
-            except Exception:
-                logger.exception("org1 counter/accept failed")
-                err_msg = Message(
-                    role="broker",
-                    content="Cannot proceed: buyer (org1) did not respond in time.",
-                    rationale="Intervention: broker halted flow due to timeout.",
-                    transcript_response="Cannot proceed, buyer agent got issue."
-                )
-                STATE["transcript"].append(err_msg)
-                STATE["status"] = "error"
-                try:
-                    save_transcript(STATE["session_id"], STATE["transcript"])
-                except Exception:
-                    pass
-                return {"session_id": STATE["session_id"], "status": STATE["status"]}
-            STATE["transcript"].append(reply1)
-            logger.info(
-                "recv org1 role=%s content=%s rationale=%s speak=%s",
-                reply1.role, reply1.content, getattr(reply1, "rationale", ""), getattr(reply1, "transcript_response", ""),
-            )
+    Lines that were rejected or still open at the turn limit are not bought; their ids are
+    listed under ``no_deal_lines``.
+    """
+    agreed = engine.agreed_lines()
+    if not agreed:
+        return None
+    lines = [
+        {
+            "line": line["line"],
+            "sku": line["sku"],
+            "quantity": line["quantity"],
+            "unit_price": line["price"],
+            "total": round(line["price"] * line["quantity"], 2),
+        }
+        for line in agreed
+    ]
+    return Artifact(
+        type="quote",
+        data={
+            "lines": lines,
+            "quantity": sum(line["quantity"] for line in lines),
+            "total": round(sum(line["total"] for line in lines), 2),
+            "currency": "USD",
+            "no_deal_lines": [line_id for line_id, line in engine.lines.items() if line["state"] != "agreed"],
+        },
+    )
 
-            if r1.get("status") == "accepted":
-                price_agreed = extract_price(reply1.content) or current_price
-                status = "accepted"
-                # Broker speaks on acceptance
-                broker_msg = Message(
-                    role="broker",
-                    content="Broker: buyer accepted. Proceed paperwork.",
-                    rationale="Conclusion after buyer acceptance.",
-                    transcript_response="Okay la, both parties agree — I’ll draft PO and invoice.",
-                )
-                STATE["transcript"].append(broker_msg)
-                break
-
-            if r1.get("status") == "reject":
-                # Broker speaks on rejection
-                broker_msg = Message(
-                    role="broker",
-                    content="Broker: buyer rejected. Cannot proceed.",
-                    rationale="Conclusion after buyer rejection.",
-                    transcript_response="Cannot proceed la, buyer cannot meet price — we pause and follow up.",
-                )
-                STATE["transcript"].append(broker_msg)
-
-            # Forward buyer counter to seller
-            counter_price = extract_price(reply1.content)
-            if counter_price is None:
-                counter_price = max(current_price - 10.0, 1500.0)
-
-            msg_to_org2 = Message(
-                role="broker",
-                content=(
-                    f"Buyer counter: ${counter_price:.2f}\n"
-                    f"History:\n{build_history_summary()}"
-                ),
-            )
-            try:
-                r2 = await org2.send_message(client, org2_task_id, msg_to_org2)
-                reply2 = Message(**r2["reply"])
-            except Exception:
-                logger.exception("org2 reply failed")
-                err_msg = Message(
-                    role="broker",
-                    content="Cannot proceed: seller (org2) did not respond in time.",
-                    rationale="Intervention: broker halted flow due to timeout.",
-                    transcript_response="Cannot proceed, seller agent got issue."
-                )
-                STATE["transcript"].append(err_msg)
-                STATE["status"] = "error"
-                try:
-                    save_transcript(STATE["session_id"], STATE["transcript"])
-                except Exception:
-                    pass
-                return {"session_id": STATE["session_id"], "status": STATE["status"]}
-            STATE["transcript"].append(reply2)
-            logger.info(
-                "recv org2 role=%s content=%s rationale=%s speak=%s",
-                reply2.role, reply2.content, getattr(reply2, "rationale", ""), getattr(reply2, "transcript_response", ""),
-            )
 
-            if r2.get("status") == "accepted":
-                price_agreed = extract_price(reply2.content) or counter_price
-                status = "accepted"
-                # Broker speaks on acceptance
-                broker_msg = Message(
-                    role="broker",
-                    content="Broker: seller accepted. Proceed paperwork.",
-                    rationale="Conclusion after seller acceptance.",
-                    transcript_response="Okay la, both parties agree — I’ll draft PO and invoice.",
-                )
-                STATE["transcript"].append(broker_msg)
-                break
-
-            if r2.get("status") == "reject":
-                # Broker speaks on rejection
-                broker_msg = Message(
-                    role="broker",
-                    content="Broker: seller rejected. Cannot proceed.",
-                    rationale="Conclusion after seller rejection.",
-                    transcript_response="Cannot proceed la, seller cannot meet price — we pause and follow up.",
-                )
-                STATE["transcript"].append(broker_msg)
-
-            next_price = extract_price(reply2.content)
-            current_price = next_price if next_price is not None else current_price
-            turn += 1
-
-            # Near cutoff, broker posts notice
-            turn_limit = int(task.constraints.get("turn_limit", 12))
-            if turn >= turn_limit:
-                cutoff_msg = Message(
-                    role="broker",
-                    content="Broker: turn limit reached. No agreement.",
-                    rationale="No-overlap or stalled negotiation at cutoff.",
-                    transcript_response="Aiyo, time up la — no agreement this round.",
-                )
-                STATE["transcript"].append(cutoff_msg)
-                break
-
-    final_artifact = None
-    if price_agreed is not None:
-        final_artifact = Artifact(
-            type="quote",
-            data={
-                "sku": task.sku,
-                "quantity": task.quantity,
-                "unit_price": price_agreed,
-                "total": round(price_agreed * task.quantity, 2),
-                "currency": "USD",
-            },
+async def run_negotiation(sess: Dict[str, Any], task: Task, resume_from: Optional[Dict[str, Any]]):
+    """Run one session to a terminal status; whatever goes wrong, it does not stay ``running``."""
+    orgs: Dict[str, RemoteA2aAgent] = {}
+    try:
+        return await negotiate(sess, task, resume_from, orgs)
+    except Exception:
+        logger.exception("session_failed session=%s", sess["session_id"])
+        if sess["status"] not in LIVE_STATUSES:
+            # Failed after the outcome was recorded (e.g. the conclusion); the session stands
+            return {"session_id": sess["session_id"], "status": sess["status"]}
+        return fail_session(sess, task, orgs)
+
+
+async def negotiate(
+    sess: Dict[str, Any],
+    task: Task,
+    resume_from: Optional[Dict[str, Any]],
+    orgs: Dict[str, RemoteA2aAgent],
+) -> Dict[str, Any]:
+    """The session body; fills ``orgs`` as soon as the org agents exist."""
+    session_id = sess["session_id"]
+    journaled = sess["journaled"] = resume_from["transcript_offset"] if resume_from else 0
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(20.0, connect=5.0)) as client:
+        try:
+            links = await ORG_LINKS.connect(client)
+        except IncompatibleOrg as e:
+            logger.error("session_refused session=%s reason=%s", session_id, e)
+            return {**fail_session(sess, task, orgs), "detail": str(e)}
+        org1, org2 = (RemoteA2aAgent(link.base_url, link.wire_format, link.streaming) for link in links.values())
+        orgs.update(org1=org1, org2=org2)
+        pending: List["asyncio.Task[None]"] = []
+
+        if resume_from is None:
+            org1_task_id = await org1.create_task(client, task)
+            org2_task_id = await org2.create_task(client, task)
+        else:
+            org1_task_id = resume_from["org1_task_id"]
+            org2_task_id = resume_from["org2_task_id"]
+
+        # Multi-SKU tasks settle each line on its own, on the same turns
+        engine_cls = LineItemEngine if task.line_items() else NegotiationEngine
+        engine = engine_cls(
+            session_id,
+            task,
+            sess["transcript"],
+            buyer=Side("org1", "buyer", org1, org1_task_id),
+            seller=Side("org2", "seller", org2, org2_task_id),
+            send=lambda side, message, message_id: send_turn(sess, client, side.agent, side.task_id, message, pending, message_id),
         )
+        if resume_from is not None:
+            engine.resume(resume_from)
+
+        async def persist_round(progress: Dict[str, Any]) -> None:
+            nonlocal journaled
+            journaled = checkpoint(sess, task, journaled, **progress)
+
+        def report_backpressure(side: Side, payload: Dict[str, Any]) -> None:
+            STATE["backpressure"][side.name] = side.agent.backpressure
+
+        # Pollers see each new entry; rounds are journaled for /api/resume
+        engine.bus.subscribe("entry", lambda record: touch(sess))
+        engine.bus.subscribe("reply", report_backpressure)
+        engine.bus.subscribe("round", persist_round)
+        state = await engine.run()
+        await drain_narratives(pending)
+
+        if state == FAILED:
+            return fail_session(sess, task, orgs)
+
+        price_agreed = engine.price_agreed
+        final_artifact = None
+        if isinstance(engine, LineItemEngine):
+            final_artifact = line_quote(engine)
+        elif price_agreed is not None:
+            final_artifact = Artifact(
+                type="quote",
+                data={
+                    "sku": task.sku,
+                    "quantity": task.quantity,
+                    "unit_price": price_agreed,
+                    "total": round(price_agreed * task.quantity, 2),
+                    "currency": "USD",
+                },
+            )
+        if not await report_outcome(client, (org1, org1_task_id), (org2, org2_task_id), final_artifact) and final_artifact:
+            # No deal after all: nothing is saved as agreed or fed to the price index
+            logger.warning("deal_refused session=%s", session_id)
+            final_artifact = None
+            append_entry(sess, TranscriptRecord(
+                role="broker",
+                content="Broker: seller cannot supply the agreed stock. Cannot proceed.",
+                rationale="Seller refused the agreed outcome: stock no longer available.",
+                transcript_response="Cannot proceed la, seller stock already gone — no deal this time.",
+            ))
 
-    STATE["artifact"] = final_artifact
-    STATE["status"] = "completed" if final_artifact else "completed"
+    sess["artifact"] = final_artifact
+    set_status(sess, "completed")
     # persist to disk
     try:
-        save_transcript(STATE["session_id"], STATE["transcript"])
-        save_artifact(STATE["session_id"], STATE["artifact"])
+        save_transcript(sess["session_id"], sess["transcript"])
+        artifact_path = save_artifact(sess["session_id"], sess["artifact"])
     except Exception:
-        pass
+        artifact_path = None
+    close_session(sess, task, orgs)
     if final_artifact:
+        # Cassette runs leave the index as it was (see price_history)
+        if cassette_mode() == "off":
+            for line in final_artifact.data.get("lines") or [final_artifact.data]:
+                # A due save rewrites the index file; keep it off the event loop
+                await asyncio.to_thread(PRICE_INDEX.record, line["sku"], float(line["unit_price"]), artifact_path)
         logger.info(
             "final artifact sku=%s qty=%s unit_price=%s total=%s",
-            final_artifact.data.get("sku"),
+            final_artifact.data.get("sku", task.sku),
             final_artifact.data.get("quantity"),
             final_artifact.data.get("unit_price"),
             final_artifact.data.get("total"),
         )
         # Append a broker LLM conclusion message to transcript
-        concl = conclude_with_groq([
-            m.model_dump() for m in STATE["transcript"]
-        ], final_artifact.model_dump())
-        broker_msg = Message(
+        # Off the event loop so concurrent sessions keep flowing while Groq answers
+        concl = await asyncio.to_thread(
+            conclude_with_groq, [m.to_dict() for m in sess["transcript"]], final_artifact.model_dump()
+        )
+        broker_msg = TranscriptRecord(
             role="broker",
             content=concl.get("content", "Broker conclusion."),
             rationale=concl.get("rationale", ""),
             transcript_response=concl.get("transcript_response", ""),
         )
-        STATE["transcript"].append(broker_msg)
-    return {"session_id": STATE["session_id"], "status": STATE["status"]}
+        append_entry(sess, broker_msg)
+    return {"session_id": sess["session_id"], "status": sess["status"]}
 
 
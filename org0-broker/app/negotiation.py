@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import inspect
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from a2a_common.log_setup import msg_body
+from app.schemas import LINE_DECISION, LINE_OFFER, Message, Part, Task, TranscriptRecord, line_parts
+
+
+logger = logging.getLogger("org0-broker")
+
+# Negotiation states. The first three send a turn to one side; the rest are terminal.
+OPENING = "opening"
+BUYER_TURN = "buyer_turn"
+SELLER_TURN = "seller_turn"
+AGREED = "agreed"
+REJECTED = "rejected"
+TURN_LIMIT = "turn_limit"
+FAILED = "failed"
+TERMINAL = (AGREED, REJECTED, TURN_LIMIT, FAILED)
+
+# Default when a task does not set constraints["turn_limit"]
+DEFAULT_TURN_LIMIT = 7
+
+
+def extract_price(text: str) -> Optional[float]:
+    match = re.search(r"(\$|USD\s*)?(\d{3,5})(?:\.(\d{2}))?", text)
+    if not match:
+        return None
+    dollars = float(match.group(2))
+    cents = match.group(3)
+    if cents:
+        return float(f"{int(dollars)}.{cents}")
+    return float(dollars)
+
+
+def build_history_summary(transcript: List[TranscriptRecord], max_items: int = 4) -> str:
+    try:
+        tail = transcript[-max_items:]
+        compact: List[Dict[str, Any]] = []
+        for m in tail:
+            compact.append({
+                "role": getattr(m, "role", ""),
+                "content": getattr(m, "content", ""),
+                "rationale": getattr(m, "rationale", ""),
+            })
+        return json.dumps(compact, ensure_ascii=False)
+    except Exception:
+        return "[]"
+
+
+@dataclass
+class Side:
+    """One party: ``name`` tags message ids and metrics (org1/org2), ``role`` is buyer or seller."""
+
+    name: str
+    role: str
+    agent: Any
+    task_id: str
+
+
+@dataclass(frozen=True)
+class Step:
+    """What a non-terminal state does: who speaks, what they are sent and where each reply leads.
+
+    ``compose`` returns the message content and the price it puts to the side (None for the
+    opening quote request); ``fallback`` is the side's price when its reply has none, from
+    the latest offers and the SKU's agreed-price history (both per line on multi-SKU tasks).
+    ``on`` maps the reply status to the next state, ``"*"`` for any other status.
+    """
+
+    side: str
+    compose: Callable[["NegotiationEngine"], Tuple[str, Optional[float]]]
+    fallback: Callable[[Dict[str, float], Optional[Dict[str, Any]]], float]
+    on: Dict[str, str]
+    # Set when finishing this step completes a round: turns added, then a checkpoint and the turn limit check
+    round_turns: Optional[int] = None
+
+
+def _history(engine: "NegotiationEngine") -> str:
+    return build_history_summary(engine.transcript)
+
+
+def _quote_request(engine: "NegotiationEngine") -> Tuple[str, Optional[float]]:
+    task = engine.task
+    return f"Request quote for {task.quantity} units of {task.sku}.\nHistory:\n{_history(engine)}", None
+
+
+def _seller_offer(engine: "NegotiationEngine") -> Tuple[str, Optional[float]]:
+    price = engine.offers["seller"]
+    return f"Seller offer: ${price:.2f}\nHistory:\n{_history(engine)}", price
+
+
+def _buyer_counter(engine: "NegotiationEngine") -> Tuple[str, Optional[float]]:
+    price = engine.offers["buyer"]
+    return f"Buyer counter: ${price:.2f}\nHistory:\n{_history(engine)}", price
+
+
+def _opening_fallback(offers: Dict[str, float], history: Optional[Dict[str, Any]]) -> float:
+    # Typical agreed price for this SKU, else a fixed guess
+    return float(history["p50"]) if history else 1900.0
+
+
+def _buyer_fallback(offers: Dict[str, float], history: Optional[Dict[str, Any]]) -> float:
+    return max(offers["seller"] - 10.0, 1500.0)
+
+
+def _seller_fallback(offers: Dict[str, float], history: Optional[Dict[str, Any]]) -> float:
+    # Seller said no price: its previous offer stands
+    return offers["seller"]
+
+
+# The negotiation, one row per state that sends a turn
+TABLE: Dict[str, Step] = {
+    OPENING: Step("seller", _quote_request, _opening_fallback, {"reject": REJECTED, "error": FAILED, "*": BUYER_TURN}, round_turns=0),
+    BUYER_TURN: Step("buyer", _seller_offer, _buyer_fallback, {"accepted": AGREED, "reject": REJECTED, "error": FAILED, "*": SELLER_TURN}),
+    SELLER_TURN: Step("seller", _buyer_counter, _seller_fallback, {"accepted": AGREED, "reject": REJECTED, "error": FAILED, "*": BUYER_TURN}, round_turns=1),
+}
+
+
+def _notice(state: str, side: Side) -> Optional[TranscriptRecord]:
+    """Broker entry posted when a side's reply ends the negotiation."""
+    party = side.role
+    if state == AGREED:
+        return TranscriptRecord(
+            role="broker",
+            content=f"Broker: {party} accepted. Proceed paperwork.",
+            rationale=f"Conclusion after {party} acceptance.",
+            transcript_response="Okay la, both parties agree — I’ll draft PO and invoice.",
+        )
+    if state == REJECTED:
+        return TranscriptRecord(
+            role="broker",
+            content=f"Broker: {party} rejected. Cannot proceed.",
+            rationale=f"Conclusion after {party} rejection.",
+            transcript_response=f"Cannot proceed la, {party} cannot meet price — we pause and follow up.",
+        )
+    if state == FAILED:
+        return TranscriptRecord(
+            role="broker",
+            content=f"Cannot proceed: {party} ({side.name}) did not respond in time.",
+            rationale="Intervention: broker halted flow due to timeout.",
+            transcript_response=f"Cannot proceed, {party} agent got issue.",
+        )
+    return None
+
+
+TURN_LIMIT_NOTICE = (
+    "Broker: turn limit reached. No agreement.",
+    "No-overlap or stalled negotiation at cutoff.",
+    "Aiyo, time up la — no agreement this round.",
+)
+
+
+class EventBus:
+    """Named events with sync or async subscribers, called in subscription order.
+
+    A subscriber that raises is logged and skipped, so persistence or metrics problems
+    never stop a negotiation.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[..., Any]]] = {}
+
+    def subscribe(self, kind: str, handler: Callable[..., Any]) -> None:
+        self._handlers.setdefault(kind, []).append(handler)
+
+    async def emit(self, kind: str, **data: Any) -> None:
+        for handler in self._handlers.get(kind, ()):
+            try:
+                result = handler(**data)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("event_handler_failed event=%s handler=%s", kind, getattr(handler, "__name__", handler))
+
+
+SendTurn = Callable[[Side, Message, str], Awaitable[Tuple[Dict[str, Any], TranscriptRecord]]]
+
+
+class NegotiationEngine:
+    """Runs one session's negotiation through ``TABLE`` until a terminal state.
+
+    The engine owns the negotiation rules only. Talking to the orgs is ``send``, and
+    everything else subscribes to ``bus``:
+
+    - ``entry(record)``: a record was appended to ``transcript`` (a reply or a broker notice);
+    - ``reply(side, payload)``: a side answered a turn;
+    - ``round(progress)``: a round finished; ``progress`` is what a resume needs;
+    - ``finished(state, price)``: a terminal state was reached (``price`` set when agreed).
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        task: Task,
+        transcript: List[TranscriptRecord],
+        buyer: Side,
+        seller: Side,
+        send: SendTurn,
+        table: Dict[str, Step] = TABLE,
+    ):
+        self.session_id = session_id
+        self.task = task
+        self.transcript = transcript
+        self.sides = {"buyer": buyer, "seller": seller}
+        self.send = send
+        self.table = table
+        self.bus = EventBus()
+        self.turn_limit = int(task.constraints.get("turn_limit", DEFAULT_TURN_LIMIT))
+        self.state = OPENING
+        self.turn = 0
+        # Latest price each side has put on the table
+        self.offers: Dict[str, float] = {}
+        self.price_agreed: Optional[float] = None
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "org1_task_id": self.sides["buyer"].task_id,
+            "org2_task_id": self.sides["seller"].task_id,
+            "current_price": self.offers["seller"],
+            "turn": self.turn,
+        }
+
+    def resume(self, checkpoint: Dict[str, Any]) -> None:
+        """Continue after the round recorded in ``checkpoint`` (see ``progress``)."""
+        self.offers["seller"] = float(checkpoint["current_price"])
+        self.turn = int(checkpoint["turn"])
+        self.state = BUYER_TURN
+
+    async def add(self, record: TranscriptRecord) -> None:
+        self.transcript.append(record)
+        await self.bus.emit("entry", record=record)
+
+    def compose(self, step: Step) -> Tuple[Message, Optional[float]]:
+        """The message for ``step``'s side and the price it puts to them."""
+        content, asked = step.compose(self)
+        return Message(role="broker", content=content), asked
+
+    def apply(self, step: Step, nxt: str, reply: TranscriptRecord, payload: Dict[str, Any], asked: Optional[float]) -> str:
+        """Record the side's answer to ``asked``; ``nxt`` is where its status leads. Returns the next state."""
+        price = extract_price(reply.content)
+        if nxt == AGREED:
+            self.price_agreed = price if price is not None else asked
+        elif nxt not in TERMINAL:
+            self.offers[step.side] = price if price is not None else step.fallback(self.offers, self.task.context.get("price_history"))
+        return nxt
+
+    def notice(self, state: str, side: Side) -> Optional[TranscriptRecord]:
+        return _notice(state, side)
+
+    async def step(self) -> str:
+        """Send the current state's turn, apply the reply and return the next state."""
+        step = self.table[self.state]
+        side = self.sides[step.side]
+        message, asked = self.compose(step)
+        label = "open" if self.state == OPENING else self.turn
+        try:
+            payload, reply = await self.send(side, message, f"{self.session_id}:{label}:{side.name}")
+        except Exception:
+            logger.exception("turn_failed session=%s state=%s side=%s", self.session_id, self.state, side.name)
+            return step.on["error"]
+        await self.bus.emit("reply", side=side, payload=payload)
+        await self.add(reply)
+        logger.info(
+            "recv %s role=%s content=%s rationale=%s speak=%s",
+            side.name, reply.role, msg_body(reply.content), msg_body(reply.rationale), msg_body(reply.transcript_response),
+        )
+        status = payload.get("status")
+        return self.apply(step, step.on.get(status, step.on["*"]), reply, payload, asked)
+
+    async def enter(self, state: str, came_from: Optional[str]) -> str:
+        """Side effects of entering ``state``; may redirect (a finished round past the turn limit)."""
+        round_turns = self.table[came_from].round_turns if came_from is not None else None
+        if round_turns is not None:
+            self.turn += round_turns
+            await self.bus.emit("round", progress=self.progress())
+        if state == BUYER_TURN and self.turn >= self.turn_limit:
+            content, rationale, speak = TURN_LIMIT_NOTICE
+            await self.add(TranscriptRecord(role="broker", content=content, rationale=rationale, transcript_response=speak))
+            return TURN_LIMIT
+        return state
+
+    async def run(self) -> str:
+        """Drive the table to a terminal state and return it."""
+        came_from: Optional[str] = None
+        while True:
+            self.state = await self.enter(self.state, came_from)
+            if self.state in TERMINAL:
+                break
+            came_from, self.state = self.state, await self.step()
+            if self.state in TERMINAL:
+                notice = self.notice(self.state, self.sides[self.table[came_from].side])
+                if notice is not None:
+                    await self.add(notice)
+                break
+        await self.bus.emit("finished", state=self.state, price=self.price_agreed)
+        return self.state
+
+
+class LineItemEngine(NegotiationEngine):
+    """Negotiates a multi-SKU task line by line, on the same table and turns as a single SKU.
+
+    Every turn carries one LINE_OFFER part per line still open, priced from the other side's
+    latest offer for that line, and the side answers with one LINE_DECISION part per line.
+    An accepted line is agreed at its price, a rejected one drops out, and the rest go on to
+    the next turn; a line the side did not answer keeps the step's fallback price. The
+    negotiation ends once no line is open: AGREED when any line was agreed, else REJECTED.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        history = self.task.context.get("price_history_by_sku") or {}
+        self.lines: Dict[str, Dict[str, Any]] = {
+            str(item["line"]): {
+                "sku": item["sku"],
+                "quantity": int(item["quantity"]),
+                "state": "open",
+                "offers": {},
+                "price": None,
+                "history": history.get(item["sku"]),
+            }
+            for item in self.task.line_items()
+        }
+
+    def open_lines(self) -> List[str]:
+        return [line_id for line_id, line in self.lines.items() if line["state"] == "open"]
+
+    def agreed_lines(self) -> List[Dict[str, Any]]:
+        return [{"line": line_id, **line} for line_id, line in self.lines.items() if line["state"] == "agreed"]
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "org1_task_id": self.sides["buyer"].task_id,
+            "org2_task_id": self.sides["seller"].task_id,
+            "turn": self.turn,
+            "lines": {line_id: {k: v for k, v in line.items() if k != "history"} for line_id, line in self.lines.items()},
+        }
+
+    def resume(self, checkpoint: Dict[str, Any]) -> None:
+        for line_id, saved in checkpoint["lines"].items():
+            self.lines[line_id].update(saved)
+        self.turn = int(checkpoint["turn"])
+        self.state = BUYER_TURN
+
+    def compose(self, step: Step) -> Tuple[Message, Optional[float]]:
+        # Prices come from the other side's latest offer per line; None asks for an opening quote
+        partner = "buyer" if step.side == "seller" else "seller"
+        opening = self.state == OPENING
+        parts, rows = [], []
+        for line_id in self.open_lines():
+            line = self.lines[line_id]
+            price = None if opening else line["offers"][partner]
+            parts.append(Part(type=LINE_OFFER, data={"line": line_id, "sku": line["sku"], "quantity": line["quantity"], "price": price}))
+            rows.append(f"{line_id}: {line['quantity']} units of {line['sku']}" + ("" if opening else f" at ${price:.2f}"))
+        head = "Request quote per line:" if opening else f"{partner.capitalize()} {'offer' if partner == 'seller' else 'counter'} per line:"
+        content = head + "\n" + "\n".join(rows) + f"\nHistory:\n{_history(self)}"
+        return Message(role="broker", content=content, parts=parts), None
+
+    def apply(self, step: Step, nxt: str, reply: TranscriptRecord, payload: Dict[str, Any], asked: Optional[float]) -> str:
+        if nxt == FAILED:
+            return nxt
+        decisions = line_parts(Message(**payload["reply"]), LINE_DECISION)
+        partner = "buyer" if step.side == "seller" else "seller"
+        for line_id in self.open_lines():
+            line = self.lines[line_id]
+            # A reply without line parts (an org error, say) answers every line with its status
+            decision = decisions.get(line_id) or ({} if decisions else {"status": payload.get("status")})
+            price = decision.get("price")
+            outcome = step.on.get(decision.get("status"), step.on["*"])
+            if outcome == AGREED:
+                line["state"], line["price"] = "agreed", float(price) if price is not None else line["offers"].get(partner)
+            elif outcome == REJECTED:
+                line["state"] = "rejected"
+            elif outcome not in TERMINAL:
+                line["offers"][step.side] = float(price) if price is not None else step.fallback(line["offers"], line["history"])
+        if self.open_lines():
+            return step.on["*"]
+        return AGREED if self.agreed_lines() else REJECTED
+
+    def notice(self, state: str, side: Side) -> Optional[TranscriptRecord]:
+        if state != AGREED:
+            return _notice(state, side)
+        agreed = len(self.agreed_lines())
+        return TranscriptRecord(
+            role="broker",
+            content=f"Broker: {agreed} of {len(self.lines)} lines agreed. Proceed paperwork.",
+            rationale="Conclusion once every line was settled.",
+            transcript_response="Okay la, lines settled — I’ll draft PO and invoice for the agreed ones.",
+        )
@@ -1,32 +1,161 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 import httpx
-from app.schemas import Message, Task
+from app.schemas import Message, Task, TaskOutcome
+from a2a_common.wire import JSON_MEDIA, MSGPACK_MEDIA, decode, encode, loads_json, msgpack_available
+
+
+logger = logging.getLogger("org0-broker")
+
+
+class OrgBusy(Exception):
+    """Org server reported exhausted LLM quota on the streaming endpoint."""
+
+
+async def _iter_sse(res: httpx.Response) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    event, data = "message", ""
+    async for line in res.aiter_lines():
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data += line[5:].strip()
+        elif not line and data:
+            yield event, loads_json(data)
+            event, data = "message", ""
 
 
 class RemoteA2aAgent:
     """Lightweight wrapper simulating ADK RemoteA2aAgent semantics over HTTP.
 
     Provides create_task and message send operations compatible with our servers.
+    Org servers answer 429 + Retry-After when their LLM quota is exhausted; the broker
+    waits and resends that turn instead of treating it as a failed negotiation.
+
+    ``wire_format="msgpack"`` sends bodies as msgpack and asks for msgpack replies (falls back
+    to JSON when msgpack is not installed); the broker picks it from the org's card. Replies
+    are decoded by their Content-Type, so an org that only speaks JSON keeps working.
+    ``streaming`` says whether the org's card offers the SSE turn endpoint and it is wanted.
+
+    ``turns`` and ``elapsed_s`` add up completed turns and the time the broker waited for
+    each decision (busy retries included); one instance serves one negotiation.
     """
 
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, wire_format: Optional[str] = None, streaming: bool = False):
         self.base_url = base_url.rstrip("/")
+        self.busy_retries = int(os.getenv("ORG_BUSY_RETRIES", "3"))
+        self.max_retry_after = float(os.getenv("ORG_BUSY_MAX_RETRY_AFTER_S", "30"))
+        self.backpressure: Dict[str, Any] = {}
+        self.turns = 0
+        self.elapsed_s = 0.0
+        wire_format = (wire_format or os.getenv("ORG_WIRE_FORMAT", "json")).lower()
+        self.media_type = MSGPACK_MEDIA if wire_format == "msgpack" and msgpack_available() else JSON_MEDIA
+        self.streaming = streaming
+
+    def _request(self, body: Any, accept: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "content": encode(body, self.media_type),
+            "headers": {"Content-Type": self.media_type, "Accept": accept or self.media_type},
+        }
+
+    @staticmethod
+    def _decode(res: httpx.Response) -> Dict[str, Any]:
+        return decode(res.content, res.headers.get("content-type"))
 
     async def create_task(self, client: httpx.AsyncClient, task: Task) -> str:
-        res = await client.post(f"{self.base_url}/a2a/task", json=task.model_dump(exclude_none=True))
+        res = await client.post(f"{self.base_url}/a2a/task", **self._request(task.model_dump(exclude_none=True)))
         res.raise_for_status()
-        payload = res.json()
+        payload = self._decode(res)
         return payload["task_id"]
 
-    async def send_message(self, client: httpx.AsyncClient, task_id: str, message: Message) -> Dict[str, Any]:
+    async def report_outcome(self, client: httpx.AsyncClient, task_id: str, outcome: TaskOutcome) -> Dict[str, Any]:
+        """Final status of a task; ``{"ok": False, ...}`` (409) when the org cannot commit the deal."""
         res = await client.post(
-            f"{self.base_url}/a2a/message",
-            json={"task_id": task_id, "message": message.model_dump()},
+            f"{self.base_url}/a2a/task/{task_id}/outcome", **self._request(outcome.model_dump(exclude_none=True))
         )
+        if res.status_code != 409:
+            res.raise_for_status()
+        return self._decode(res)
+
+    async def send_message(
+        self, client: httpx.AsyncClient, task_id: str, message: Message, message_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        for attempt in range(self.busy_retries + 1):
+            res = await client.post(
+                f"{self.base_url}/a2a/message",
+                **self._request({"task_id": task_id, "message_id": message_id, "message": message.model_dump()}),
+            )
+            if res.status_code == 429 and attempt < self.busy_retries:
+                payload = self._decode(res)
+                self.backpressure = payload.get("backpressure") or {}
+                try:
+                    retry_after = float(res.headers.get("retry-after") or payload.get("retry_after") or 1.0)
+                except ValueError:
+                    retry_after = 1.0
+                retry_after = min(retry_after, self.max_retry_after)
+                logger.warning(
+                    "org busy url=%s task=%s attempt=%s retry_after=%.1f backpressure=%s",
+                    self.base_url, task_id, attempt, retry_after, self.backpressure,
+                )
+                await asyncio.sleep(retry_after)
+                continue
+            res.raise_for_status()
+            payload = self._decode(res)
+            self.backpressure = payload.get("backpressure") or {}
+            self.turns += 1
+            self.elapsed_s += time.perf_counter() - started
+            return payload
         res.raise_for_status()
-        return res.json()
+        return self._decode(res)
+
+    async def send_message_streaming(
+        self, client: httpx.AsyncClient, task_id: str, message: Message, message_id: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], "asyncio.Task[Dict[str, Any]]"]:
+        """Send a turn via the SSE endpoint and return as soon as the decision is parsed.
+
+        Returns ``(payload, narrative)`` where ``payload`` mirrors ``send_message`` (reply
+        without rationale/transcript_response yet) and ``narrative`` is a task resolving to
+        ``{"rationale", "transcript_response"}`` once the rest of the stream arrives.
+        Raises ``OrgBusy`` when the org is out of LLM quota.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        decision: asyncio.Future = loop.create_future()
 
+        async def pump() -> Dict[str, Any]:
+            narrative: Dict[str, Any] = {"rationale": "", "transcript_response": ""}
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/a2a/message/stream",
+                **self._request(
+                    {"task_id": task_id, "message_id": message_id, "message": message.model_dump()},
+                    accept="text/event-stream",
+                ),
+            ) as res:
+                res.raise_for_status()
+                async for event, data in _iter_sse(res):
+                    if event == "decision" and not decision.done():
+                        self.backpressure = data.get("backpressure") or {}
+                        decision.set_result(data)
+                    elif event == "narrative":
+                        narrative = data
+                    elif event == "busy" and not decision.done():
+                        self.backpressure = data.get("backpressure") or {}
+                        decision.set_exception(OrgBusy(data.get("retry_after")))
+            return narrative
 
+        task = asyncio.create_task(pump())
+        await asyncio.wait({decision, task}, return_when=asyncio.FIRST_COMPLETED)
+        if not decision.done():
+            task.result()  # re-raise transport errors
+            raise RuntimeError("stream ended without a decision")
+        payload = decision.result()
+        self.turns += 1
+        self.elapsed_s += time.perf_counter() - started
+        return payload, task
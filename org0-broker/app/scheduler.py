@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger("org0-broker")
+
+# SCHED_WORKERS: negotiations run at once; later ones wait in the priority queue.
+# SCHED_MAX_QUEUE: queued negotiations beyond which new ones are refused with 429.
+# SCHED_MAX_ORG_LATENCY_MS: recent per-turn org latency above which new ones are refused too.
+# SCHED_DEFAULT_DEADLINE_S: how long a negotiation may wait to start when the request sets no deadline.
+WORKERS = int(os.getenv("SCHED_WORKERS", "16"))
+MAX_QUEUE = int(os.getenv("SCHED_MAX_QUEUE", "256"))
+MAX_ORG_LATENCY_MS = float(os.getenv("SCHED_MAX_ORG_LATENCY_MS", "10000"))
+DEFAULT_DEADLINE_S = float(os.getenv("SCHED_DEFAULT_DEADLINE_S", "300"))
+# Latency samples older than this no longer gate admission (nothing closed recently to refresh them)
+LATENCY_MAX_AGE_S = 60.0
+# Priority weights: one decade of deal value is worth a minute of deadline or one earlier refusal
+DEADLINE_WEIGHT_S = 60.0
+RETRY_WEIGHT = 1.0
+
+
+class Overloaded(Exception):
+    """Admission refused; the client should come back after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"broker overloaded ({reason}); retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExpired(Exception):
+    """A queued negotiation was not started before its deadline."""
+
+
+def session_priority(quantity: int, target_price: Optional[float], deadline: float, retries: int) -> float:
+    """Higher first: bigger deals (quantity x target_price), earlier deadlines and more retries.
+
+    ``deadline`` is absolute (``time.monotonic()``), so two waiting sessions keep their
+    relative order however long they wait.
+    """
+    value = max(quantity, 0) * (target_price or 0.0)
+    return math.log10(1.0 + value) - deadline / DEADLINE_WEIGHT_S + RETRY_WEIGHT * max(retries, 0)
+
+
+class _Job:
+    __slots__ = ("session_id", "run", "on_expired", "priority", "deadline", "enqueued", "future")
+
+    def __init__(
+        self,
+        session_id: str,
+        run: Callable[[], Awaitable[Any]],
+        on_expired: Optional[Callable[[], None]],
+        priority: float,
+        deadline: float,
+        future: "asyncio.Future[Any]",
+    ):
+        self.session_id = session_id
+        self.run = run
+        self.on_expired = on_expired
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.future = future
+
+
+class SessionScheduler:
+    """Runs negotiations on at most ``workers`` slots, highest priority first, with admission control.
+
+    ``admit`` refuses new work with ``Overloaded`` when the queue is full or orgs have been
+    answering slower than ``max_org_latency_ms`` per turn; ``retry_after`` estimates when a
+    slot frees up from recent session durations. A queued job whose deadline passes, or
+    whose caller went away, is dropped instead of run. Everything runs on the event loop,
+    so there is no locking.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_queue: int = MAX_QUEUE, max_org_latency_ms: float = MAX_ORG_LATENCY_MS):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.max_org_latency_ms = max_org_latency_ms
+        self._heap: List[Tuple[float, int, _Job]] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, "asyncio.Task[None]"] = {}
+        # Recent queue waits (s) and run times (s) for the percentiles and Retry-After estimate
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self._durations: Deque[float] = deque(maxlen=200)
+        self._org_latency_ms = 0.0
+        self._org_latency_at = -math.inf
+        self.stats = {"admitted": 0, "refused": 0, "started": 0, "completed": 0, "failed": 0, "expired": 0, "abandoned": 0}
+
+    def _retry_after(self, backlog: int) -> float:
+        per_session = sum(self._durations) / len(self._durations) if self._durations else 10.0
+        return min(300.0, max(1.0, per_session * (backlog + 1) / self.workers))
+
+    def org_latency_ms(self) -> Optional[float]:
+        """Smoothed per-turn org latency, or None once no session has closed for a while."""
+        if time.monotonic() - self._org_latency_at > LATENCY_MAX_AGE_S:
+            return None
+        return self._org_latency_ms
+
+    def admit(self) -> None:
+        """Raise ``Overloaded`` when a new negotiation should be refused now."""
+        depth = len(self._heap)
+        if depth >= self.max_queue and len(self._running) >= self.workers:
+            self.stats["refused"] += 1
+            raise Overloaded("queue_full", self._retry_after(depth))
+        latency = self.org_latency_ms()
+        # With nothing running, admit anyway so a fresh sample can replace a stale slow one
+        if latency is not None and latency > self.max_org_latency_ms and self._running:
+            self.stats["refused"] += 1
+            raise Overloaded("org_latency", self._retry_after(depth))
+        self.stats["admitted"] += 1
+
+    def submit(
+        self,
+        session_id: str,
+        run: Callable[[], Awaitable[Any]],
+        priority: float,
+        deadline: float,
+        on_expired: Optional[Callable[[], None]] = None,
+    ) -> "asyncio.Future[Any]":
+        """Queue ``run`` and return a future for its result.
+
+        ``on_expired`` is called if the job is dropped before it starts. Callers should have
+        passed ``admit`` first.
+        """
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(session_id, run, on_expired, priority, deadline, future)
+        heapq.heappush(self._heap, (-priority, next(self._seq), job))
+        self._pump()
+        return future
+
+    def _pump(self) -> None:
+        while self._heap and len(self._running) < self.workers:
+            _, _, job = heapq.heappop(self._heap)
+            now = time.monotonic()
+            if job.future.done() or now > job.deadline:
+                # Caller cancelled (client gone) or the job waited past its deadline
+                key = "abandoned" if job.future.done() else "expired"
+                self.stats[key] += 1
+                logger.warning("sched_drop session=%s reason=%s waited_s=%.1f", job.session_id, key, now - job.enqueued)
+                if not job.future.done():
+                    job.future.set_exception(DeadlineExpired(f"not started within deadline (waited {now - job.enqueued:.1f}s)"))
+                if job.on_expired is not None:
+                    job.on_expired()
+                continue
+            self._waits.append(now - job.enqueued)
+            self.stats["started"] += 1
+            self._running[job.session_id] = asyncio.create_task(self._run(job, now))
+
+    async def _run(self, job: _Job, started: float) -> None:
+        try:
+            result = await job.run()
+        except BaseException as e:
+            self.stats["failed"] += 1
+            logger.exception("sched_job_failed session=%s", job.session_id)
+            if not job.future.done():
+                job.future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            self.stats["completed"] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._durations.append(time.monotonic() - started)
+            self._running.pop(job.session_id, None)
+            self._pump()
+
+    def observe_org_latency(self, ms_per_turn: float) -> None:
+        """Fold a closed session's per-turn org latency into the admission signal."""
+        now = time.monotonic()
+        fresh = now - self._org_latency_at > LATENCY_MAX_AGE_S
+        self._org_latency_ms = ms_per_turn if fresh else 0.8 * self._org_latency_ms + 0.2 * ms_per_turn
+        self._org_latency_at = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        waits = sorted(self._waits)
+
+        def pct(q: float) -> float:
+            return round(1000.0 * waits[min(len(waits) - 1, int(q * len(waits)))], 1) if waits else 0.0
+
+        latency = self.org_latency_ms()
+        head = heapq.nsmallest(10, self._heap)
+        return {
+            "workers": self.workers,
+            "active": len(self._running),
+            "queue_depth": len(self._heap),
+            "max_queue": self.max_queue,
+            **self.stats,
+            "wait_ms": {
+                "avg": round(1000.0 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": round(1000.0 * waits[-1], 1) if waits else 0.0,
+            },
+            "oldest_wait_s": round(max((now - job.enqueued for _, _, job in self._heap), default=0.0), 1),
+            "session_s_avg": round(sum(self._durations) / len(self._durations), 2) if self._durations else None,
+            "org_latency_ms": round(latency, 1) if latency is not None else None,
+            "max_org_latency_ms": self.max_org_latency_ms,
+            "queued": [
+                {"session_id": job.session_id, "waited_s": round(now - job.enqueued, 1), "deadline_in_s": round(job.deadline - now, 1)}
+                for _, _, job in head
+            ],
+        }
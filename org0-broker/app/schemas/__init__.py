@@ -1 +1,3 @@
-from .models import Part, Message, Task, Artifact, Transcript
+# Schemas live in the shared a2a_schemas package (../shared); re-exported for existing imports
+from a2a_schemas import Part, Message, Task, MessageRequest, Artifact, TaskOutcome, Transcript, TranscriptRecord
+from a2a_schemas import LINE_DECISION, LINE_ITEM, LINE_OFFER, line_parts
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import json
+import logging
+import operator
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas import LINE_DECISION
+from app.state.export import iter_bundles, quote_lines, task_lines
+from app.state.store import DATA_DIR, _write_atomic
+
+
+logger = logging.getLogger("org0-broker")
+
+ROLLUP_PATH = DATA_DIR / "analytics.json"
+# ANALYTICS_SAVE_INTERVAL_S: rollups are written at most this often (and on shutdown);
+# anything lost in a crash comes back with a rebuild.
+SAVE_INTERVAL_S = float(os.getenv("ANALYTICS_SAVE_INTERVAL_S", "5"))
+
+AGENT_ROLES = ("MayLim", "Kumar")
+# Row fields for each supported grouping
+GROUP_FIELDS: Dict[str, Tuple[str, ...]] = {"total": (), "sku": ("sku",), "day": ("day",), "sku_day": ("sku", "day")}
+_PRICE = re.compile(r"(\$|USD\s*)?(\d{3,5})(?:\.(\d{2}))?")
+
+# Rollup counters, all additive so rollups merge by summing
+FIELDS = (
+    "sessions", "agreed", "no_deal", "errors", "discount_sum", "discounted", "close_turns",
+    "llm_calls", "org1_ms", "org1_turns", "org2_ms", "org2_turns",
+)
+(SESSIONS, AGREED, NO_DEAL, ERRORS, DISCOUNT_SUM, DISCOUNTED, CLOSE_TURNS,
+ LLM_CALLS, ORG1_MS, ORG1_TURNS, ORG2_MS, ORG2_TURNS) = range(len(FIELDS))
+_LATENCY = {"org1": (ORG1_MS, ORG1_TURNS), "org2": (ORG2_MS, ORG2_TURNS)}
+
+
+def _price(text: str) -> Optional[float]:
+    m = _PRICE.search(text or "")
+    return float(m.group(2) + (f".{m.group(3)}" if m.group(3) else "")) if m else None
+
+
+def session_facts(bundle: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """What one session contributes to the rollups, from its export bundle.
+
+    Used both when a session closes and when rebuilding from history, so the two always
+    agree. The first seller quote stands in for list price. ``llm_calls`` counts decisions
+    requested from the org agents plus the broker's closing summary on a deal.
+
+    A single-SKU session is one contribution. A multi-SKU session contributes one per order
+    line, under the line's SKU and with its own outcome and discount (against the seller's
+    opening price for that line); ``sessions`` therefore counts lines there. Its session-wide
+    counts (LLM calls, latency) go on the first line only, so totals are not multiplied.
+    """
+    transcript = bundle.get("transcript") or []
+    artifact = bundle.get("artifact") or {}
+    data = artifact.get("data") or {}
+    task = bundle.get("task") or {}
+    # The first entry is the broker-seeded buyer intro, not an agent decision
+    replies = [m for m in transcript[1:] if m.get("role") in AGENT_ROLES]
+    seller = [m for m in replies if m.get("role") == "Kumar"]
+    agreed = bundle["status"] == "agreed"
+    metrics = bundle.get("metrics") or {}
+    session = {
+        "session_id": bundle["session_id"],
+        "day": datetime.fromtimestamp(bundle["created_at"], tz=timezone.utc).date().isoformat(),
+        "turns": sum(1 for m in replies if m.get("role") == "MayLim"),
+        "llm_calls": len(replies) + (1 if agreed else 0),
+        "latency": {org: metrics[org] for org in _LATENCY if org in metrics},
+    }
+    order = task_lines(task)
+    if not order:
+        opening = next((_price(m.get("content", "")) for m in seller), None)
+        agreed_price = data.get("unit_price") if agreed else None
+        return [{
+            **session,
+            "sku": str(data.get("sku") or task.get("sku") or ""),
+            "status": bundle["status"],
+            "discount_pct": _discount(opening, agreed_price),
+        }]
+    prices = {str(line.get("line")): line.get("unit_price") for line in quote_lines(artifact)}
+    openings = {}
+    if seller:
+        for part in seller[0].get("parts") or ():
+            if part.get("type") == LINE_DECISION and isinstance(part.get("data"), dict):
+                openings[str(part["data"].get("line"))] = part["data"].get("price")
+    facts = []
+    for n, item in enumerate(order):
+        line_id = str(item["line"])
+        status = "agreed" if line_id in prices else ("no_deal" if agreed else bundle["status"])
+        fact = {
+            **session,
+            "sku": str(item.get("sku") or ""),
+            "status": status,
+            "discount_pct": _discount(openings.get(line_id), prices.get(line_id)),
+        }
+        if n:
+            fact.update(llm_calls=0, latency={})
+        facts.append(fact)
+    return facts
+
+
+def _discount(opening: Optional[float], agreed_price: Optional[float]) -> Optional[float]:
+    if agreed_price is None or not opening:
+        return None
+    return 100.0 * (float(opening) - float(agreed_price)) / float(opening)
+
+
+class Rollup:
+    """Additive counters for a group of sessions, kept as one flat list so merging is a single ``map``."""
+
+    __slots__ = ("v", "_summary")
+
+    def __init__(self, values: Optional[List[float]] = None) -> None:
+        self.v: List[float] = list(values) if values is not None else [0] * len(FIELDS)
+        self._summary: Optional[Dict[str, Any]] = None
+
+    def add(self, facts: Dict[str, Any], sign: int = 1) -> None:
+        """Fold one session in (``sign=-1`` takes it back out)."""
+        v = self.v
+        v[SESSIONS] += sign
+        status = facts["status"]
+        if status == "agreed":
+            v[AGREED] += sign
+            v[CLOSE_TURNS] += sign * facts["turns"]
+        elif status == "error":
+            v[ERRORS] += sign
+        else:
+            v[NO_DEAL] += sign
+        if facts["discount_pct"] is not None:
+            v[DISCOUNT_SUM] += sign * facts["discount_pct"]
+            v[DISCOUNTED] += sign
+        v[LLM_CALLS] += sign * facts["llm_calls"]
+        for org, timing in facts["latency"].items():
+            ms, turns = _LATENCY[org]
+            v[ms] += sign * timing["ms"]
+            v[turns] += sign * timing["turns"]
+        self._summary = None
+
+    def merge(self, other: "Rollup") -> None:
+        self.v = list(map(operator.add, self.v, other.v))
+        self._summary = None
+
+    def summary(self) -> Dict[str, Any]:
+        """Derived rates and averages; cached until the rollup changes."""
+        if self._summary is None:
+            v = self.v
+
+            def ratio(num: int, den: int, digits: int = 2) -> Optional[float]:
+                return round(v[num] / v[den], digits) if v[den] else None
+
+            self._summary = {
+                "sessions": v[SESSIONS],
+                "agreed": v[AGREED],
+                "no_deal": v[NO_DEAL],
+                "errors": v[ERRORS],
+                "agreement_rate": ratio(AGREED, SESSIONS, 4),
+                "avg_discount_pct": ratio(DISCOUNT_SUM, DISCOUNTED),
+                "avg_turns_to_close": ratio(CLOSE_TURNS, AGREED),
+                "org1_latency_ms": ratio(ORG1_MS, ORG1_TURNS, 1),
+                "org2_latency_ms": ratio(ORG2_MS, ORG2_TURNS, 1),
+                "llm_calls": v[LLM_CALLS],
+                "llm_calls_per_session": ratio(LLM_CALLS, SESSIONS),
+            }
+        return self._summary
+
+
+class Analytics:
+    """Negotiation rollups per (day, SKU), maintained as sessions close.
+
+    Besides the (day, SKU) cells, running totals per SKU, per day and overall are kept, so
+    unfiltered queries read them directly. Filtered queries merge the matching cells. Each
+    rollup caches its summary, and query results are cached until the next session closes. ``rebuild`` recomputes everything from the
+    saved sessions (segments included). Rollups are loaded on first use (or by the startup
+    warm-up), not when the broker is imported, since a missing file means a full rebuild.
+    """
+
+    def __init__(self, path: Path = ROLLUP_PATH, data_dir: Path = DATA_DIR):
+        self.path = path
+        self.data_dir = data_dir
+        self.cells: Dict[Tuple[str, str], Rollup] = {}
+        self.by_sku: Dict[str, Rollup] = {}
+        self.by_day: Dict[str, Rollup] = {}
+        self.total = Rollup()
+        # Failed sessions can be resumed; their facts are kept so the retry replaces them
+        self.errored: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self._cache: Dict[Any, Dict[str, Any]] = {}
+        self._saved_at = 0.0
+        self._dirty = False
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def load(self) -> "Analytics":
+        if self._loaded:
+            return self
+        with self._load_lock:
+            if self._loaded:
+                return self
+            if not self.path.exists():
+                count, _ = self.rebuild()
+                logger.info("analytics_built sessions=%s", count)
+                return self
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8"))
+                self.cells = {(day, sku): Rollup(v) for day, sku, v in raw.get("cells", [])}
+                # Facts of failed sessions were a single dict before multi-SKU sessions were split per line
+                self.errored = {k: v if isinstance(v, list) else [v] for k, v in raw.get("errored", {}).items()}
+                self._reindex()
+                self._loaded = True
+            except Exception:
+                logger.exception("analytics_load_failed path=%s; rebuilding", self.path)
+                self.rebuild()
+        logger.info("analytics_loaded cells=%s sessions=%s", len(self.cells), self.total.v[SESSIONS])
+        return self
+
+    def _reindex(self) -> None:
+        self.by_sku, self.by_day, self.total = {}, {}, Rollup()
+        for (day, sku), cell in self.cells.items():
+            self.by_sku.setdefault(sku, Rollup()).merge(cell)
+            self.by_day.setdefault(day, Rollup()).merge(cell)
+            self.total.merge(cell)
+
+    def _apply(self, facts: List[Dict[str, Any]], sign: int) -> None:
+        for line in facts:
+            day, sku = line["day"], line["sku"]
+            for rollup in (
+                self.cells.setdefault((day, sku), Rollup()),
+                self.by_sku.setdefault(sku, Rollup()),
+                self.by_day.setdefault(day, Rollup()),
+                self.total,
+            ):
+                rollup.add(line, sign)
+
+    def record(self, bundle: Dict[str, Any]) -> None:
+        """Fold in a session that just closed (see ``session_facts`` for the bundle shape)."""
+        facts = session_facts(bundle)
+        self.load()
+        with self._lock:
+            previous = self.errored.pop(bundle["session_id"], None)
+            if previous is not None:
+                self._apply(previous, -1)
+            self._apply(facts, 1)
+            if bundle["status"] == "error":
+                self.errored[bundle["session_id"]] = facts
+            self.version += 1
+            self._cache.clear()
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= SAVE_INTERVAL_S:
+                self._save_locked()
+
+    def rebuild(self, data_dir: Optional[Path] = None) -> Tuple[int, float]:
+        """Recompute all rollups from saved sessions; returns (sessions, seconds)."""
+        t0 = time.perf_counter()
+        fresh = Analytics(self.path, self.data_dir)
+        for bundle in iter_bundles(data_dir or self.data_dir):
+            if bundle["status"] == "running":
+                continue
+            facts = session_facts(bundle)
+            fresh._apply(facts, 1)
+            if bundle["status"] == "error":
+                fresh.errored[bundle["session_id"]] = facts
+        with self._lock:
+            self.cells, self.by_sku, self.by_day, self.total = fresh.cells, fresh.by_sku, fresh.by_day, fresh.total
+            self.errored = fresh.errored
+            self._loaded = True
+            self.version += 1
+            self._cache.clear()
+            self._save_locked()
+        return self.total.v[SESSIONS], time.perf_counter() - t0
+
+    def query(
+        self,
+        group_by: str = "sku",
+        sku: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Summaries grouped by ``total``, ``sku``, ``day`` or ``sku_day``.
+
+        ``since``/``until`` are ISO days (``until`` exclusive). Results are cached per
+        query until the next session closes.
+        """
+        key = (group_by, sku, since, until)
+        self.load()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+            total, groups = self._select(group_by, sku, since, until)
+            result = {
+                "group_by": group_by,
+                "version": self.version,
+                "total": total.summary(),
+                "groups": [
+                    dict(zip(GROUP_FIELDS[group_by], k), **r.summary())
+                    for k, r in sorted(groups.items(), key=operator.itemgetter(0))
+                ],
+            }
+            if len(self._cache) > 64:
+                self._cache.clear()
+            self._cache[key] = result
+            return result
+
+    def _select(
+        self, group_by: str, sku: Optional[str], since: Optional[str], until: Optional[str]
+    ) -> Tuple[Rollup, Dict[Tuple[str, ...], Rollup]]:
+        """Total and groups for a query, from the running totals where possible, else by merging cells."""
+        dated = since is not None or until is not None
+        if not dated and sku is None:
+            if group_by == "sku":
+                return self.total, {(name,): r for name, r in self.by_sku.items()}
+            if group_by == "day":
+                return self.total, {(day,): r for day, r in self.by_day.items()}
+            if group_by == "sku_day":
+                return self.total, {(name, day): r for (day, name), r in self.cells.items()}
+            return self.total, {}
+        if not dated and group_by in ("total", "sku"):
+            total = self.by_sku.get(sku) or Rollup()
+            return total, ({(sku,): total} if group_by == "sku" and total.v[SESSIONS] else {})
+        total = Rollup()
+        groups: Dict[Tuple[str, ...], Rollup] = {}
+        if sku is None and group_by in ("total", "day"):
+            source = (((day, None), r) for day, r in self.by_day.items())
+        else:
+            source = self.cells.items()
+        for (day, cell_sku), cell in source:
+            if (sku and cell_sku != sku) or (since and day < since) or (until and day >= until):
+                continue
+            total.merge(cell)
+            if group_by != "total":
+                if group_by == "sku_day":
+                    # One cell per group: share it (and its cached summary) instead of copying
+                    groups[(cell_sku, day)] = cell
+                    continue
+                k = (cell_sku,) if group_by == "sku" else (day,)
+                if k in groups:
+                    groups[k].merge(cell)
+                else:
+                    groups[k] = Rollup(cell.v)
+        return total, groups
+
+    def _save_locked(self) -> None:
+        payload = {
+            "cells": [[day, sku, r.v] for (day, sku), r in self.cells.items()],
+            "errored": self.errored,
+        }
+        try:
+            _write_atomic(self.path, json.dumps(payload))
+            self._saved_at = time.monotonic()
+            self._dirty = False
+        except Exception:
+            logger.exception("analytics_save_failed path=%s", self.path)
+
+    def save(self) -> None:
+        """Write pending changes (called on shutdown)."""
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.schemas import LINE_ITEM
+from app.state.store import DATA_DIR
+from a2a_common.wire import dumps_json
+
+
+logger = logging.getLogger("org0-broker")
+
+_SESSION_TS = re.compile(r"^session-(\d+)")
+
+SESSION_COLUMNS = [
+    "session_id", "created_at", "status", "artifact_type", "line", "sku", "quantity",
+    "unit_price", "total", "currency", "messages",
+]
+MESSAGE_COLUMNS = ["session_id", "created_at", "seq", "role", "content", "rationale", "transcript_response"]
+SESSION_FILES = ("transcript.json", "artifact.json", "checkpoint.json", "transcript.jsonl")
+# Stream writes are coalesced to about this size before being compressed or sent
+CHUNK_BYTES = 64 * 1024
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an ISO date/datetime (naive values are UTC) or a plain number."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+def session_time(session_id: str, path: Optional[Path] = None) -> float:
+    """Creation time encoded in ``session-<unix>-...`` ids, else the file's mtime."""
+    m = _SESSION_TS.match(session_id)
+    if m:
+        return float(m.group(1))
+    return path.stat().st_mtime if path is not None else 0.0
+
+
+def _read_json(path: Path) -> Any:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _bundle_status(checkpoint: Optional[Dict[str, Any]], artifact: Optional[Dict[str, Any]]) -> str:
+    status = (checkpoint or {}).get("status")
+    if status in ("running", "error"):
+        return status
+    return "agreed" if artifact else "no_deal"
+
+
+def load_loose_session(data_dir: Path, session_id: str) -> Dict[str, Any]:
+    """One finished session's per-session files as a bundle (the segment line format)."""
+    checkpoint = _read_json(data_dir / f"{session_id}-checkpoint.json")
+    artifact = _read_json(data_dir / f"{session_id}-artifact.json")
+    return {
+        "session_id": session_id,
+        "created_at": session_time(session_id, data_dir / f"{session_id}-transcript.json"),
+        "status": _bundle_status(checkpoint, artifact),
+        "task": (checkpoint or {}).get("task"),
+        "artifact": artifact,
+        "transcript": _read_json(data_dir / f"{session_id}-transcript.json") or [],
+        "metrics": (checkpoint or {}).get("metrics"),
+    }
+
+
+def _loose_session_ids(data_dir: Path) -> Iterator[str]:
+    # Only sessions that saved a final transcript; running ones have just a journal and checkpoint
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith("-transcript.json"):
+                yield entry.name[: -len("-transcript.json")]
+
+
+def iter_bundles(
+    data_dir: Path = DATA_DIR,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    sku: Optional[str] = None,
+    status: Optional[str] = None,
+    artifact_type: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Persisted sessions matching the filters, one at a time.
+
+    Compacted segments come first (oldest first), then loose per-session files in directory
+    order. Only one session is held in memory at a time. The date filter is applied to the
+    session id before any file is opened.
+    """
+
+    def wanted(bundle: Dict[str, Any]) -> bool:
+        artifact = bundle.get("artifact") or {}
+        if status and bundle["status"] != status:
+            return False
+        if artifact_type and artifact.get("type") != artifact_type:
+            return False
+        if sku and sku not in bundle_skus(bundle):
+            return False
+        return True
+
+    def in_range(ts: float) -> bool:
+        return (since is None or ts >= since) and (until is None or ts < until)
+
+    segment_dir = data_dir / "segments"
+    if segment_dir.exists():
+        for segment in sorted(segment_dir.glob("segment-*.jsonl.gz")):
+            with gzip.open(segment, "rt", encoding="utf-8") as f:
+                for line in f:
+                    bundle = json.loads(line)
+                    if in_range(bundle["created_at"]) and wanted(bundle):
+                        yield bundle
+
+    for session_id in _loose_session_ids(data_dir):
+        m = _SESSION_TS.match(session_id)
+        if m and not in_range(float(m.group(1))):
+            continue
+        try:
+            bundle = load_loose_session(data_dir, session_id)
+        except (OSError, ValueError):
+            logger.warning("export_skip session=%s", session_id)
+            continue
+        if in_range(bundle["created_at"]) and wanted(bundle):
+            yield bundle
+
+
+def quote_lines(artifact: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """A quote's priced lines: each line of a multi-SKU quote, else the quote itself (none without data)."""
+    data = (artifact or {}).get("data") or {}
+    return list(data.get("lines") or ([data] if data else []))
+
+
+def task_lines(task: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The order lines of a dumped multi-SKU task (empty for a single-SKU one)."""
+    return [p["data"] for p in (task or {}).get("parts") or () if p.get("type") == LINE_ITEM]
+
+
+def bundle_skus(bundle: Dict[str, Any]) -> List[str]:
+    """Every SKU a session negotiated: its quote lines, order lines and task SKU."""
+    task = bundle.get("task") or {}
+    lines = quote_lines(bundle.get("artifact")) + task_lines(task)
+    return [line["sku"] for line in lines if line.get("sku")] + ([task["sku"]] if task.get("sku") else [])
+
+
+def session_rows(bundles: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """One row per session, or per quote line of a multi-SKU deal: outcome plus the commercial fields."""
+    for b in bundles:
+        artifact = b.get("artifact") or {}
+        data = artifact.get("data") or {}
+        task = b.get("task") or {}
+        row = {
+            "session_id": b["session_id"],
+            "created_at": _iso(b["created_at"]),
+            "status": b["status"],
+            "artifact_type": artifact.get("type"),
+            "line": None,
+            "sku": data.get("sku") or task.get("sku"),
+            "quantity": data.get("quantity") or task.get("quantity"),
+            "unit_price": data.get("unit_price"),
+            "total": data.get("total"),
+            "currency": data.get("currency"),
+            "messages": len(b.get("transcript") or []),
+        }
+        if not data.get("lines"):
+            yield row
+            continue
+        for line in data["lines"]:
+            yield {
+                **row,
+                "line": line.get("line"),
+                "sku": line.get("sku"),
+                "quantity": line.get("quantity"),
+                "unit_price": line.get("unit_price"),
+                "total": line.get("total"),
+            }
+
+
+def message_rows(bundles: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """One row per transcript entry."""
+    for b in bundles:
+        created = _iso(b["created_at"])
+        for seq, m in enumerate(b.get("transcript") or []):
+            yield {
+                "session_id": b["session_id"],
+                "created_at": created,
+                "seq": seq,
+                "role": m.get("role"),
+                "content": m.get("content"),
+                "rationale": m.get("rationale", ""),
+                "transcript_response": m.get("transcript_response", ""),
+            }
+
+
+KINDS = {"sessions": (session_rows, SESSION_COLUMNS), "messages": (message_rows, MESSAGE_COLUMNS)}
+
+
+def encode_rows(rows: Iterable[Dict[str, Any]], fmt: str, columns: List[str]) -> Iterator[bytes]:
+    """``rows`` as JSONL or CSV (with header) lines, coalesced into ~CHUNK_BYTES pieces."""
+    buf = io.StringIO()
+    pending: List[bytes] = []
+    size = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+    for row in rows:
+        if fmt == "csv":
+            writer.writerow(row)
+            line = buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+        else:
+            line = dumps_json(row) + b"\n"
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if fmt == "csv" and buf.tell():
+        pending.insert(0, buf.getvalue().encode("utf-8"))
+    if pending:
+        yield b"".join(pending)
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Incremental gzip of ``chunks``; output is a single valid .gz member."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def export_stream(kind: str, fmt: str, compression: str, **filters: Any) -> Iterator[bytes]:
+    to_rows, columns = KINDS[kind]
+    chunks = encode_rows(to_rows(iter_bundles(**filters)), fmt, columns)
+    return gzip_stream(chunks) if compression == "gzip" else chunks
+
+
+def write_chunks(
+    out_dir: Path,
+    prefix: str,
+    kind: str,
+    fmt: str,
+    compression: str,
+    chunk_rows: int,
+    **filters: Any,
+) -> List[Tuple[Path, int]]:
+    """Export to ``<prefix>-0001.<fmt>[.gz]``, ... with at most ``chunk_rows`` rows each.
+
+    Each file is written under a temp name and renamed when complete. Returns (path, rows) pairs.
+    """
+    to_rows, columns = KINDS[kind]
+    rows = to_rows(iter_bundles(**filters))
+    suffix = f".{fmt}" + (".gz" if compression == "gzip" else "")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written: List[Tuple[Path, int]] = []
+    while True:
+        counted = 0
+
+        def limited() -> Iterator[Dict[str, Any]]:
+            nonlocal counted
+            for row in rows:
+                counted += 1
+                yield row
+                if counted >= chunk_rows:
+                    return
+
+        chunks = encode_rows(limited(), fmt, columns)
+        path = out_dir / f"{prefix}-{len(written) + 1:04d}{suffix}"
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            for piece in gzip_stream(chunks) if compression == "gzip" else chunks:
+                f.write(piece)
+        if not counted and written:
+            tmp.unlink()
+            break
+        os.replace(tmp, path)
+        written.append((path, counted))
+        if counted < chunk_rows:
+            break
+    return written
+
+
+def _session_files(data_dir: Path, session_id: str) -> List[Path]:
+    paths = (data_dir / f"{session_id}-{suffix}" for suffix in SESSION_FILES)
+    return [p for p in paths if p.exists()]
+
+
+def compact(
+    data_dir: Path = DATA_DIR,
+    segment_sessions: int = 1000,
+    min_age_s: float = 3600.0,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Roll finished per-session files into gzip JSONL segments under ``segments/``.
+
+    A session qualifies when its final transcript is older than ``min_age_s`` and it ended
+    in a deal or no deal. Running and failed sessions keep their files, so ``/api/resume``
+    never needs a compacted checkpoint. Each segment is fsynced
+    and renamed into place before its sessions' loose files are deleted. A crash between
+    the two steps leaves those sessions in both places until they are removed by hand.
+    The price index file is brought up to date first, so every deal in a segment is already
+    behind its watermark when its artifact file is deleted.
+    """
+    segment_dir = data_dir / "segments"
+    cutoff = time.time() - min_age_s
+    stats = {"segments": 0, "sessions": 0, "files_removed": 0, "bytes_before": 0, "bytes_after": 0}
+    batch: List[str] = []
+    out = None
+    tmp: Optional[Path] = None
+    stamp = int(time.time())
+    if not dry_run:
+        # Imported here: the price index rebuilds from this module's bundles
+        from app.state.price_index import PriceIndex
+
+        PriceIndex(data_dir / "price-index.json", data_dir).load()
+
+    def close_segment() -> None:
+        nonlocal out, tmp, batch
+        if out is None:
+            return
+        out.close()
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        final = tmp.with_name(tmp.name[: -len(".tmp")])
+        os.replace(tmp, final)
+        stats["segments"] += 1
+        stats["bytes_after"] += final.stat().st_size
+        for session_id in batch:
+            for path in _session_files(data_dir, session_id):
+                path.unlink()
+                stats["files_removed"] += 1
+        out, tmp, batch = None, None, []
+
+    for session_id in _loose_session_ids(data_dir):
+        transcript_path = data_dir / f"{session_id}-transcript.json"
+        try:
+            if transcript_path.stat().st_mtime > cutoff:
+                continue
+            bundle = load_loose_session(data_dir, session_id)
+        except (OSError, ValueError):
+            continue
+        if bundle["status"] in ("running", "error"):
+            continue
+        stats["sessions"] += 1
+        stats["bytes_before"] += sum(p.stat().st_size for p in _session_files(data_dir, session_id))
+        if dry_run:
+            continue
+        if out is None:
+            segment_dir.mkdir(parents=True, exist_ok=True)
+            tmp = segment_dir / f"segment-{stamp}-{stats['segments'] + 1:04d}.jsonl.gz.tmp"
+            out = gzip.open(tmp, "wb", compresslevel=6)
+        out.write(dumps_json(bundle) + b"\n")
+        batch.append(session_id)
+        if len(batch) >= segment_sessions:
+            close_segment()
+    close_segment()
+    return stats
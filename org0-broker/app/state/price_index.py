@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.state.export import iter_bundles, quote_lines
+from app.state.store import DATA_DIR, _write_atomic
+
+
+logger = logging.getLogger("org0-broker")
+
+INDEX_PATH = DATA_DIR / "price-index.json"
+# Percentiles are exact over the most recent deals per SKU; count/mean/min/max cover all of them
+WINDOW = int(os.getenv("PRICE_INDEX_WINDOW", "500"))
+# PRICE_INDEX_SAVE_INTERVAL_S: the index is written at most this often (and on shutdown);
+# deals lost in a crash are folded back in from their artifacts on the next load.
+SAVE_INTERVAL_S = float(os.getenv("PRICE_INDEX_SAVE_INTERVAL_S", "5"))
+
+
+class SkuPrices:
+    __slots__ = ("count", "total", "low", "high", "last", "recent", "window")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.low = float("inf")
+        self.high = float("-inf")
+        self.last = 0.0
+        # Insertion order (for eviction) and a sorted copy (for percentiles)
+        self.recent: List[float] = []
+        self.window: List[float] = []
+
+    def add(self, price: float) -> None:
+        self.count += 1
+        self.total += price
+        self.low = min(self.low, price)
+        self.high = max(self.high, price)
+        self.last = price
+        self.recent.append(price)
+        bisect.insort(self.window, price)
+        if len(self.recent) > WINDOW:
+            old = self.recent.pop(0)
+            del self.window[bisect.bisect_left(self.window, old)]
+
+    def percentile(self, pct: float) -> float:
+        idx = min(len(self.window) - 1, max(0, round(pct / 100.0 * (len(self.window) - 1))))
+        return self.window[idx]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "deals": self.count,
+            "mean": round(self.total / self.count, 2),
+            "last": self.last,
+            "min": self.low,
+            "max": self.high,
+            "p25": self.percentile(25),
+            "p50": self.percentile(50),
+            "p75": self.percentile(75),
+        }
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"count": self.count, "total": self.total, "min": self.low, "max": self.high, "last": self.last, "recent": self.recent}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "SkuPrices":
+        s = cls()
+        s.count, s.total, s.low, s.high, s.last = data["count"], data["total"], data["min"], data["max"], data["last"]
+        s.recent = list(data["recent"])[-WINDOW:]
+        s.window = sorted(s.recent)
+        return s
+
+
+class PriceIndex:
+    """Agreed unit prices per SKU, built from saved deals and kept current as deals close.
+
+    The index is persisted next to the artifacts with a watermark (newest artifact mtime
+    folded in), so a restart only scans artifacts written since the last save. Without a
+    readable index file it is rebuilt from every saved session, compacted segments included.
+    It is loaded on first use (or by the startup warm-up), not when the broker is imported.
+    """
+
+    def __init__(self, path: Path = INDEX_PATH, data_dir: Path = DATA_DIR):
+        self.path = path
+        self.data_dir = data_dir
+        self.skus: Dict[str, SkuPrices] = {}
+        self.watermark_ns = 0
+        self._loaded = False
+        self._dirty = False
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def load(self) -> "PriceIndex":
+        if self._loaded:
+            return self
+        with self._load_lock:
+            if self._loaded:
+                return self
+            raw = None
+            if self.path.exists():
+                try:
+                    raw = json.loads(self.path.read_text(encoding="utf-8"))
+                    self.skus = {sku: SkuPrices.from_json(v) for sku, v in raw.get("skus", {}).items()}
+                    self.watermark_ns = int(raw.get("watermark_ns", 0))
+                except Exception:
+                    logger.exception("price_index_load_failed path=%s; rebuilding", self.path)
+                    raw, self.skus, self.watermark_ns = None, {}, 0
+            added = self._scan() if raw is not None else self._rebuild()
+            self._loaded = True
+            if added:
+                self._dirty = True
+                self.save()
+        logger.info("price_index_loaded skus=%s scanned=%s", len(self.skus), added)
+        return self
+
+    def _rebuild(self) -> int:
+        """Fold in every agreed deal on disk; returns how many deals were added."""
+        deals = 0
+        for bundle in iter_bundles(self.data_dir, status="agreed"):
+            for line in quote_lines(bundle.get("artifact")):
+                self._add(str(line["sku"]), float(line["unit_price"]))
+            deals += 1
+        self.watermark_ns = max((path.stat().st_mtime_ns for path in self.data_dir.glob("*-artifact.json")), default=0)
+        return deals
+
+    def _scan(self) -> int:
+        """Fold in artifacts newer than the watermark; returns how many were added."""
+        newer = []
+        for path in self.data_dir.glob("*-artifact.json"):
+            mtime = path.stat().st_mtime_ns
+            if mtime > self.watermark_ns:
+                newer.append((mtime, path))
+        for mtime, path in sorted(newer):
+            try:
+                for line in quote_lines(json.loads(path.read_text(encoding="utf-8"))):
+                    self._add(str(line["sku"]), float(line["unit_price"]))
+            except Exception:
+                logger.warning("price_index_skip path=%s", path)
+            self.watermark_ns = max(self.watermark_ns, mtime)
+        return len(newer)
+
+    def _add(self, sku: str, price: float) -> None:
+        self.skus.setdefault(sku, SkuPrices()).add(price)
+
+    def record(self, sku: str, unit_price: float, artifact_path: Optional[Path] = None) -> None:
+        """Add a closed deal; pass its artifact file so a restart does not count it twice.
+
+        The file is rewritten at most every ``SAVE_INTERVAL_S``; this call may do it, so
+        callers on the event loop run it in a thread.
+        """
+        self.load()
+        with self._lock:
+            self._add(sku, unit_price)
+            if artifact_path is not None and artifact_path.exists():
+                self.watermark_ns = max(self.watermark_ns, artifact_path.stat().st_mtime_ns)
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= SAVE_INTERVAL_S
+        if due:
+            self.save()
+
+    def names(self) -> List[str]:
+        self.load()
+        with self._lock:
+            return list(self.skus)
+
+    def summary(self, sku: str) -> Optional[Dict[str, Any]]:
+        self.load()
+        with self._lock:
+            entry = self.skus.get(sku)
+            return entry.summary() if entry and entry.count else None
+
+    def save(self) -> None:
+        """Write the index if anything changed since the last write (shutdown hook too)."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                payload = {"watermark_ns": self.watermark_ns, "skus": {sku: s.to_json() for sku, s in self.skus.items()}}
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            try:
+                _write_atomic(self.path, json.dumps(payload))
+            except Exception:
+                logger.exception("price_index_save_failed path=%s", self.path)
+                with self._lock:
+                    self._dirty = True
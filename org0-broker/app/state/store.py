@@ -1,19 +1,21 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from app.schemas import Artifact, Message, Transcript
+from app.schemas import Artifact, TranscriptRecord
 
 
-DATA_DIR = Path(__file__).resolve().parents[1] / "state" / "data"
+# BROKER_DATA_DIR: where sessions, artifacts and rollups are kept (default app/state/data)
+DATA_DIR = Path(os.getenv("BROKER_DATA_DIR", Path(__file__).resolve().parents[1] / "state" / "data"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def save_transcript(session_id: str, messages: List[Message]) -> Path:
+def save_transcript(session_id: str, messages: List[TranscriptRecord]) -> Path:
     path = DATA_DIR / f"{session_id}-transcript.json"
-    payload = [m.model_dump() for m in messages]
+    payload = [m.to_dict() for m in messages]
     path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
     return path
 
@@ -26,3 +28,81 @@ def save_artifact(session_id: str, artifact: Optional[Artifact]) -> Optional[Pat
     return path
 
 
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def append_transcript_journal(session_id: str, messages: List[TranscriptRecord]) -> None:
+    """Append messages to the per-session JSONL journal (one line per transcript entry)."""
+    if not messages:
+        return
+    path = DATA_DIR / f"{session_id}-transcript.jsonl"
+    with path.open("a", encoding="utf-8") as f:
+        for m in messages:
+            f.write(json.dumps(m.to_dict(), ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def append_narrative_patch(session_id: str, index: int, message: TranscriptRecord) -> None:
+    """Journal the late narrative of the already journaled entry at ``index`` (a streamed reply)."""
+    path = DATA_DIR / f"{session_id}-transcript.jsonl"
+    patch = {"patch": index, "rationale": message.rationale, "transcript_response": message.transcript_response}
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(patch, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_transcript_journal(session_id: str, offset: int) -> List[TranscriptRecord]:
+    """First ``offset`` journaled messages, with their narrative patches; entries past a checkpoint are ignored."""
+    path = DATA_DIR / f"{session_id}-transcript.jsonl"
+    messages: List[TranscriptRecord] = []
+    if not path.exists():
+        return messages
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if "patch" in entry:
+                if entry["patch"] < len(messages):
+                    messages[entry["patch"]].rationale = entry["rationale"]
+                    messages[entry["patch"]].transcript_response = entry["transcript_response"]
+            elif len(messages) < offset:
+                messages.append(TranscriptRecord.from_dict(entry))
+    return messages
+
+
+def truncate_transcript_journal(session_id: str, offset: int) -> None:
+    """Drop journal lines written after the checkpoint at ``offset``; patches are folded into their entries."""
+    messages = load_transcript_journal(session_id, offset)
+    path = DATA_DIR / f"{session_id}-transcript.jsonl"
+    _write_atomic(path, "".join(json.dumps(m.to_dict(), ensure_ascii=False) + "\n" for m in messages))
+
+
+def save_checkpoint(session_id: str, checkpoint: Dict[str, Any]) -> Path:
+    path = DATA_DIR / f"{session_id}-checkpoint.json"
+    _write_atomic(path, json.dumps(checkpoint))
+    return path
+
+
+def load_checkpoint(session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Checkpoint for ``session_id``, or the most recent one still running."""
+    if session_id:
+        path = DATA_DIR / f"{session_id}-checkpoint.json"
+        return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+    candidates = sorted(DATA_DIR.glob("*-checkpoint.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in candidates:
+        cp = json.loads(path.read_text(encoding="utf-8"))
+        if cp.get("status") == "running":
+            return cp
+    return None
+
+
+def update_checkpoint_status(session_id: str, status: str, **fields: Any) -> None:
+    cp = load_checkpoint(session_id)
+    if cp is not None:
+        cp["status"] = status
+        cp.update(fields)
+        save_checkpoint(session_id, cp)
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keeps this directory on sys.path for ``app`` imports; sessions written by tests go to a temp dir
+os.environ.setdefault("BROKER_DATA_DIR", tempfile.mkdtemp(prefix="broker-tests-"))
@@ -0,0 +1,65 @@
+"""Export bundles (the segment line format) for the export and analytics tests."""
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+CREATED_AT = 1792368000.0  # 2026-10-18 UTC
+
+
+def _reply(role: str, content: str, decisions: Dict[str, Any] = None) -> Dict[str, Any]:
+    parts = [{"type": "line_decision", "data": {"line": line, "status": s, "price": p}} for line, (s, p) in (decisions or {}).items()]
+    return {"role": role, "content": content, "rationale": "", "transcript_response": "", "parts": parts}
+
+
+SINGLE = {
+    "session_id": "session-1792368000-single",
+    "created_at": CREATED_AT,
+    "status": "agreed",
+    "task": {"subject": "Buy laptops", "sku": "MACBOOK-PRO-14", "quantity": 20, "target_price": 1789.0, "parts": []},
+    "artifact": {"type": "quote", "data": {"sku": "MACBOOK-PRO-14", "quantity": 20, "unit_price": 1899.0, "total": 37980.0, "currency": "USD"}},
+    "transcript": [
+        _reply("MayLim", "We want to buy 20 units"),
+        _reply("Kumar", "Offer: $1949.00"),
+        _reply("MayLim", "Accepted at $1899.00"),
+    ],
+    "metrics": {"org1": {"ms": 300.0, "turns": 1}, "org2": {"ms": 500.0, "turns": 1}},
+}
+
+LINES = [
+    {"line": "L1", "sku": "MACBOOK-PRO-14", "quantity": 20, "target_price": 1789.0},
+    {"line": "L2", "sku": "IPAD-AIR-11", "quantity": 10, "target_price": 549.0},
+    {"line": "L3", "sku": "AIRPODS-PRO", "quantity": 50, "target_price": 219.0},
+]
+MULTI_LINE = {
+    "session_id": "session-1792368000-lines",
+    "created_at": CREATED_AT,
+    "status": "agreed",
+    "task": {
+        "subject": "Buy 3 items", "sku": "MULTI", "quantity": 80, "target_price": 618.0,
+        "parts": [{"type": "line_item", "data": line} for line in LINES],
+    },
+    "artifact": {"type": "quote", "data": {
+        "lines": [
+            {"line": "L1", "sku": "MACBOOK-PRO-14", "quantity": 20, "unit_price": 1899.0, "total": 37980.0},
+            {"line": "L3", "sku": "AIRPODS-PRO", "quantity": 50, "unit_price": 229.0, "total": 11450.0},
+        ],
+        "quantity": 70, "total": 49430.0, "currency": "USD", "no_deal_lines": ["L2"],
+    }},
+    "transcript": [
+        _reply("MayLim", "We want to buy 3 items"),
+        _reply("Kumar", "counter per line", {"L1": ("counter", 1949.0), "L2": ("counter", 599.0), "L3": ("counter", 249.0)}),
+        _reply("MayLim", "counter per line", {"L1": ("accepted", None), "L2": ("reject", None), "L3": ("counter", 229.0)}),
+        _reply("Kumar", "accepted per line", {"L3": ("accepted", None)}),
+    ],
+    "metrics": {"org1": {"ms": 300.0, "turns": 1}, "org2": {"ms": 500.0, "turns": 2}},
+}
+
+
+def write_loose(data_dir: Path, bundle: Dict[str, Any]) -> None:
+    """Save ``bundle`` as a finished session's per-session files."""
+    session_id = bundle["session_id"]
+    checkpoint = {"session_id": session_id, "status": "completed", "task": bundle["task"], "metrics": bundle["metrics"]}
+    (data_dir / f"{session_id}-checkpoint.json").write_text(json.dumps(checkpoint), encoding="utf-8")
+    (data_dir / f"{session_id}-transcript.json").write_text(json.dumps(bundle["transcript"]), encoding="utf-8")
+    if bundle["artifact"]:
+        (data_dir / f"{session_id}-artifact.json").write_text(json.dumps(bundle["artifact"]), encoding="utf-8")
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app.main as broker
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Wire two FakeOrgs into ``run_negotiation``; returns what the session fed to the price index and analytics."""
+    recorded = SimpleNamespace(prices=[], analytics=[])
+    monkeypatch.setattr(broker.PRICE_INDEX, "record", lambda sku, price, path: recorded.prices.append((sku, price)))
+    monkeypatch.setattr(broker.ANALYTICS, "record", recorded.analytics.append)
+    monkeypatch.setattr(broker, "conclude_with_groq", lambda transcript, artifact: {"content": "Broker conclusion."})
+
+    def install(buyer, seller):
+        orgs = {buyer.base_url: buyer, seller.base_url: seller}
+        links = {org: SimpleNamespace(base_url=agent.base_url, wire_format="json", streaming=False) for org, agent in (("org1", buyer), ("org2", seller))}
+
+        async def connect(client):
+            return links
+
+        monkeypatch.setattr(broker.ORG_LINKS, "connect", connect)
+        monkeypatch.setattr(broker, "RemoteA2aAgent", lambda base_url, *args: orgs[base_url])
+        return recorded
+
+    return install
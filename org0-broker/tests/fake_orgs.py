@@ -0,0 +1,32 @@
+import httpx
+
+
+class FakeOrg:
+    """Stands in for RemoteA2aAgent: answers turns from a script of ``(status, content)``."""
+
+    def __init__(self, base_url, replies=(), outcome_reply=None, down=False):
+        self.base_url = base_url
+        self.streaming = False
+        self.backpressure = {}
+        self.turns = 0
+        self.elapsed_s = 0.0
+        self.replies = list(replies)
+        self.outcome_reply = outcome_reply or {"ok": True}
+        self.down = down
+        self.outcomes = []
+        self.tasks = []
+
+    async def create_task(self, client, task):
+        if self.down:
+            raise httpx.ConnectError(f"{self.base_url} is down")
+        self.tasks.append(task)
+        return "t-1"
+
+    async def send_message(self, client, task_id, message, message_id=None):
+        status, content = self.replies.pop(0)
+        self.turns += 1
+        return {"status": status, "reply": {"role": "agent", "content": content}}
+
+    async def report_outcome(self, client, task_id, outcome):
+        self.outcomes.append(outcome.status)
+        return self.outcome_reply
@@ -0,0 +1,37 @@
+from app.state.analytics import Analytics, session_facts
+
+from bundles import MULTI_LINE, SINGLE, write_loose
+
+
+def test_single_sku_session_is_one_contribution():
+    (facts,) = session_facts(SINGLE)
+    assert (facts["sku"], facts["status"], round(facts["discount_pct"], 2)) == ("MACBOOK-PRO-14", "agreed", 2.57)
+    assert facts["llm_calls"] == 3
+
+
+def test_multi_line_session_contributes_once_per_line():
+    facts = session_facts(MULTI_LINE)
+    assert [(f["sku"], f["status"]) for f in facts] == [
+        ("MACBOOK-PRO-14", "agreed"), ("IPAD-AIR-11", "no_deal"), ("AIRPODS-PRO", "agreed"),
+    ]
+    # Each line is discounted against the seller's opening price for that line
+    assert [None if f["discount_pct"] is None else round(f["discount_pct"], 2) for f in facts] == [2.57, None, 8.03]
+    # Session-wide counts are not multiplied by the number of lines
+    assert [f["llm_calls"] for f in facts] == [4, 0, 0]
+    assert [bool(f["latency"]) for f in facts] == [True, False, False]
+
+
+def test_rollups_by_sku_include_every_line_and_survive_a_rebuild(tmp_path):
+    analytics = Analytics(tmp_path / "analytics.json", tmp_path)
+    analytics.rebuild()
+    analytics.record(MULTI_LINE)
+    by_sku = {g["sku"]: g for g in analytics.query("sku")["groups"]}
+    assert {sku: (g["sessions"], g["agreed"], g["no_deal"]) for sku, g in by_sku.items()} == {
+        "MACBOOK-PRO-14": (1, 1, 0), "IPAD-AIR-11": (1, 0, 1), "AIRPODS-PRO": (1, 1, 0),
+    }
+    assert analytics.query("total")["total"]["llm_calls"] == 4
+
+    write_loose(tmp_path, MULTI_LINE)
+    rebuilt = Analytics(tmp_path / "rebuilt.json", tmp_path)
+    rebuilt.rebuild()
+    assert rebuilt.query("sku")["groups"] == analytics.query("sku")["groups"]
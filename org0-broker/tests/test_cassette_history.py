@@ -0,0 +1,32 @@
+import asyncio
+
+import app.main as broker
+from app.state.price_index import PriceIndex
+from fake_orgs import FakeOrg
+
+
+def deal(session, mode, monkeypatch):
+    """One default /api/start session that closes a deal; returns the task the seller got."""
+    monkeypatch.setenv("LLM_CASSETTE_MODE", mode)
+    buyer = FakeOrg("http://org1", [("accepted", "Accepted at $1949.00")])
+    seller = FakeOrg("http://org2", [("counter", "Offer: $1949.00")])
+    session(buyer, seller)
+    result = asyncio.run(broker.start_negotiation(broker.StartRequest(), wait=True))
+    assert result["status"] == "completed"
+    return seller.tasks[0]
+
+
+def test_replay_after_a_recorded_deal_sends_the_same_task(session, monkeypatch, tmp_path):
+    monkeypatch.setattr(broker, "PRICE_INDEX", PriceIndex(tmp_path / "price-index.json", tmp_path))
+    recorded = deal(session, "record", monkeypatch)
+    replayed = deal(session, "replay", monkeypatch)
+    # Prompts (and so cassette keys) come from the task: nothing may drift between the runs
+    assert replayed.model_dump(exclude={"task_id"}) == recorded.model_dump(exclude={"task_id"})
+    assert "price_history" not in replayed.context
+    assert broker.PRICE_INDEX.summary("MACBOOK-PRO-14") is None
+
+
+def test_history_is_shared_without_cassettes(session, monkeypatch, tmp_path):
+    monkeypatch.setattr(broker, "PRICE_INDEX", PriceIndex(tmp_path / "price-index.json", tmp_path))
+    deal(session, "off", monkeypatch)
+    assert deal(session, "off", monkeypatch).context["price_history"]["last"] == 1949.0
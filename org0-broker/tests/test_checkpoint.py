@@ -0,0 +1,43 @@
+import json
+
+import app.main as broker
+from app.schemas import Task, TranscriptRecord
+from app.state.store import (
+    DATA_DIR,
+    append_narrative_patch,
+    load_transcript_journal,
+    truncate_transcript_journal,
+)
+
+TASK = Task(subject="Buy laptops", sku="MACBOOK-PRO-14", quantity=20, target_price=1789.0)
+
+
+def test_checkpoint_journals_a_turn_before_its_narrative_arrives():
+    sess = broker.new_session("session-checkpoint-early")
+    reply = TranscriptRecord("org2", "Offer: $1949.00")
+    sess["transcript"] = [TranscriptRecord("broker", "Quote please"), reply]
+    assert broker.checkpoint(sess, TASK, 0, turn=1) == sess["journaled"] == 2
+
+    # The narrative lands after the round was journaled
+    reply.rationale, reply.transcript_response = "Margin floor", "We can do $1949."
+    append_narrative_patch("session-checkpoint-early", 1, reply)
+    messages = load_transcript_journal("session-checkpoint-early", 2)
+    assert [m.content for m in messages] == ["Quote please", "Offer: $1949.00"]
+    assert messages[1].rationale == "Margin floor"
+    assert messages[1].transcript_response == "We can do $1949."
+
+
+def test_truncate_folds_patches_and_drops_entries_past_the_checkpoint():
+    sess = broker.new_session("session-checkpoint-truncate")
+    reply = TranscriptRecord("org2", "Offer: $1949.00", rationale="Margin floor")
+    sess["transcript"] = [reply]
+    journaled = broker.checkpoint(sess, TASK, 0, turn=1)
+    append_narrative_patch("session-checkpoint-truncate", 0, reply)
+    sess["transcript"].append(TranscriptRecord("org1", "Counter: $1800.00"))
+    broker.checkpoint(sess, TASK, journaled, turn=2)
+
+    truncate_transcript_journal("session-checkpoint-truncate", 1)
+    lines = (DATA_DIR / "session-checkpoint-truncate-transcript.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert "patch" not in json.loads(lines[0])
+    assert load_transcript_journal("session-checkpoint-truncate", 1)[0].rationale == "Margin floor"
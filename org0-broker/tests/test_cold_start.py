@@ -0,0 +1,15 @@
+import app.main as broker
+from app.state.analytics import Analytics
+from app.state.price_index import PriceIndex
+
+
+def test_history_is_not_read_at_import():
+    assert not PriceIndex()._loaded and not Analytics()._loaded
+    assert isinstance(broker.PRICE_INDEX, PriceIndex)
+
+
+def test_history_loads_on_first_use(tmp_path):
+    index = PriceIndex(tmp_path / "price-index.json", tmp_path)
+    assert index.summary("A") is None and index._loaded
+    analytics = Analytics(tmp_path / "analytics.json", tmp_path)
+    assert analytics.query("total")["total"]["sessions"] == 0 and analytics._loaded
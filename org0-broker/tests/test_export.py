@@ -0,0 +1,28 @@
+from app.state.export import iter_bundles, session_rows
+from app.state.store import DATA_DIR
+
+from bundles import MULTI_LINE, SINGLE, write_loose
+
+
+def test_single_sku_session_is_one_row():
+    (row,) = session_rows([SINGLE])
+    assert (row["line"], row["sku"], row["quantity"], row["unit_price"], row["total"]) == (None, "MACBOOK-PRO-14", 20, 1899.0, 37980.0)
+
+
+def test_multi_line_deal_gets_one_row_per_quote_line():
+    rows = list(session_rows([MULTI_LINE]))
+    assert [(r["line"], r["sku"], r["quantity"], r["unit_price"], r["total"]) for r in rows] == [
+        ("L1", "MACBOOK-PRO-14", 20, 1899.0, 37980.0),
+        ("L3", "AIRPODS-PRO", 50, 229.0, 11450.0),
+    ]
+    assert {r["session_id"] for r in rows} == {MULTI_LINE["session_id"]}
+    assert all(r["currency"] == "USD" and r["status"] == "agreed" for r in rows)
+
+
+def test_sku_filter_matches_any_line_of_a_multi_line_session():
+    write_loose(DATA_DIR, MULTI_LINE)
+    found = lambda sku: [b["session_id"] for b in iter_bundles(DATA_DIR, sku=sku)]
+    assert MULTI_LINE["session_id"] in found("AIRPODS-PRO")
+    # Not bought, but negotiated
+    assert MULTI_LINE["session_id"] in found("IPAD-AIR-11")
+    assert MULTI_LINE["session_id"] not in found("IPHONE-15")
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.negotiation import AGREED, FAILED, REJECTED, TURN_LIMIT, LineItemEngine, Side
+from app.schemas import LINE_DECISION, LINE_ITEM, LINE_OFFER, Message, Part, Task, TranscriptRecord, line_parts
+
+LINES = [
+    {"line": "1", "sku": "MACBOOK-PRO-14", "quantity": 20, "target_price": 1789.0},
+    {"line": "2", "sku": "IPAD-AIR-11", "quantity": 10, "target_price": 549.0},
+]
+TASK = Task(
+    subject="Buy laptops and tablets", sku="MACBOOK-PRO-14", quantity=30, target_price=1375.67,
+    constraints={"turn_limit": 3}, parts=[Part(type=LINE_ITEM, data=line) for line in LINES],
+)
+
+
+def negotiate(script):
+    """Run a LineItemEngine whose sides answer from ``script``: (side, status, {line: (status, price)}) per turn."""
+    script, offers = list(script), []
+
+    async def send(side, message, message_id):
+        expected_side, status, decisions = script.pop(0)
+        assert side.role == expected_side
+        offers.append(line_parts(message, LINE_OFFER))
+        if status == "raise":
+            raise ConnectionError("org down")
+        parts = [Part(type=LINE_DECISION, data={"line": line, "status": s, "price": p}) for line, (s, p) in decisions.items()]
+        reply = Message(role=side.role, content=f"{status} per line", parts=parts)
+        return {"status": status, "reply": reply.model_dump()}, TranscriptRecord(role=side.role, content=reply.content)
+
+    engine = LineItemEngine(
+        "session-lines", TASK, [],
+        buyer=Side("org1", "buyer", None, "t-1"),
+        seller=Side("org2", "seller", None, "t-2"),
+        send=send,
+    )
+    state = asyncio.run(engine.run())
+    assert script == []
+    return engine, state, offers
+
+
+def test_lines_settle_on_their_own():
+    engine, state, offers = negotiate([
+        ("seller", "counter", {"1": ("counter", 1949.0), "2": ("counter", 599.0)}),
+        ("buyer", "counter", {"1": ("accepted", None), "2": ("counter", 560.0)}),
+        ("seller", "reject", {"2": ("reject", None)}),
+    ])
+    assert state == AGREED
+    assert [(line["line"], line["price"]) for line in engine.agreed_lines()] == [("1", 1949.0)]
+    assert engine.lines["2"]["state"] == "rejected"
+    # Only the open line is put to the seller again, at the buyer's counter
+    assert offers[2] == {"2": {"line": "2", "sku": "IPAD-AIR-11", "quantity": 10, "price": 560.0}}
+    assert engine.transcript[-1].content == "Broker: 1 of 2 lines agreed. Proceed paperwork."
+
+
+def test_line_rejected_at_the_opening_drops_out():
+    engine, state, offers = negotiate([
+        ("seller", "counter", {"1": ("counter", 1949.0), "2": ("reject", None)}),
+        ("buyer", "accepted", {"1": ("accepted", None)}),
+    ])
+    assert state == AGREED
+    assert engine.lines["2"]["state"] == "rejected"
+    assert list(offers[1]) == ["1"]
+
+
+def test_every_line_rejected_ends_as_rejected():
+    engine, state, _ = negotiate([("seller", "reject", {})])
+    assert state == REJECTED
+    assert all(line["state"] == "rejected" for line in engine.lines.values())
+
+
+def test_unanswered_line_keeps_the_fallback_price():
+    engine, state, _ = negotiate([
+        ("seller", "counter", {"1": ("counter", 1949.0)}),
+        ("buyer", "reject", {"1": ("reject", None), "2": ("reject", None)}),
+    ])
+    assert state == REJECTED
+    # No history for the SKU: the opening fallback
+    assert engine.lines["2"]["offers"]["seller"] == 1900.0
+
+
+def test_open_lines_at_the_turn_limit_are_not_agreed():
+    round_ = [
+        ("buyer", "counter", {"1": ("counter", 1850.0), "2": ("accepted", None)}),
+        ("seller", "counter", {"1": ("counter", 1940.0)}),
+    ]
+    engine, state, _ = negotiate([("seller", "counter", {"1": ("counter", 1949.0), "2": ("counter", 599.0)})] + round_ + [
+        ("buyer", "counter", {"1": ("counter", 1860.0)}),
+        ("seller", "counter", {"1": ("counter", 1930.0)}),
+        ("buyer", "counter", {"1": ("counter", 1870.0)}),
+        ("seller", "counter", {"1": ("counter", 1920.0)}),
+    ])
+    assert state == TURN_LIMIT
+    assert engine.lines["1"]["state"] == "open"
+    assert [line["line"] for line in engine.agreed_lines()] == ["2"]
+
+
+def test_a_failed_turn_ends_as_failed():
+    engine, state, _ = negotiate([("seller", "raise", {})])
+    assert state == FAILED
+    assert engine.open_lines() == ["1", "2"]
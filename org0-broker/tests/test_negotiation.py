@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.negotiation import (
+    AGREED, BUYER_TURN, FAILED, OPENING, REJECTED, SELLER_TURN, TABLE, TURN_LIMIT, NegotiationEngine, Side,
+)
+from app.schemas import Task, TranscriptRecord
+
+TASK = Task(subject="Buy laptops", sku="MACBOOK-PRO-14", quantity=20, target_price=1789.0, constraints={"turn_limit": 4})
+
+
+def negotiate(script, task=TASK):
+    """Run an engine whose sides answer from ``script``: (side, status, content) per turn."""
+    script, sent = list(script), []
+
+    async def send(side, message, message_id):
+        expected_side, status, content = script.pop(0)
+        assert side.role == expected_side
+        sent.append(message.content)
+        if status == "raise":
+            raise ConnectionError("org down")
+        return {"status": status}, TranscriptRecord(role=side.role, content=content)
+
+    engine = NegotiationEngine(
+        "session-test", task, [],
+        buyer=Side("org1", "buyer", None, "t-1"),
+        seller=Side("org2", "seller", None, "t-2"),
+        send=send,
+    )
+    state = asyncio.run(engine.run())
+    assert script == []
+    return engine, state, sent
+
+
+@pytest.mark.parametrize("state", [OPENING, BUYER_TURN, SELLER_TURN])
+def test_every_turn_ends_on_reject_and_error(state):
+    assert TABLE[state].on["reject"] == REJECTED
+    assert TABLE[state].on["error"] == FAILED
+
+
+def test_seller_reject_at_opening_ends_without_a_buyer_turn():
+    engine, state, sent = negotiate([("seller", "reject", "Cannot supply 20 units")])
+    assert state == REJECTED
+    assert len(sent) == 1 and engine.offers == {}
+    assert engine.transcript[-1].content == "Broker: seller rejected. Cannot proceed."
+
+
+def test_buyer_accepts_the_seller_offer():
+    engine, state, sent = negotiate([
+        ("seller", "counter", "Offer: $1949.00"),
+        ("buyer", "accepted", "Accepted"),
+    ])
+    assert state == AGREED
+    # No price in the acceptance: the offer put to the buyer stands
+    assert engine.price_agreed == 1949.0
+    assert sent[1].startswith("Seller offer: $1949.00")
+
+
+def test_counters_alternate_until_the_seller_accepts():
+    engine, state, sent = negotiate([
+        ("seller", "counter", "Offer: $1949.00"),
+        ("buyer", "counter", "Counter: $1850.00"),
+        ("seller", "accepted", "Accepted at $1850.00"),
+    ])
+    assert state == AGREED and engine.price_agreed == 1850.0
+    assert sent[2].startswith("Buyer counter: $1850.00")
+
+
+def test_missing_prices_use_the_fallbacks():
+    engine, state, sent = negotiate([
+        ("seller", "counter", "Here is our quote"),
+        ("buyer", "counter", "Too high"),
+        ("seller", "reject", "No"),
+    ])
+    assert state == REJECTED
+    assert engine.offers == {"seller": 1900.0, "buyer": 1890.0}
+
+
+def test_turn_limit_stops_before_the_next_buyer_turn():
+    rounds = [("buyer", "counter", "Counter: $1850.00"), ("seller", "counter", "Offer: $1940.00")]
+    engine, state, _ = negotiate([("seller", "counter", "Offer: $1949.00")] + rounds * 4)
+    assert state == TURN_LIMIT and engine.turn == 4
+    assert engine.transcript[-1].content == "Broker: turn limit reached. No agreement."
+
+
+def test_a_failed_turn_ends_as_failed():
+    engine, state, _ = negotiate([("seller", "counter", "Offer: $1949.00"), ("buyer", "raise", "")])
+    assert state == FAILED
+    assert "did not respond in time" in engine.transcript[-1].content
@@ -0,0 +1,40 @@
+import asyncio
+
+import app.main as broker
+from app.schemas import Task
+from app.state.store import DATA_DIR
+from fake_orgs import FakeOrg
+
+TASK = Task(subject="Buy laptops", sku="MACBOOK-PRO-14", quantity=20, target_price=1789.0, constraints={"turn_limit": 7})
+
+
+def negotiate(outcome_reply=None):
+    buyer = FakeOrg("http://org1", [("accepted", "Accepted at $1949.00")])
+    seller = FakeOrg("http://org2", [("counter", "Offer: $1949.00")], outcome_reply=outcome_reply)
+    return buyer, seller
+
+
+def test_agreed_deal_is_committed_by_both_orgs(session):
+    buyer, seller = negotiate()
+    recorded = session(buyer, seller)
+    sess = broker.new_session("session-1-agreed")
+    result = asyncio.run(broker.run_negotiation(sess, TASK, None))
+    assert result["status"] == "completed"
+    assert sess["artifact"].data["unit_price"] == 1949.0
+    assert (seller.outcomes, buyer.outcomes) == (["accepted"], ["accepted"])
+    assert recorded.prices == [("MACBOOK-PRO-14", 1949.0)]
+    assert recorded.analytics[0]["status"] == "agreed"
+
+
+def test_seller_refusing_the_outcome_ends_without_a_deal(session):
+    buyer, seller = negotiate(outcome_reply={"ok": False, "reason": "insufficient_stock"})
+    recorded = session(buyer, seller)
+    sess = broker.new_session("session-1-refused")
+    asyncio.run(broker.run_negotiation(sess, TASK, None))
+    assert sess["artifact"] is None
+    # The buyer releases its reservation instead of committing a deal that did not happen
+    assert (seller.outcomes, buyer.outcomes) == (["accepted"], ["rejected"])
+    assert recorded.prices == []
+    assert recorded.analytics[0]["status"] == "no_deal"
+    assert sess["transcript"][-1].content.startswith("Broker: seller cannot supply")
+    assert not (DATA_DIR / "session-1-refused-artifact.json").exists()
@@ -0,0 +1,47 @@
+import json
+import os
+
+from app.state import price_index
+from app.state.export import compact
+from app.state.price_index import PriceIndex
+
+
+def save_deal(data_dir, session_id, artifact_data):
+    (data_dir / f"{session_id}-transcript.json").write_text("[]", encoding="utf-8")
+    (data_dir / f"{session_id}-artifact.json").write_text(json.dumps({"type": "quote", "data": artifact_data}), encoding="utf-8")
+
+
+def test_record_saves_at_most_once_per_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_index, "SAVE_INTERVAL_S", 3600.0)
+    index = PriceIndex(tmp_path / "price-index.json", tmp_path).load()
+    index.record("A", 100.0)
+    index.record("A", 110.0)
+    saved = json.loads(index.path.read_text(encoding="utf-8"))
+    assert saved["skus"]["A"]["count"] == 1
+    index.save()
+    assert json.loads(index.path.read_text(encoding="utf-8"))["skus"]["A"]["count"] == 2
+
+
+def test_restart_folds_in_deals_the_last_save_missed(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_index, "SAVE_INTERVAL_S", 3600.0)
+    index = PriceIndex(tmp_path / "price-index.json", tmp_path).load()
+    save_deal(tmp_path, "session-1-a", {"sku": "A", "unit_price": 100.0})
+    index.record("A", 100.0, tmp_path / "session-1-a-artifact.json")
+    save_deal(tmp_path, "session-2-b", {"sku": "A", "unit_price": 120.0})
+    later = (tmp_path / "session-1-a-artifact.json").stat().st_mtime_ns + 1_000_000
+    os.utime(tmp_path / "session-2-b-artifact.json", ns=(later, later))
+    index.record("A", 120.0, tmp_path / "session-2-b-artifact.json")
+    restarted = PriceIndex(index.path, tmp_path).load()
+    assert restarted.summary("A")["deals"] == 2
+
+
+def test_index_is_rebuilt_from_compacted_segments(tmp_path):
+    save_deal(tmp_path, "session-1-a", {"sku": "A", "unit_price": 100.0})
+    save_deal(tmp_path, "session-2-b", {"lines": [{"sku": "A", "unit_price": 90.0}, {"sku": "B", "unit_price": 50.0}]})
+    stats = compact(tmp_path, min_age_s=-1)
+    assert stats["sessions"] == 2 and not list(tmp_path.glob("*-artifact.json"))
+    # Compaction brought the index file up to date before deleting the artifacts
+    assert PriceIndex(tmp_path / "price-index.json", tmp_path).load().summary("A")["deals"] == 2
+    (tmp_path / "price-index.json").unlink()
+    rebuilt = PriceIndex(tmp_path / "price-index.json", tmp_path).load()
+    assert rebuilt.summary("A")["deals"] == 2 and rebuilt.summary("B")["p50"] == 50.0
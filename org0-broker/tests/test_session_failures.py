@@ -0,0 +1,65 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import app.main as broker
+from app.negotiation import NegotiationEngine
+from app.scheduler import SessionScheduler
+from app.schemas import Task
+from app.state.store import DATA_DIR, save_checkpoint
+from fake_orgs import FakeOrg
+
+TASK = Task(subject="Buy laptops", sku="MACBOOK-PRO-14", quantity=20, target_price=1789.0)
+
+
+def test_org_down_at_task_creation_ends_the_session_as_error(session):
+    recorded = session(FakeOrg("http://org1"), FakeOrg("http://org2", down=True))
+    sess = broker.new_session("session-2-org-down")
+    save_checkpoint(sess["session_id"], {"session_id": sess["session_id"], "status": "running"})
+    result = asyncio.run(broker.run_negotiation(sess, TASK, None))
+    assert result["status"] == sess["status"] == "error"
+    assert recorded.analytics[0]["status"] == "error"
+    checkpoint = json.loads((DATA_DIR / "session-2-org-down-checkpoint.json").read_text(encoding="utf-8"))
+    assert checkpoint["status"] == "error"
+    assert (DATA_DIR / "session-2-org-down-transcript.json").exists()
+
+
+def test_engine_crash_ends_the_session_as_error(session, monkeypatch):
+    buyer, seller = FakeOrg("http://org1"), FakeOrg("http://org2", [("counter", "Offer: $1949.00")])
+    recorded = session(buyer, seller)
+
+    async def crash(self):
+        await self.step()
+        raise RuntimeError("engine bug")
+
+    monkeypatch.setattr(NegotiationEngine, "run", crash)
+    sess = broker.new_session("session-2-engine-crash")
+    asyncio.run(broker.run_negotiation(sess, TASK, None))
+    assert sess["status"] == "error"
+    assert [m.content for m in sess["transcript"]] == ["Offer: $1949.00"]
+    assert recorded.analytics[0]["metrics"]["org2"]["turns"] == 1
+    assert buyer.outcomes == seller.outcomes == []
+
+
+def test_scheduler_frees_the_worker_of_a_failed_job():
+    async def scenario():
+        scheduler = SessionScheduler(workers=1)
+
+        async def fail():
+            raise RuntimeError("org down")
+
+        async def succeed():
+            return "done"
+
+        deadline = time.monotonic() + 10
+        failed = scheduler.submit("s-1", fail, 2.0, deadline)
+        succeeded = scheduler.submit("s-2", succeed, 1.0, deadline)
+        with pytest.raises(RuntimeError):
+            await failed
+        assert await succeeded == "done"
+        return scheduler.stats
+
+    stats = asyncio.run(scenario())
+    assert (stats["failed"], stats["completed"]) == (1, 1)
@@ -1,30 +1,27 @@
 from __future__ import annotations
 
-import csv
 import json
 import os
+import re
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from groq import Groq
+from a2a_common.catalog import Catalog, open_catalog
+from a2a_common.llm_cassette import replaying
+from a2a_common.rate_limit import get_client, limited_completion
 
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "companyA_inventory.csv"
+INVENTORY = open_catalog(DATA_PATH, {"sku": str, "stock": int, "reorder_threshold": int, "reorder_amount": int})
 
 
-def get_inventory_for_sku(sku: str) -> Dict[str, Any]:
-    if not DATA_PATH.exists():
+def get_inventory_for_sku(sku: str, catalog: Optional[Catalog] = None) -> Dict[str, Any]:
+    catalog = catalog or INVENTORY
+    if not catalog.csv_path.exists() and not catalog.db_path.exists():
         return {"sku": sku, "stock": 5, "reorder_threshold": 10, "reorder_amount": 20}
-    with open(DATA_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get("sku") == sku:
-                return {
-                    "sku": row["sku"],
-                    "stock": int(row["stock"]),
-                    "reorder_threshold": int(row["reorder_threshold"]),
-                    "reorder_amount": int(row["reorder_amount"]),
-                }
+    row = catalog.get(sku)
+    if row is not None:
+        return row
     # default if not found
     return {"sku": sku, "stock": 0, "reorder_threshold": 0, "reorder_amount": 0}
 
@@ -51,7 +48,7 @@ def _build_tools() -> list[dict[str, Any]]:
     ]
 
 
-def _call_tool(tool_name: str, arguments_json: str) -> str:
+def _call_tool(tool_name: str, arguments_json: str, catalog: Optional[Catalog] = None) -> str:
     # Parse tool arguments safely
     try:
         args = json.loads(arguments_json or "{}")
@@ -60,11 +57,69 @@ def _call_tool(tool_name: str, arguments_json: str) -> str:
 
     if tool_name == "get_inventory_for_sku":
         sku = str(args.get("sku") or "")
-        return json.dumps(get_inventory_for_sku(sku))
+        return json.dumps(get_inventory_for_sku(sku, catalog))
 
     return json.dumps({"error": f"unknown tool {tool_name}"})
 
 
+_PERSONA_PROMPT = (
+    "You are MayLim, procurement for Company A. Your goals: minimize unit price while ensuring "
+    "the requested quantity can be fulfilled. You must obey constraints (turn limits, price floors/ceilings).\n"
+    "Write the rationale in Manglish (friendly, <= 2 sentences). Also produce a one-line transcript_response (Manglish, polite).\n"
+    "Do not repeat the exact same counter more than once; if the partner repeats the same price, either accept per rules or adjust slightly.\n"
+    "Acceptance rule: If seller price within +$40 or within +2.5% of target_price, you MAY accept.\n"
+)
+
+_DECISION_SCHEMA = "{\"action\": \"accept|counter|reject\", \"price\": number|null, \"rationale\": string, \"transcript_response\": string}"
+
+
+def _build_user_prompt(
+    sku: str,
+    quantity: int,
+    offered_price: Optional[float],
+    target_price: Optional[float],
+    constraints: Dict[str, Any],
+    partner_message: str,
+    history_text: str,
+    context: Optional[Dict[str, Any]] = None,
+) -> str:
+    return (
+        f"SKU: {sku}\n"
+        f"Quantity: {quantity}\n"
+        f"Seller offered price: {offered_price if offered_price is not None else 'unknown'}\n"
+        f"Target price (if any): {target_price if target_price is not None else 'none'}\n"
+        f"Constraints: {json.dumps(constraints)}\n"
+        f"{_market_line(context)}\n"
+        f"Partner message: {partner_message}\n"
+        f"History JSON (recent turns): {history_text}\n\n"
+        "Decide to accept or counter. If countering, propose a single numeric unit price."
+    )
+
+
+def _market_line(context: Optional[Dict[str, Any]]) -> str:
+    """Agreed-price history from Task.context (empty when the broker has none for this SKU)."""
+    history = (context or {}).get("price_history")
+    if not history:
+        return ""
+    return (
+        f"Market history (past agreed deals for this SKU): {json.dumps(history)}. "
+        "Treat p50 as the likely clearing price and move toward it quickly.\n"
+    )
+
+
+def _coerce_decision(decision: Dict[str, Any]) -> Dict[str, Any]:
+    action = str(decision.get("action") or "counter").lower()
+    price_val = decision.get("price")
+    try:
+        price = float(price_val) if price_val is not None else None
+    except Exception:
+        price = None
+    rationale = str(decision.get("rationale") or "")
+    transcript_response = str(decision.get("transcript_response") or "")
+
+    return {"action": action, "price": price, "rationale": rationale, "transcript_response": transcript_response}
+
+
 def decide_with_groq(
     sku: str,
     quantity: int,
@@ -73,11 +128,16 @@ def decide_with_groq(
     constraints: Dict[str, Any],
     partner_message: str = "",
     history_text: str = "[]",
+    context: Optional[Dict[str, Any]] = None,
+    priority: float = 0.0,
+    catalog: Optional[Catalog] = None,
+    key_env: str = "GROQ_API_KEY2",
+    persona: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Return a dict: { action: 'accept'|'counter'|'reject', price: float|None, rationale: str }"""
 
-    api_key = os.getenv("GROQ_API_KEY2")
-    if not api_key:
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
         raise RuntimeError("GROQ_API_KEY not set")
 
     # model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
@@ -85,27 +145,16 @@ def decide_with_groq(
     temperature = float(os.getenv("GROQ_TEMPERATURE", "0.2"))
     max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512"))
 
-    client = Groq(api_key=api_key)
+    client = get_client(key_env)
 
     system_prompt = (
-        "You are MayLim, procurement for Company A. Your goals: minimize unit price while ensuring "
-        "the requested quantity can be fulfilled. You must obey constraints (turn limits, price floors/ceilings).\n"
-        "You can call tools to read local inventory for the SKU.\n"
-        "Write the rationale in Manglish (friendly, <= 2 sentences). Also produce a one-line transcript_response (Manglish, polite).\n"
-        "Do not repeat the exact same counter more than once; if the partner repeats the same price, either accept per rules or adjust slightly.\n"
-        "Acceptance rule: If seller price within +$40 or within +2.5% of target_price, you MAY accept.\n"
-        "Respond ONLY strict JSON: {\"action\": \"accept|counter|reject\", \"price\": number|null, \"rationale\": string, \"transcript_response\": string}."
+        (persona or _PERSONA_PROMPT)
+        + "You can call tools to read local inventory for the SKU.\n"
+        + f"Respond ONLY strict JSON: {_DECISION_SCHEMA}."
     )
 
-    user_prompt = (
-        f"SKU: {sku}\n"
-        f"Quantity: {quantity}\n"
-        f"Seller offered price: {offered_price if offered_price is not None else 'unknown'}\n"
-        f"Target price (if any): {target_price if target_price is not None else 'none'}\n"
-        f"Constraints: {json.dumps(constraints)}\n\n"
-        f"Partner message: {partner_message}\n"
-        f"History JSON (recent turns): {history_text}\n\n"
-        "Decide to accept or counter. If countering, propose a single numeric unit price."
+    user_prompt = _build_user_prompt(
+        sku, quantity, offered_price, target_price, constraints, partner_message, history_text, context
     )
 
     messages: list[dict[str, Any]] = [
@@ -114,7 +163,10 @@ def decide_with_groq(
     ]
 
     # First call (may request a tool)
-    first = client.chat.completions.create(
+    first = limited_completion(
+        client,
+        key_env,
+        priority,
         model=model,
         messages=messages,
         tools=_build_tools(),
@@ -130,7 +182,7 @@ def decide_with_groq(
         tc = tool_calls[0]
         tool_name = tc.function.name
         tool_args = tc.function.arguments or "{}"
-        tool_output = _call_tool(tool_name, tool_args)
+        tool_output = _call_tool(tool_name, tool_args, catalog)
 
         # Explicitly append an assistant message with tool_calls per API contract
         messages.append(
@@ -153,7 +205,10 @@ def decide_with_groq(
         messages.append({"role": "tool", "tool_call_id": tc.id, "content": tool_output})
 
         # Second call to get final JSON decision
-        second = client.chat.completions.create(
+        second = limited_completion(
+            client,
+            key_env,
+            priority,
             model=model,
             messages=messages,
             temperature=temperature,
@@ -169,16 +224,259 @@ def decide_with_groq(
     except json.JSONDecodeError:
         decision = {"action": "counter", "price": offered_price or 1900.0, "rationale": "fallback", "transcript_response": "Can give better price ah?"}
 
-    # Coerce fields
-    action = str(decision.get("action") or "counter").lower()
-    price_val = decision.get("price")
+    return _coerce_decision(decision)
+
+
+_ACTION_RE = re.compile(r'"action"\s*:\s*"([A-Za-z]+)"')
+_PRICE_RE = re.compile(r'"price"\s*:\s*(null|-?\d+(?:\.\d+)?)\s*[,}]')
+
+
+def decide_with_groq_stream(
+    sku: str,
+    quantity: int,
+    offered_price: Optional[float],
+    target_price: Optional[float],
+    constraints: Dict[str, Any],
+    partner_message: str = "",
+    history_text: str = "[]",
+    context: Optional[Dict[str, Any]] = None,
+    priority: float = 0.0,
+    catalog: Optional[Catalog] = None,
+    key_env: str = "GROQ_API_KEY2",
+    persona: Optional[str] = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Streamed variant of ``decide_with_groq``.
+
+    Yields ``("decision", {action, price})`` as soon as both fields are complete in the
+    streamed JSON, then ``("final", decision)`` with the narrative fields once the
+    completion ends. Inventory is embedded in the prompt so no tool round trip is needed.
+    """
+
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
+        raise RuntimeError("GROQ_API_KEY not set")
+
+    model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+    temperature = float(os.getenv("GROQ_TEMPERATURE", "0.2"))
+    max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512"))
+
+    client = get_client(key_env)
+
+    system_prompt = (
+        (persona or _PERSONA_PROMPT)
+        + "Local inventory for the SKU is included below.\n"
+        + f"Respond ONLY strict JSON with keys in this order: {_DECISION_SCHEMA}."
+    )
+    user_prompt = (
+        _build_user_prompt(sku, quantity, offered_price, target_price, constraints, partner_message, history_text, context)
+        + f"\nInventory: {json.dumps(get_inventory_for_sku(sku, catalog))}"
+    )
+
+    stream = limited_completion(
+        client,
+        key_env,
+        priority,
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+
+    buf = ""
+    early: Optional[Dict[str, Any]] = None
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        buf += chunk.choices[0].delta.content or ""
+        if early is None:
+            a, p = _ACTION_RE.search(buf), _PRICE_RE.search(buf)
+            if a and p:
+                early = _coerce_decision({"action": a.group(1), "price": None if p.group(1) == "null" else p.group(1)})
+                yield "decision", {"action": early["action"], "price": early["price"]}
+
     try:
-        price = float(price_val) if price_val is not None else None
-    except Exception:
-        price = None
-    rationale = str(decision.get("rationale") or "")
-    transcript_response = str(decision.get("transcript_response") or "")
+        decision = _coerce_decision(json.loads(buf or "{}"))
+    except json.JSONDecodeError:
+        decision = _coerce_decision({"action": "counter", "price": offered_price or 1900.0, "rationale": "fallback", "transcript_response": "Can give better price ah?"})
+    if early is None:
+        yield "decision", {"action": decision["action"], "price": decision["price"]}
+    else:
+        # The broker may already have acted on the early fields; keep them authoritative
+        decision.update(action=early["action"], price=early["price"])
+    yield "final", decision
 
-    return {"action": action, "price": price, "rationale": rationale, "transcript_response": transcript_response}
 
+def decide_batch_with_groq(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Decide many independent negotiation turns with a single completion.
+
+    Each case holds the keyword arguments of ``decide_with_groq``. Inventory is looked up
+    up front and embedded in the prompt, so no tool-call round trip is needed. Raises if
+    the model does not return one decision per case; callers fall back to single calls.
+    All cases must come from one agent (same ``key_env`` and ``persona``).
+    """
+
+    key_env = cases[0].get("key_env") or "GROQ_API_KEY2"
+    persona = cases[0].get("persona")
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
+        raise RuntimeError("GROQ_API_KEY not set")
+
+    model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+    temperature = float(os.getenv("GROQ_TEMPERATURE", "0.2"))
+    max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512")) * len(cases)
+
+    client = get_client(key_env)
+
+    system_prompt = (
+        (persona or _PERSONA_PROMPT)
+        + "You will receive a JSON array of independent negotiation cases. Each case has an id, a prompt "
+        "and the local inventory for its SKU. Decide every case on its own; never mix facts between cases.\n"
+        + f"Respond ONLY with a strict JSON array, one object per case in the same order: "
+        f"{{\"id\": number, {_DECISION_SCHEMA[1:]}."
+    )
+
+    payload = [
+        {
+            "id": idx,
+            "prompt": _build_user_prompt(
+                c["sku"],
+                c["quantity"],
+                c.get("offered_price"),
+                c.get("target_price"),
+                c.get("constraints") or {},
+                c.get("partner_message", ""),
+                c.get("history_text", "[]"),
+                c.get("context"),
+            ),
+            "inventory": get_inventory_for_sku(c["sku"], c.get("catalog")),
+        }
+        for idx, c in enumerate(cases)
+    ]
+
+    res = limited_completion(
+        client,
+        key_env,
+        max(float(c.get("priority") or 0.0) for c in cases),
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    content = res.choices[0].message.content or "[]"
+
+    parsed = json.loads(content)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("decisions")
+    if not isinstance(parsed, list) or len(parsed) != len(cases):
+        raise ValueError("batched decision count mismatch")
+
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for item in parsed:
+        if isinstance(item, dict) and isinstance(item.get("id"), int):
+            by_id[item["id"]] = item
+    if len(by_id) != len(cases):
+        raise ValueError("batched decision ids incomplete")
+    return [_coerce_decision(by_id[idx]) for idx in range(len(cases))]
+
+
+def decide_lines_with_groq(
+    lines: List[Dict[str, Any]],
+    constraints: Dict[str, Any],
+    partner_message: str = "",
+    history_text: str = "[]",
+    context: Optional[Dict[str, Any]] = None,
+    priority: float = 0.0,
+    catalog: Optional[Catalog] = None,
+    key_env: str = "GROQ_API_KEY2",
+    persona: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Decide every open line of a multi-SKU task with a single completion.
 
+    ``lines`` items hold ``line``, ``sku``, ``quantity``, ``offered_price`` and
+    ``target_price``. Inventory for each SKU is embedded, so there is no tool round trip,
+    and the persona, partner message and history are sent once for the whole order.
+    Returns decisions by line id; a line the model leaves out gets the same fallback as an
+    unparseable single decision.
+    """
+
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
+        raise RuntimeError("GROQ_API_KEY not set")
+    model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+    temperature = float(os.getenv("GROQ_TEMPERATURE", "0.2"))
+    # Per-line answers are short; the budget grows with the order, not with a full decision per line
+    max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512")) + 128 * len(lines)
+
+    client = get_client(key_env)
+
+    system_prompt = (
+        (persona or _PERSONA_PROMPT)
+        + "You will receive one order with several lines (SKUs). Decide each line on its own target and "
+        "inventory; the partner message and history cover the whole order.\n"
+        + f"Respond ONLY with a strict JSON array, one object per line in the same order: "
+        f"{{\"line\": string, {_DECISION_SCHEMA[1:]}."
+    )
+
+    market = (context or {}).get("price_history_by_sku") or {}
+    rows: List[Dict[str, Any]] = []
+    for line in lines:
+        row = {
+            "line": str(line["line"]),
+            "sku": line["sku"],
+            "quantity": line["quantity"],
+            "seller_offered_price": line.get("offered_price"),
+            "target_price": line.get("target_price"),
+            "inventory": get_inventory_for_sku(line["sku"], catalog),
+        }
+        if market.get(line["sku"]):
+            row["market_history"] = market[line["sku"]]
+        rows.append(row)
+
+    user_prompt = (
+        f"Constraints: {json.dumps(constraints)}\n"
+        f"Partner message: {partner_message}\n"
+        f"History JSON (recent turns): {history_text}\n"
+        f"Order lines JSON: {json.dumps(rows)}\n\n"
+        "For each line decide to accept or counter. If countering, propose a single numeric unit price. "
+        "Treat market_history p50, where given, as the likely clearing price."
+    )
+
+    res = limited_completion(
+        client,
+        key_env,
+        priority,
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    content = res.choices[0].message.content or "[]"
+
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        parsed = []
+    if isinstance(parsed, dict):
+        parsed = parsed.get("decisions") or parsed.get("lines") or []
+    by_line = {str(item.get("line")): item for item in parsed if isinstance(item, dict)} if isinstance(parsed, list) else {}
+
+    decisions: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        item = by_line.get(row["line"]) or {
+            "action": "counter",
+            "price": row["seller_offered_price"] or 1900.0,
+            "rationale": "fallback",
+            "transcript_response": "Can give better price ah?",
+        }
+        decisions[row["line"]] = _coerce_decision(item)
+    return decisions
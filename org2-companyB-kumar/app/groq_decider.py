@@ -1,30 +1,27 @@
 from __future__ import annotations
 
-import csv
 import json
 import os
+import re
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from groq import Groq
+from a2a_common.catalog import Catalog, open_catalog
+from a2a_common.llm_cassette import replaying
+from a2a_common.rate_limit import get_client, limited_completion
 
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "companyB_pricing.csv"
+PRICING = open_catalog(DATA_PATH, {"sku": str, "stock": int, "unit_price": float, "max_discount_pct": float})
 
 
-def get_pricing_for_sku(sku: str) -> Dict[str, Any]:
-    if not DATA_PATH.exists():
+def get_pricing_for_sku(sku: str, catalog: Optional[Catalog] = None) -> Dict[str, Any]:
+    catalog = catalog or PRICING
+    if not catalog.csv_path.exists() and not catalog.db_path.exists():
         return {"sku": sku, "stock": 100, "unit_price": 1999.0, "max_discount_pct": 0.10}
-    with open(DATA_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get("sku") == sku:
-                return {
-                    "sku": row["sku"],
-                    "stock": int(row["stock"]),
-                    "unit_price": float(row["unit_price"]),
-                    "max_discount_pct": float(row["max_discount_pct"]),
-                }
+    row = catalog.get(sku)
+    if row is not None:
+        return row
     return {"sku": sku, "stock": 0, "unit_price": 0.0, "max_discount_pct": 0.0}
 
 
@@ -47,17 +44,87 @@ def _build_tools() -> list[dict[str, Any]]:
     ]
 
 
-def _call_tool(tool_name: str, arguments_json: str) -> str:
+def _call_tool(tool_name: str, arguments_json: str, catalog: Optional[Catalog] = None) -> str:
     try:
         args = json.loads(arguments_json or "{}")
     except json.JSONDecodeError:
         args = {}
     if tool_name == "get_pricing_for_sku":
         sku = str(args.get("sku") or "")
-        return json.dumps(get_pricing_for_sku(sku))
+        return json.dumps(get_pricing_for_sku(sku, catalog))
     return json.dumps({"error": f"unknown tool {tool_name}"})
 
 
+_DECISION_SCHEMA = "{\"action\": \"accept|counter|reject\", \"price\": number|null, \"rationale\": string, \"transcript_response\": string}"
+
+
+def _persona_prompt(floor_rule: str, persona: Optional[str] = None) -> str:
+    """Kumar's persona, or a hosted agent's own, with ``{floor_rule}`` filled in."""
+    if persona:
+        return persona.replace("{floor_rule}", floor_rule)
+    return (
+        "You are Kumar, sales agent for Company B. Objective: maximize unit price; NEVER go below floor "
+        f"({floor_rule}). Honor constraints (turn limits).\n"
+        "Style for transcript_response: Tamil Manglish, friendly, concise (<=1 sentence). Avoid robotic/formal phrases like 'Thank you for...'.\n"
+        "Use natural Tamil Manglish like 'aiyo/ah/la/paiseh/can or not' but keep polite and professional. Vary openings: 'Aiyo price too low la', 'Can do at ... la', 'This one cannot ah'.\n"
+        "Content must be formal/precise (e.g., 'Offer: $1899.00', 'Accepted at $1799.00').\n"
+        "If rejecting, give a clear reason in rationale (floor, stock, policy); transcript_response stays polite Manglish. If countering, price MUST be >= floor.\n"
+    )
+
+
+def _build_user_prompt(
+    sku: str,
+    quantity: int,
+    buyer_price: Optional[float],
+    unit_price: float,
+    max_discount_pct: float,
+    constraints: Dict[str, Any],
+    partner_message: str,
+    history_text: str,
+    context: Optional[Dict[str, Any]] = None,
+) -> str:
+    floor = unit_price * (1 - max_discount_pct)
+    return (
+        f"SKU: {sku}\n"
+        f"Quantity: {quantity}\n"
+        f"Buyer offered price: {buyer_price if buyer_price is not None else 'unknown'}\n"
+        f"List unit price: {unit_price}\nMax discount pct: {max_discount_pct} (floor {floor:.2f})\n"
+        f"Constraints: {json.dumps(constraints)}\n"
+        f"{_market_line(context)}\n"
+        f"Partner message: {partner_message}\n"
+        f"History JSON (recent turns): {history_text}\n\n"
+        "Decide to accept or counter. If countering, propose a single numeric unit price not below floor."
+    )
+
+
+def _market_line(context: Optional[Dict[str, Any]]) -> str:
+    """Agreed-price history from Task.context (empty when the broker has none for this SKU)."""
+    history = (context or {}).get("price_history")
+    if not history:
+        return ""
+    return (
+        f"Market history (past agreed deals for this SKU): {json.dumps(history)}. "
+        "Treat p50 as the likely clearing price and move toward it quickly.\n"
+    )
+
+
+def _coerce_decision(decision: Dict[str, Any], floor: float) -> Dict[str, Any]:
+    action = str((decision.get("action") or "")).lower()
+    price_val = decision.get("price")
+    try:
+        price = float(price_val) if price_val is not None else None
+    except Exception:
+        price = None
+    rationale = str(decision.get("rationale") or "")
+    speak = str(decision.get("transcript_response") or "")
+
+    # Enforce seller floor in case model violates
+    if price is not None and price < floor:
+        price = floor
+
+    return {"action": action, "price": price, "rationale": rationale, "transcript_response": speak}
+
+
 def decide_with_groq(
     sku: str,
     quantity: int,
@@ -67,40 +134,33 @@ def decide_with_groq(
     constraints: Dict[str, Any],
     partner_message: str = "",
     history_text: str = "[]",
+    context: Optional[Dict[str, Any]] = None,
+    priority: float = 0.0,
+    catalog: Optional[Catalog] = None,
+    key_env: str = "GROQ_API_KEY3",
+    persona: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Seller policy: maximize price but never go below floor = unit_price * (1 - max_discount_pct)."""
 
-    api_key = os.getenv("GROQ_API_KEY3")
-    if not api_key:
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
         raise RuntimeError("GROQ_API_KEY not set")
     model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
     temperature = float(os.getenv("GROQ_TEMPERATURE", "0.6"))
     max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512"))
 
-    client = Groq(api_key=api_key)
+    client = get_client(key_env)
 
     floor = unit_price * (1 - max_discount_pct)
     system_prompt = (
-        "You are Kumar, sales agent for Company B. Objective: maximize unit price; NEVER go below floor "
-        f"(floor = unit_price*(1-max_discount_pct) = {floor:.2f}). Honor constraints (turn limits).\n"
-        "You can call tools to read local pricing info.\n"
-        "Style for transcript_response: Tamil Manglish, friendly, concise (<=1 sentence). Avoid robotic/formal phrases like 'Thank you for...'.\n"
-        "Use natural Tamil Manglish like 'aiyo/ah/la/paiseh/can or not' but keep polite and professional. Vary openings: 'Aiyo price too low la', 'Can do at ... la', 'This one cannot ah'.\n"
-        "Content must be formal/precise (e.g., 'Offer: $1899.00', 'Accepted at $1799.00').\n"
-        "If rejecting, give a clear reason in rationale (floor, stock, policy); transcript_response stays polite Manglish. If countering, price MUST be >= floor.\n"
+        _persona_prompt(f"floor = unit_price*(1-max_discount_pct) = {floor:.2f}", persona)
+        + "You can call tools to read local pricing info.\n"
         "Tool policy: ONLY 'get_pricing_for_sku' is allowed. NEVER call any other tool (e.g., 'json'). Final answer MUST be plain JSON in message.content.\n"
-        "Respond ONLY strict JSON: {\"action\": \"accept|counter|reject\", \"price\": number|null, \"rationale\": string, \"transcript_response\": string}."
+        + f"Respond ONLY strict JSON: {_DECISION_SCHEMA}."
     )
 
-    user_prompt = (
-        f"SKU: {sku}\n"
-        f"Quantity: {quantity}\n"
-        f"Buyer offered price: {buyer_price if buyer_price is not None else 'unknown'}\n"
-        f"List unit price: {unit_price}\nMax discount pct: {max_discount_pct} (floor {floor:.2f})\n"
-        f"Constraints: {json.dumps(constraints)}\n\n"
-        f"Partner message: {partner_message}\n"
-        f"History JSON (recent turns): {history_text}\n\n"
-        "Decide to accept or counter. If countering, propose a single numeric unit price not below floor."
+    user_prompt = _build_user_prompt(
+        sku, quantity, buyer_price, unit_price, max_discount_pct, constraints, partner_message, history_text, context
     )
 
     messages: list[dict[str, Any]] = [
@@ -108,7 +168,10 @@ def decide_with_groq(
         {"role": "user", "content": user_prompt},
     ]
 
-    first = client.chat.completions.create(
+    first = limited_completion(
+        client,
+        key_env,
+        priority,
         model=model,
         messages=messages,
         tools=_build_tools(),
@@ -123,7 +186,7 @@ def decide_with_groq(
         tc = tool_calls[0]
         tool_name = tc.function.name
         tool_args = tc.function.arguments or "{}"
-        tool_output = _call_tool(tool_name, tool_args)
+        tool_output = _call_tool(tool_name, tool_args, catalog)
         messages.append(
             {
                 "role": "assistant",
@@ -139,7 +202,10 @@ def decide_with_groq(
         )
         messages.append({"role": "tool", "tool_call_id": tc.id, "content": tool_output})
 
-        second = client.chat.completions.create(
+        second = limited_completion(
+            client,
+            key_env,
+            priority,
             model=model,
             messages=messages,
             temperature=temperature,
@@ -160,19 +226,270 @@ def decide_with_groq(
             "rationale": "fallback",
             "transcript_response": "Boss, this price cannot la, we keep above floor."}
 
-    action = str((decision.get("action") or "")).lower()
-    price_val = decision.get("price")
+    return _coerce_decision(decision, floor)
+
+
+_ACTION_RE = re.compile(r'"action"\s*:\s*"([A-Za-z]+)"')
+_PRICE_RE = re.compile(r'"price"\s*:\s*(null|-?\d+(?:\.\d+)?)\s*[,}]')
+
+
+def decide_with_groq_stream(
+    sku: str,
+    quantity: int,
+    buyer_price: Optional[float],
+    unit_price: float,
+    max_discount_pct: float,
+    constraints: Dict[str, Any],
+    partner_message: str = "",
+    history_text: str = "[]",
+    context: Optional[Dict[str, Any]] = None,
+    priority: float = 0.0,
+    catalog: Optional[Catalog] = None,
+    key_env: str = "GROQ_API_KEY3",
+    persona: Optional[str] = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Streamed variant of ``decide_with_groq``.
+
+    Yields ``("decision", {action, price})`` as soon as both fields are complete in the
+    streamed JSON, then ``("final", decision)`` with the narrative fields once the
+    completion ends. Pricing is embedded in the prompt so no tool round trip is needed.
+    """
+
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
+        raise RuntimeError("GROQ_API_KEY not set")
+    model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+    temperature = float(os.getenv("GROQ_TEMPERATURE", "0.6"))
+    max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512"))
+
+    client = get_client(key_env)
+
+    floor = unit_price * (1 - max_discount_pct)
+    system_prompt = (
+        _persona_prompt(f"floor = unit_price*(1-max_discount_pct) = {floor:.2f}", persona)
+        + "Local pricing for the SKU is included below.\n"
+        + f"Respond ONLY strict JSON with keys in this order: {_DECISION_SCHEMA}."
+    )
+    user_prompt = (
+        _build_user_prompt(sku, quantity, buyer_price, unit_price, max_discount_pct, constraints, partner_message, history_text, context)
+        + f"\nPricing: {json.dumps(get_pricing_for_sku(sku, catalog))}"
+    )
+
+    stream = limited_completion(
+        client,
+        key_env,
+        priority,
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+
+    buf = ""
+    early: Optional[Dict[str, Any]] = None
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        buf += chunk.choices[0].delta.content or ""
+        if early is None:
+            a, p = _ACTION_RE.search(buf), _PRICE_RE.search(buf)
+            if a and p:
+                early = _coerce_decision({"action": a.group(1), "price": None if p.group(1) == "null" else p.group(1)}, floor)
+                yield "decision", {"action": early["action"], "price": early["price"]}
+
     try:
-        price = float(price_val) if price_val is not None else None
-    except Exception:
-        price = None
-    rationale = str(decision.get("rationale") or "")
-    speak = str(decision.get("transcript_response") or "")
+        decision = _coerce_decision(json.loads(buf or "{}"), floor)
+    except json.JSONDecodeError:
+        decision = _coerce_decision({
+            "action": "counter",
+            "price": max(buyer_price or unit_price, floor),
+            "rationale": "fallback",
+            "transcript_response": "Boss, this price cannot la, we keep above floor."}, floor)
+    if early is None:
+        yield "decision", {"action": decision["action"], "price": decision["price"]}
+    else:
+        # The broker may already have acted on the early fields; keep them authoritative
+        decision.update(action=early["action"], price=early["price"])
+    yield "final", decision
 
-    # Enforce seller floor in case model violates
-    if price is not None and price < floor:
-        price = floor
 
-    return {"action": action, "price": price, "rationale": rationale, "transcript_response": speak}
+def decide_batch_with_groq(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Decide many independent negotiation turns with a single completion.
+
+    Each case holds the keyword arguments of ``decide_with_groq``. Pricing is looked up
+    up front and embedded in the prompt, so no tool-call round trip is needed. Raises if
+    the model does not return one decision per case; callers fall back to single calls.
+    All cases must come from one agent (same ``key_env`` and ``persona``).
+    """
+
+    key_env = cases[0].get("key_env") or "GROQ_API_KEY3"
+    persona = cases[0].get("persona")
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
+        raise RuntimeError("GROQ_API_KEY not set")
+    model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+    temperature = float(os.getenv("GROQ_TEMPERATURE", "0.6"))
+    max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512")) * len(cases)
+
+    client = get_client(key_env)
+
+    system_prompt = (
+        _persona_prompt("each case states its own floor", persona)
+        + "You will receive a JSON array of independent negotiation cases. Each case has an id, a prompt "
+        "and the local pricing for its SKU. Decide every case on its own; never mix facts between cases.\n"
+        + f"Respond ONLY with a strict JSON array, one object per case in the same order: "
+        f"{{\"id\": number, {_DECISION_SCHEMA[1:]}."
+    )
+
+    floors = [c["unit_price"] * (1 - c["max_discount_pct"]) for c in cases]
+    payload = [
+        {
+            "id": idx,
+            "prompt": _build_user_prompt(
+                c["sku"],
+                c["quantity"],
+                c.get("buyer_price"),
+                c["unit_price"],
+                c["max_discount_pct"],
+                c.get("constraints") or {},
+                c.get("partner_message", ""),
+                c.get("history_text", "[]"),
+                c.get("context"),
+            ),
+            "pricing": get_pricing_for_sku(c["sku"], c.get("catalog")),
+        }
+        for idx, c in enumerate(cases)
+    ]
+
+    res = limited_completion(
+        client,
+        key_env,
+        max(float(c.get("priority") or 0.0) for c in cases),
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    content = res.choices[0].message.content or "[]"
+
+    parsed = json.loads(content)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("decisions")
+    if not isinstance(parsed, list) or len(parsed) != len(cases):
+        raise ValueError("batched decision count mismatch")
+
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for item in parsed:
+        if isinstance(item, dict) and isinstance(item.get("id"), int):
+            by_id[item["id"]] = item
+    if len(by_id) != len(cases):
+        raise ValueError("batched decision ids incomplete")
+    return [_coerce_decision(by_id[idx], floors[idx]) for idx in range(len(cases))]
+
 
+def decide_lines_with_groq(
+    lines: List[Dict[str, Any]],
+    constraints: Dict[str, Any],
+    partner_message: str = "",
+    history_text: str = "[]",
+    context: Optional[Dict[str, Any]] = None,
+    priority: float = 0.0,
+    catalog: Optional[Catalog] = None,
+    key_env: str = "GROQ_API_KEY3",
+    persona: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Decide every open line of a multi-SKU task with a single completion.
+
+    ``lines`` items hold ``line``, ``sku``, ``quantity`` and ``buyer_price`` (None on the
+    opening quote). Pricing and floor for each SKU are embedded, so there is no tool round
+    trip, and the persona, partner message and history are sent once for the whole order.
+    Returns decisions by line id; a line the model leaves out gets the same fallback as an
+    unparseable single decision.
+    """
+
+    api_key = os.getenv(key_env)
+    if not api_key and not replaying():
+        raise RuntimeError("GROQ_API_KEY not set")
+    model = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+    temperature = float(os.getenv("GROQ_TEMPERATURE", "0.6"))
+    # Per-line answers are short; the budget grows with the order, not with a full decision per line
+    max_tokens = int(os.getenv("GROQ_MAX_TOKENS", "512")) + 128 * len(lines)
 
+    client = get_client(key_env)
+
+    system_prompt = (
+        _persona_prompt("each line states its own floor", persona)
+        + "You will receive one order with several lines (SKUs). Decide each line on its own pricing and floor; "
+        "the partner message and history cover the whole order.\n"
+        + f"Respond ONLY with a strict JSON array, one object per line in the same order: "
+        f"{{\"line\": string, {_DECISION_SCHEMA[1:]}."
+    )
+
+    market = (context or {}).get("price_history_by_sku") or {}
+    rows: List[Dict[str, Any]] = []
+    floors: Dict[str, float] = {}
+    for line in lines:
+        pricing = get_pricing_for_sku(line["sku"], catalog)
+        line_id = str(line["line"])
+        floors[line_id] = pricing["unit_price"] * (1 - pricing["max_discount_pct"])
+        row = {
+            "line": line_id,
+            "sku": line["sku"],
+            "quantity": line["quantity"],
+            "buyer_offered_price": line.get("buyer_price"),
+            "list_unit_price": pricing["unit_price"],
+            "max_discount_pct": pricing["max_discount_pct"],
+            "floor": round(floors[line_id], 2),
+        }
+        if market.get(line["sku"]):
+            row["market_history"] = market[line["sku"]]
+        rows.append(row)
+
+    user_prompt = (
+        f"Constraints: {json.dumps(constraints)}\n"
+        f"Partner message: {partner_message}\n"
+        f"History JSON (recent turns): {history_text}\n"
+        f"Order lines JSON: {json.dumps(rows)}\n\n"
+        "For each line decide to accept or counter. If countering, propose a single numeric unit price not below "
+        "that line's floor. Treat market_history p50, where given, as the likely clearing price."
+    )
+
+    res = limited_completion(
+        client,
+        key_env,
+        priority,
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    content = res.choices[0].message.content or "[]"
+
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        parsed = []
+    if isinstance(parsed, dict):
+        parsed = parsed.get("decisions") or parsed.get("lines") or []
+    by_line = {str(item.get("line")): item for item in parsed if isinstance(item, dict)} if isinstance(parsed, list) else {}
+
+    decisions: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        item = by_line.get(row["line"]) or {
+            "action": "counter",
+            "price": max(row["buyer_offered_price"] or row["list_unit_price"], floors[row["line"]]),
+            "rationale": "fallback",
+            "transcript_response": "Boss, this price cannot la, we keep above floor.",
+        }
+        decisions[row["line"]] = _coerce_decision(item, floors[row["line"]])
+    return decisions
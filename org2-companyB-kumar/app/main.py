@@ -1,51 +1,34 @@
 from __future__ import annotations
 
-import csv
-from pathlib import Path
+import math
+import re
 import json
-from typing import Any, Dict, List, Optional, Union
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from dotenv import load_dotenv
-import logging
-from .groq_decider import decide_with_groq
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from a2a_schemas import LINE_DECISION, LINE_OFFER, Message, MessageRequest, Part, Task, TaskOutcome, line_parts
+from a2a_common.agents import CARD_MAX_AGE_S, HostedAgent, load_agents
+from a2a_common.llm_batch import decision_dispatcher
+from a2a_common.log_setup import msg_body, setup_logging
+from a2a_common.profiling import PROFILING, install_profiling
+from a2a_common.rate_limit import RateLimitTimeout, deal_priority, get_client, get_limiter
+from a2a_common.speculation import Speculator
+from a2a_common.task_store import save_task
+from a2a_common.warmup import prewarm
+from a2a_common.wire import FastJSONResponse, dumps_json, wire_body, wire_response
+from .groq_decider import DATA_PATH, PRICING, decide_batch_with_groq, decide_lines_with_groq, decide_with_groq, decide_with_groq_stream, get_pricing_for_sku
 import json
 
 
-DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "companyB_pricing.csv"
-
-
-class Part(BaseModel):
-    type: str
-    # data: Dict[str, Any] | str 
-    data: Union[Dict[str, Any], str]
-
-class Message(BaseModel):
-    role: str
-    content: str
-    rationale: str = ""
-    transcript_response: str = ""
-    parts: List[Part] = []
-
-
-class Task(BaseModel):
-    task_id: Optional[str] = None
-    subject: str
-    sku: str
-    quantity: int
-    target_price: Optional[float] = None
-    constraints: Dict[str, Any] = {}
-    context: Dict[str, Any] = {}
-
+LLM_KEY_ENV = "GROQ_API_KEY3"
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
 
-class MessageRequest(BaseModel):
-    task_id: str
-    message: Message
 
-
-app = FastAPI(title="A2A Server - Kumar (org2)")
+app = FastAPI(title="A2A Server - Kumar (org2)", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,26 +39,97 @@ app.add_middleware(
 )
 
 
-STATE: Dict[str, Any] = {"tasks": {}}
-load_dotenv()
-logger = logging.getLogger("org2-kumar")
-if not logger.handlers:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [org2] %(message)s")
-
-
-def read_pricing() -> Dict[str, Any]:
-    if not DATA_PATH.exists():
-        return {"sku": "MACBOOK-PRO-14", "stock": 100, "unit_price": 1999.0, "max_discount_pct": 0.10}
-    with open(DATA_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            return {
-                "sku": row["sku"],
-                "stock": int(row["stock"]),
-                "unit_price": float(row["unit_price"]),
-                "max_discount_pct": float(row["max_discount_pct"]),
-            }
-    return {"sku": "MACBOOK-PRO-14", "stock": 100, "unit_price": 1999.0, "max_discount_pct": 0.10}
+# Load .env if present for GROQ_* (nearest one up from this package, as load_dotenv() finds it);
+# python-dotenv is only imported when there is a file to read
+ENV_FILE = next((d / ".env" for d in Path(__file__).resolve().parents if (d / ".env").is_file()), None)
+if ENV_FILE is not None:
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_FILE)
+logger = setup_logging("org2-kumar", tag="org2")
+# Seller agents hosted here: Kumar (this directory) plus any under AGENT_DIRS, served at
+# /agents/{agent_id}/a2a/...; the plain /a2a/... routes stay Kumar's. Seller side: open
+# negotiations hold stock so concurrent deals cannot oversell it
+AGENTS = load_agents(
+    SERVICE_ROOT,
+    {"role": "seller", "data_file": str(DATA_PATH.relative_to(SERVICE_ROOT)), "llm_key_env": LLM_KEY_ENV, "speaker": "Kumar"},
+    PRICING.columns,
+    sells=True,
+)
+HOME = next(iter(AGENTS.values()))
+
+
+def stop_agents() -> None:
+    for agent in AGENTS.values():
+        agent.stop()
+
+
+# uvicorn re-raises SIGTERM after shutdown, so atexit alone would miss the final flush
+app.router.on_shutdown.append(stop_agents)
+# Micro-batched (GROQ_BATCH_ENABLED=1) or direct LLM decisions
+dispatch_decision = decision_dispatcher(decide_with_groq, decide_batch_with_groq)
+# Optional (SPECULATE=1) precomputed answers to the partner's likely next prices
+SPECULATOR = Speculator()
+app.router.on_shutdown.append(SPECULATOR.stop)
+# Open the home agent's catalog, ledger and saved tasks at startup rather than at import
+app.router.on_startup.append(HOME.open)
+# Compile/open the catalog and build the Groq client before the first turn needs them
+app.router.on_startup.append(prewarm(("catalog", lambda: HOME.catalog.warm()), ("llm_client", lambda: get_client(HOME.key_env))))
+# Debug only: ?profile=1 / X-Profile: 1 on any request, GET /debug/profile and GET /debug/memory
+if PROFILING:
+    install_profiling(app, {
+        "agents_open": lambda: sum(agent.ledger is not None for agent in AGENTS.values()),
+        "tasks": lambda: sum(len(agent.tasks) for agent in AGENTS.values()),
+        "task_messages": lambda: sum(len(e["messages"]) for agent in AGENTS.values() for e in list(agent.tasks.values())),
+        "cached_replies": lambda: sum(len(e.get("replies", {})) for agent in AGENTS.values() for e in list(agent.tasks.values())),
+    })
+
+
+def current_agent(request: Request) -> HostedAgent:
+    """The agent named by the ``/agents/{agent_id}`` prefix, else Kumar."""
+    agent_id = request.path_params.get("agent_id")
+    if agent_id is None:
+        # Opened by the startup hook; in-process clients that skip lifespan open it here
+        return HOME.open()
+    agent = AGENTS.get(agent_id)
+    if agent is None:
+        raise HTTPException(status_code=404, detail=f"unknown agent {agent_id}")
+    return agent.open()
+
+
+def read_pricing(agent: HostedAgent) -> Dict[str, Any]:
+    return agent.catalog.first() or {"sku": "MACBOOK-PRO-14", "stock": 100, "unit_price": 1999.0, "max_discount_pct": 0.10}
+
+
+def backpressure(agent: HostedAgent) -> Dict[str, Any]:
+    return get_limiter(agent.key_env).snapshot()
+
+
+def task_priority(agent: HostedAgent, task_id: str) -> float:
+    entry = agent.tasks[task_id]
+    task = entry["task"]
+    if task is None:
+        return 0.0
+    return deal_priority(
+        task.quantity,
+        task.target_price,
+        len(entry["messages"]),
+        int(task.constraints.get("turn_limit", 7)),
+    )
+
+
+def reservations(task_id: str, task: Task) -> List[Tuple[str, str, int]]:
+    """Stock a task holds as (ledger key, sku, quantity): one per order line (``task_id/line``), else one."""
+    lines = task.line_items()
+    if not lines:
+        return [(task_id, task.sku, task.quantity)]
+    return [(f"{task_id}/{line['line']}", line["sku"], int(line["quantity"])) for line in lines]
+
+
+def on_hand(agent: HostedAgent, task: Task) -> Any:
+    if not task.line_items():
+        return agent.ledger.on_hand(task.sku)
+    return {sku: agent.ledger.on_hand(sku) for _, sku, _ in reservations("", task)}
 
 
 @app.get("/")
@@ -83,20 +137,135 @@ def root():
     return {"ok": True, "service": "org2-kumar"}
 
 
-@app.post("/a2a/task")
-def create_task(task: Task):
-    local_id = f"t-{len(STATE['tasks'])+1}"
-    STATE["tasks"][local_id] = {"task": task, "messages": []}
-    return {"task_id": local_id}
+@app.get("/agents")
+def list_agents(request: Request):
+    """Cards of every agent this process hosts; ``open`` ones have served a request."""
+    return {"agents": [agent.describe(str(request.base_url)) for agent in AGENTS.values()]}
+
+
+@app.get("/speculation")
+def speculation_stats():
+    """Speculative decisions started, hit rate and LLM latency saved, across all hosted agents."""
+    return SPECULATOR.snapshot()
+
+
+# Every A2A route is mounted twice: at the root for Kumar and under /agents/{agent_id}
+router = APIRouter()
+
+
+@router.get("/.well-known/agent.json")
+def agent_card(request: Request, agent: HostedAgent = Depends(current_agent)):
+    """This agent's card and protocol features; a matching If-None-Match gets 304 with no body."""
+    card, etag = agent.well_known_card(str(request.base_url))
+    headers = {"ETag": etag, "Cache-Control": f"max-age={CARD_MAX_AGE_S}"}
+    if etag in [tag.strip() for tag in (request.headers.get("if-none-match") or "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(card, headers=headers)
+
+
+def reserve_stock(agent: HostedAgent, task_id: str, task: Task) -> None:
+    for key, sku, quantity in reservations(task_id, task):
+        if not agent.ledger.reserve(key, sku, quantity):
+            logger.warning("stock_short task=%s sku=%s qty=%s available=%s", key, sku, quantity, agent.ledger.available(sku))
+
+
+@router.post("/a2a/task")
+async def create_task(request: Request, task: Task = Depends(wire_body(Task)), agent: HostedAgent = Depends(current_agent)):
+    local_id = agent.new_task_id()
+    async with agent.task_lock(local_id):
+        agent.tasks[local_id] = {"task": task, "messages": [], "replies": {}}
+        # Disk and catalog reads stay off the event loop
+        await run_in_threadpool(save_task, local_id, agent.tasks[local_id], agent.tasks_dir)
+        await run_in_threadpool(reserve_stock, agent, local_id, task)
+    return wire_response(request, {"task_id": local_id})
+
+
+def settle_stock(agent: HostedAgent, task_id: str, task: Task, outcome: TaskOutcome) -> Tuple[Dict[str, Any], int]:
+    """Commit the reserved stock if accepted, else release it; returns the response body and status."""
+    if outcome.status != "accepted":
+        for key, _, _ in reservations(task_id, task):
+            agent.ledger.release(key)
+        return {"ok": True, "stock": on_hand(agent, task)}, 200
+    data = outcome.artifact.data if outcome.artifact else {}
+    # A multi-line quote lists only the agreed lines; the others release their stock
+    agreed = {f"{task_id}/{line['line']}": int(line["quantity"]) for line in data.get("lines") or []}
+    lines = []
+    for key, sku, quantity in reservations(task_id, task):
+        if task.line_items() and key not in agreed:
+            agent.ledger.release(key)
+            continue
+        lines.append((key, sku, agreed.get(key) or int(data.get("quantity") or quantity)))
+    # All lines or none; a refused deal frees its stock, as a rejected one would
+    if not agent.ledger.commit_all(lines):
+        for key, _, _ in lines:
+            agent.ledger.release(key)
+        logger.warning("stock_commit_refused task=%s skus=%s", task_id, [sku for _, sku, _ in lines])
+        return {"ok": False, "reason": "insufficient_stock"}, 409
+    for key, sku, quantity in lines:
+        logger.info("stock_committed task=%s sku=%s qty=%s", key, sku, quantity)
+    return {"ok": True, "stock": on_hand(agent, task)}, 200
+
+
+@router.post("/a2a/task/{task_id}/outcome")
+async def task_outcome(
+    request: Request,
+    task_id: str,
+    outcome: TaskOutcome = Depends(wire_body(TaskOutcome)),
+    agent: HostedAgent = Depends(current_agent),
+):
+    """Broker's final status for a task: commit the reserved stock if accepted, else release it.
+
+    Stock is settled once per task; a repeated outcome gets the first one's answer.
+    """
+    async with agent.task_lock(task_id):
+        entry = agent.tasks.get(task_id, {})
+        task = entry.get("task")
+        if task is None:
+            return wire_response(request, {"ok": False, "reason": "unknown_task"}, status_code=404)
+        if entry.get("outcome") is None:
+            body, status_code = await run_in_threadpool(settle_stock, agent, task_id, task, outcome)
+            entry["outcome"] = {"body": body, "status_code": status_code}
+            await run_in_threadpool(save_task, task_id, entry, agent.tasks_dir)
+            # Settled: nothing reads it again but a repeated outcome, which finds it in the archive
+            await run_in_threadpool(agent.tasks.settle, task_id)
+        settled = entry["outcome"]
+    return wire_response(request, settled["body"], status_code=settled["status_code"])
+
+
+@router.get("/stock")
+def stock(sku: Optional[str] = None, agent: HostedAgent = Depends(current_agent)):
+    """Ledger counters, open reservations and unflushed movements (plus on-hand for ``sku``)."""
+    snapshot = agent.ledger.snapshot()
+    if sku:
+        snapshot["sku"] = {"sku": sku, "on_hand": agent.ledger.on_hand(sku), "available": agent.ledger.available(sku)}
+    return snapshot
+
+
+def cached_reply(agent: HostedAgent, req: MessageRequest) -> Optional[Dict[str, Any]]:
+    if not req.message_id:
+        return None
+    return agent.tasks.get(req.task_id, {}).get("replies", {}).get(req.message_id)
+
+
+def remember_reply(agent: HostedAgent, req: MessageRequest, payload: Dict[str, Any]) -> None:
+    """Cache the reply under the broker's message id and persist the task state."""
+    entry = agent.tasks[req.task_id]
+    if req.message_id:
+        entry.setdefault("replies", {})[req.message_id] = {"reply": payload["reply"], "status": payload["status"]}
+    try:
+        save_task(req.task_id, entry, agent.tasks_dir)
+    except Exception:
+        logger.exception("task_persist_failed task=%s", req.task_id)
 
 
-@app.post("/a2a/message")
-def handle_message(req: MessageRequest):
-    price = read_pricing()
-    STATE["tasks"].setdefault(req.task_id, {"task": None, "messages": []})
-    STATE["tasks"][req.task_id]["messages"].append(req.message.model_dump())
+def prepare_decision(agent: HostedAgent, req: MessageRequest) -> Dict[str, Any]:
+    """Record the incoming message and build the decider arguments for this turn."""
+    entry = agent.tasks.setdefault(req.task_id, {"task": None, "messages": [], "replies": {}})
+    task = entry["task"]
+    # Use the catalog row for the negotiated SKU; unknown tasks fall back to the first row
+    price = get_pricing_for_sku(task.sku, agent.catalog) if task is not None else read_pricing(agent)
+    entry["messages"].append(req.message.model_dump())
 
-    import re
     content = req.message.content.lower()
     # Opening quote path
     if "request quote" in content or "quote" in content:
@@ -105,39 +274,295 @@ def handle_message(req: MessageRequest):
         m = re.search(r"(\$|usd\s*)?(\d{3,5})(?:\.(\d{2}))?", content)
         buyer_price = float(m.group(2) + (f".{m.group(3)}" if m.group(3) else "")) if m else None
 
-    try:
-        decision = decide_with_groq(
-            sku=price["sku"],
-            quantity=STATE["tasks"][req.task_id]["task"].quantity if STATE["tasks"][req.task_id]["task"] else 0,
-            buyer_price=buyer_price,
-            unit_price=price["unit_price"],
-            max_discount_pct=price["max_discount_pct"],
-            constraints=STATE["tasks"][req.task_id]["task"].constraints if STATE["tasks"][req.task_id]["task"] else {},
-            partner_message=req.message.content,
-            history_text=json.dumps(STATE["tasks"][req.task_id]["messages"][-4:]) if STATE["tasks"][req.task_id]["messages"] else "[]",
+    return {
+        "sku": price["sku"],
+        "quantity": task.quantity if task is not None else 0,
+        "buyer_price": buyer_price,
+        "unit_price": price["unit_price"],
+        "max_discount_pct": price["max_discount_pct"],
+        "constraints": task.constraints if task is not None else {},
+        "partner_message": req.message.content,
+        "history_text": json.dumps(entry["messages"][-4:]) if entry["messages"] else "[]",
+        # Broker-supplied market data, e.g. agreed-price history for the SKU
+        "context": task.context if task is not None else {},
+        "priority": task_priority(agent, req.task_id),
+        # Whose catalog, LLM key and persona decide this turn
+        "catalog": agent.catalog,
+        "key_env": agent.key_env,
+        "persona": agent.persona,
+    }
+
+
+def build_reply(decision: Dict[str, Any], case: Dict[str, Any]) -> Tuple[str, str]:
+    """Map a decision's action/price to the (status, content) of Kumar's reply."""
+    action = (decision.get("action") or "").lower()
+    offer_price = decision.get("price")
+    buyer_price = case["buyer_price"]
+
+    if action == "accept" and isinstance(buyer_price, (int, float)):
+        return "accepted", f"Accepted at ${buyer_price:.2f}"
+
+    if action == "counter" and isinstance(offer_price, (int, float)):
+        return "offer", f"Offer: ${float(offer_price):.2f}"
+
+    return "reject", "Rejecting: cannot meet requested price."
+
+
+def error_reply(agent: HostedAgent) -> Message:
+    return Message(role=agent.speaker, content="Rejecting due to decision error.", rationale="System got issue la.", transcript_response="Paiseh, system problem a bit.")
+
+
+def stock_shortfall(agent: HostedAgent, req: MessageRequest) -> Optional[Dict[str, Any]]:
+    """Reject without an LLM call when the task is settled or its quantity cannot be reserved (already promised).
+
+    A settled task's stock was committed or released by its outcome, so it never reserves
+    again; that refusal is not stored on the (archived) task.
+    """
+    if agent.settled(req.task_id):
+        reply = Message(
+            role=agent.speaker,
+            content="Rejecting: this deal is already settled.",
+            rationale="Outcome already recorded for this task.",
+            transcript_response="This one already closed la.",
         )
-        action = (decision.get("action") or "").lower()
-        offer_price = decision.get("price")
-        rationale = str(decision.get("rationale") or "")
-        speak = str(decision.get("transcript_response") or "")
-
-        if action == "accept" and isinstance(buyer_price, (int, float)):
-            reply = Message(role="Kumar", content=f"Accepted at ${buyer_price:.2f}", rationale=rationale, transcript_response=speak)
-            logger.info("reply_out status=accepted content=%s rationale=%s speak=%s", reply.content, reply.rationale, reply.transcript_response)
-            return {"reply": reply.model_dump(), "status": "accepted"}
-
-        if action == "counter" and isinstance(offer_price, (int, float)):
-            reply = Message(role="Kumar", content=f"Offer: ${float(offer_price):.2f}", rationale=rationale, transcript_response=speak)
-            logger.info("reply_out status=offer content=%s rationale=%s speak=%s", reply.content, reply.rationale, reply.transcript_response)
-            return {"reply": reply.model_dump(), "status": "offer"}
-
-        reply = Message(role="Kumar", content="Rejecting: cannot meet requested price.", rationale=rationale, transcript_response=speak)
-        logger.info("reply_out status=reject content=%s rationale=%s speak=%s", reply.content, reply.rationale, reply.transcript_response)
         return {"reply": reply.model_dump(), "status": "reject"}
+    task = agent.tasks.get(req.task_id, {}).get("task")
+    # Multi-line tasks hold stock per line, checked in answer_lines
+    if task is None or task.line_items() or agent.ledger.reserve(req.task_id, task.sku, task.quantity):
+        return None
+    reply = Message(
+        role=agent.speaker,
+        content=f"Rejecting: only {max(agent.ledger.available(task.sku), 0)} units of {task.sku} available.",
+        rationale="Stock already promised to other open deals.",
+        transcript_response="Aiyo paiseh, stock not enough for this order la.",
+    )
+    payload = {"reply": reply.model_dump(), "status": "reject"}
+    remember_reply(agent, req, payload)
+    return payload
+
+
+def answer_lines(agent: HostedAgent, req: MessageRequest, offers: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """One turn of a multi-SKU task: every open line decided in a single LLM call.
+
+    ``offers`` are the broker's LINE_OFFER parts by line id; a line whose stock cannot be
+    held is rejected without asking the LLM. The reply has one LINE_DECISION part per line,
+    and its status is ``accepted`` or ``reject`` only when every line says so.
+    """
+    entry = agent.tasks.setdefault(req.task_id, {"task": None, "messages": [], "replies": {}})
+    task = entry["task"]
+    entry["messages"].append(req.message.model_dump())
+
+    decisions: Dict[str, Dict[str, Any]] = {}
+    open_lines: List[Dict[str, Any]] = []
+    for line_id, offer in offers.items():
+        quantity = int(offer.get("quantity") or 0)
+        if agent.ledger.reserve(f"{req.task_id}/{line_id}", offer["sku"], quantity):
+            open_lines.append({"line": line_id, "sku": offer["sku"], "quantity": quantity, "buyer_price": offer.get("price")})
+            continue
+        decisions[line_id] = {
+            "action": "reject",
+            "price": None,
+            "rationale": f"Only {max(agent.ledger.available(offer['sku']), 0)} units of {offer['sku']} available.",
+            "transcript_response": "Aiyo paiseh, stock not enough for this line la.",
+        }
+    if open_lines:
+        decisions.update(decide_lines_with_groq(
+            open_lines,
+            task.constraints if task is not None else {},
+            partner_message=req.message.content,
+            history_text=json.dumps(entry["messages"][-4:]),
+            context=task.context if task is not None else {},
+            priority=task_priority(agent, req.task_id),
+            catalog=agent.catalog,
+            key_env=agent.key_env,
+            persona=agent.persona,
+        ))
 
-    except Exception:
-        logger.exception("decision_error org2")
-        reply = Message(role="Kumar", content="Rejecting due to decision error.", rationale="System got issue la.", transcript_response="Paiseh, system problem a bit.")
-        return {"reply": reply.model_dump(), "status": "reject"}
-
-
+    parts: List[Part] = []
+    rows: List[str] = []
+    for line_id, offer in offers.items():
+        decision = decisions[line_id]
+        status, text = build_reply(decision, {"buyer_price": offer.get("price")})
+        price = offer.get("price") if status == "accepted" else decision.get("price") if status == "offer" else None
+        parts.append(Part(type=LINE_DECISION, data={"line": line_id, "sku": offer["sku"], "status": status, "price": price}))
+        rows.append(f"{line_id} {offer['sku']}: {text}")
+    statuses = {p.data["status"] for p in parts}
+    status = statuses.pop() if len(statuses) == 1 and statuses <= {"accepted", "reject"} else "offer"
+    reply = Message(
+        role=agent.speaker,
+        content="\n".join(rows),
+        rationale="; ".join(f"{line_id}: {decisions[line_id].get('rationale') or ''}" for line_id in offers),
+        transcript_response=next((str(d.get("transcript_response")) for d in decisions.values() if d.get("transcript_response")), ""),
+        parts=parts,
+    )
+    logger.info("reply_out task=%s status=%s lines=%s content=%s", req.task_id, status, len(parts), msg_body(reply.content))
+    return {"reply": reply.model_dump(), "status": status}
+
+
+def busy_payload(e: RateLimitTimeout) -> Dict[str, Any]:
+    return {"status": "busy", "retry_after": e.retry_after, "backpressure": e.snapshot}
+
+
+def decide(agent: HostedAgent, req: MessageRequest, case: Dict[str, Any]) -> Dict[str, Any]:
+    return SPECULATOR.take(agent, req.task_id, case["buyer_price"]) or dispatch_decision(**case)
+
+
+@router.post("/a2a/message")
+async def handle_message(
+    request: Request,
+    req: MessageRequest = Depends(wire_body(MessageRequest)),
+    agent: HostedAgent = Depends(current_agent),
+):
+    """Blocking turn. Accepts and answers JSON or msgpack, negotiated via Content-Type/Accept.
+
+    Turns of one task are answered one at a time under its lock, so a resent message
+    waits for the first copy and gets its cached reply; LLM calls, catalog reads and task
+    files run in the threadpool.
+    """
+    async with agent.task_lock(req.task_id):
+        cached = cached_reply(agent, req)
+        if cached is not None:
+            logger.info("reply_replayed task=%s message_id=%s", req.task_id, req.message_id)
+            return wire_response(request, {**cached, "backpressure": backpressure(agent)})
+        # Multi-SKU turn: the broker's per-line prices come as LINE_OFFER parts
+        offers = line_parts(req.message, LINE_OFFER)
+        short = await run_in_threadpool(stock_shortfall, agent, req)
+        if short is not None:
+            return wire_response(request, {**short, "backpressure": backpressure(agent)})
+        if not offers:
+            case = await run_in_threadpool(prepare_decision, agent, req)
+
+        try:
+            if offers:
+                payload = await run_in_threadpool(answer_lines, agent, req, offers)
+                await run_in_threadpool(remember_reply, agent, req, payload)
+                return wire_response(request, {**payload, "backpressure": backpressure(agent)})
+            decision = await run_in_threadpool(decide, agent, req, case)
+            status, reply_text = build_reply(decision, case)
+            reply = Message(
+                role=agent.speaker,
+                content=reply_text,
+                rationale=str(decision.get("rationale") or ""),
+                transcript_response=str(decision.get("transcript_response") or ""),
+            )
+            logger.info(
+                "reply_out task=%s status=%s content=%s rationale=%s speak=%s",
+                req.task_id,
+                status,
+                msg_body(reply.content),
+                msg_body(reply.rationale),
+                msg_body(reply.transcript_response),
+            )
+            payload = {"reply": reply.model_dump(), "status": status}
+            await run_in_threadpool(remember_reply, agent, req, payload)
+            if status == "offer":
+                SPECULATOR.speculate(agent, req.task_id, case, "buyer_price", decision.get("price"), dispatch_decision)
+            return wire_response(request, {**payload, "backpressure": backpressure(agent)})
+
+        except RateLimitTimeout as e:
+            # Out of local LLM quota: drop this turn and ask the broker to retry later instead of rejecting
+            agent.tasks[req.task_id]["messages"].pop()
+            logger.warning("decision_throttled task=%s retry_after=%.1f", req.task_id, e.retry_after)
+            return wire_response(
+                request,
+                busy_payload(e),
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+
+        except Exception:
+            logger.exception("decision_error task=%s", req.task_id)
+            reply = error_reply(agent)
+            logger.info(
+                "reply_out task=%s status=reject content=%s rationale=%s speak=%s",
+                req.task_id,
+                msg_body(reply.content),
+                msg_body(reply.rationale),
+                msg_body(reply.transcript_response),
+            )
+            payload = {"reply": reply.model_dump(), "status": "reject"}
+            await run_in_threadpool(remember_reply, agent, req, payload)
+            return wire_response(request, {**payload, "backpressure": backpressure(agent)})
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+
+async def stream_turn(agent: HostedAgent, req: MessageRequest) -> AsyncIterator[str]:
+    # The task lock is taken here rather than in the handler, so it is held for the whole
+    # stream and always released, even if the client goes away before the body starts
+    async with agent.task_lock(req.task_id):
+        cached = cached_reply(agent, req)
+        if cached is not None:
+            logger.info("reply_replayed task=%s message_id=%s", req.task_id, req.message_id)
+        else:
+            cached = await run_in_threadpool(stock_shortfall, agent, req)
+        if cached is not None:
+            reply = cached["reply"]
+            yield sse_event("decision", {
+                "status": cached["status"],
+                "reply": {"role": reply["role"], "content": reply["content"]},
+                "backpressure": backpressure(agent),
+            })
+            yield sse_event("narrative", {"rationale": reply["rationale"], "transcript_response": reply["transcript_response"]})
+            yield sse_event("done", {})
+            return
+
+        case = await run_in_threadpool(prepare_decision, agent, req)
+        status, reply_text = "reject", ""
+        try:
+            async for kind, data in iterate_in_threadpool(decide_with_groq_stream(**case)):
+                if kind == "decision":
+                    status, reply_text = build_reply(data, case)
+                    logger.info("stream_decision task=%s status=%s content=%s", req.task_id, status, msg_body(reply_text))
+                    yield sse_event("decision", {
+                        "status": status,
+                        "reply": {"role": agent.speaker, "content": reply_text},
+                        "backpressure": backpressure(agent),
+                    })
+                else:
+                    reply = Message(
+                        role=agent.speaker,
+                        content=reply_text,
+                        rationale=data["rationale"],
+                        transcript_response=data["transcript_response"],
+                    )
+                    await run_in_threadpool(remember_reply, agent, req, {"reply": reply.model_dump(), "status": status})
+                    yield sse_event("narrative", {
+                        "rationale": data["rationale"],
+                        "transcript_response": data["transcript_response"],
+                    })
+        except RateLimitTimeout as e:
+            agent.tasks[req.task_id]["messages"].pop()
+            logger.warning("decision_throttled task=%s retry_after=%.1f", req.task_id, e.retry_after)
+            yield sse_event("busy", busy_payload(e))
+        except Exception:
+            logger.exception("decision_error task=%s", req.task_id)
+            reply = error_reply(agent)
+            yield sse_event("decision", {
+                "status": "reject",
+                "reply": {"role": reply.role, "content": reply.content},
+                "backpressure": backpressure(agent),
+            })
+            await run_in_threadpool(remember_reply, agent, req, {"reply": reply.model_dump(), "status": "reject"})
+            yield sse_event("narrative", {"rationale": reply.rationale, "transcript_response": reply.transcript_response})
+        yield sse_event("done", {})
+
+
+@router.post("/a2a/message/stream")
+async def handle_message_stream(
+    req: MessageRequest = Depends(wire_body(MessageRequest)),
+    agent: HostedAgent = Depends(current_agent),
+):
+    """SSE variant of /a2a/message.
+
+    Emits ``decision`` (status + reply content) as soon as action and price are parsed
+    from the streamed completion, then ``narrative`` (rationale, transcript_response),
+    then ``done``. A ``busy`` event replaces both when LLM quota is exhausted.
+    """
+    return StreamingResponse(stream_turn(agent, req), media_type="text/event-stream")
+
+
+app.include_router(router)
+app.include_router(router, prefix="/agents/{agent_id}")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Query cost of the broker's analytics rollups versus rescanning saved sessions.
+
+Writes ``--sessions`` synthetic finished sessions (transcript, artifact and checkpoint
+files, spread over ``--days`` days and ``--skus`` SKUs) to a temp data dir, then:
+
+- rebuilds the rollups from those files (what recomputing per request would cost);
+- folds the same sessions in one by one via ``record`` (the per-session update cost);
+- times ``query`` for each grouping, unfiltered and with a date filter, right after a
+  session closed (query cache empty) and cached.
+
+Example:
+    python scripts/bench_analytics.py --sessions 20000 --days 90 --skus 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "org0-broker"))
+
+from app.state.analytics import GROUP_FIELDS, Analytics  # noqa: E402
+from app.state.export import iter_bundles  # noqa: E402
+
+
+def write_sessions(data_dir: Path, count: int, days: int, skus: int, seed: int) -> None:
+    rng = random.Random(seed)
+    start = int(time.time()) - days * 86400
+    for i in range(count):
+        sid = f"session-{start + rng.randrange(days * 86400)}-{i:06x}"
+        sku = f"SKU-{rng.randrange(skus):04d}"
+        opening = round(rng.uniform(500, 3000), 2)
+        transcript = [{"role": "MayLim", "content": f"We want to buy 20 units of {sku}."}]
+        transcript.append({"role": "Kumar", "content": f"Offer: ${opening:.2f}"})
+        turns = rng.randint(1, 7)
+        price = opening
+        for _ in range(turns):
+            price = round(price * rng.uniform(0.97, 0.995), 2)
+            transcript.append({"role": "MayLim", "content": f"Counter: ${price:.2f}"})
+            transcript.append({"role": "Kumar", "content": f"Offer: ${price:.2f}"})
+        agreed = rng.random() < 0.7
+        artifact = {"type": "quote", "data": {"sku": sku, "quantity": 20, "unit_price": price}} if agreed else None
+        metrics = {org: {"turns": turns + 1, "ms": round(rng.uniform(20, 400) * (turns + 1), 1)} for org in ("org1", "org2")}
+        (data_dir / f"{sid}-transcript.json").write_text(json.dumps(transcript), encoding="utf-8")
+        (data_dir / f"{sid}-artifact.json").write_text(json.dumps(artifact), encoding="utf-8")
+        checkpoint = {"session_id": sid, "status": "completed", "task": {"sku": sku, "quantity": 20}, "metrics": metrics}
+        (data_dir / f"{sid}-checkpoint.json").write_text(json.dumps(checkpoint), encoding="utf-8")
+
+
+def timed_us(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return 1e6 * (time.perf_counter() - t0) / repeat
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=20000)
+    p.add_argument("--days", type=int, default=90)
+    p.add_argument("--skus", type=int, default=50)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="analytics-bench-"))
+    write_sessions(tmp, args.sessions, args.days, args.skus, args.seed)
+
+    rebuilt = Analytics(tmp / "analytics.json", tmp)
+    sessions, elapsed = rebuilt.rebuild()
+    print(f"rebuild from files: {sessions} sessions in {elapsed * 1000:.0f} ms")
+
+    live = Analytics(tmp / "live.json", tmp)
+    bundles = list(iter_bundles(tmp))
+    t0 = time.perf_counter()
+    for bundle in bundles:
+        live.record(bundle)
+    print(f"record: {1e6 * (time.perf_counter() - t0) / len(bundles):.1f} us/session")
+    del bundles
+    assert live.query("sku_day")["groups"] == rebuilt.query("sku_day")["groups"], "live and rebuilt rollups differ"
+
+    days = sorted({day for day, _ in live.cells})
+    since = days[len(days) // 2]
+    for group_by in GROUP_FIELDS:
+        for label, kwargs in (("all", {}), (f"since={since}", {"since": since})):
+            # A closed session clears the query cache; unchanged rollups keep their summaries
+            cold = timed_us(lambda: (live._cache.clear(), live.query(group_by, **kwargs)), 20)
+            warm = timed_us(lambda: live.query(group_by, **kwargs), 1000)
+            rows = len(live.query(group_by, **kwargs)["groups"])
+            print(f"query group_by={group_by:8s} {label:17s} rows={rows:5d} after_close={cold:8.1f} us cached={warm:5.2f} us")
+
+
+if __name__ == "__main__":
+    main()
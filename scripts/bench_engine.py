@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the broker's negotiation engine overhead per turn, with stubbed agents.
+
+Runs ``--sessions`` negotiations through ``app.negotiation.NegotiationEngine`` on one event
+loop. The stub org agents answer at once: the seller opens at ``--open``, each side
+concedes ``--step`` per turn and nobody accepts, so every session runs to its turn limit
+(``--turns`` rounds, two org turns each). Subscribers mirror the broker's (bump a version
+per entry, record backpressure, keep a checkpoint dict per round), so the time reported is
+what the engine, its table lookups, the event bus and the history summaries cost, without
+HTTP, LLM or disk.
+
+Example:
+    python scripts/bench_engine.py --sessions 2000 --turns 7
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "org0-broker"))
+
+from app.negotiation import NegotiationEngine, Side, extract_price  # noqa: E402
+from app.schemas import Message, Task, TranscriptRecord  # noqa: E402
+
+
+class StubOrg:
+    """Answers every turn at once, conceding ``step`` from its last price."""
+
+    def __init__(self, role: str, start: float, step: float):
+        self.role = role
+        self.price = start
+        self.step = step
+        self.backpressure: Dict[str, Any] = {"queue_depth": 0}
+
+    async def reply(self, message: Message) -> Tuple[Dict[str, Any], TranscriptRecord]:
+        if self.role == "seller":
+            self.price -= self.step
+            status, content = "offer", f"Offer: ${self.price:.2f}"
+        else:
+            asked = extract_price(message.content) or self.price
+            self.price = min(asked - 5 * self.step, self.price + self.step)
+            status, content = "counter", f"Counter: ${self.price:.2f}"
+        record = TranscriptRecord(role=self.role, content=content, rationale="stub", transcript_response="stub")
+        return {"status": status, "reply": {"role": self.role, "content": content}}, record
+
+
+async def run_session(n: int, turns: int, open_price: float, step: float) -> int:
+    task = Task(subject="bench", sku="MACBOOK-PRO-14", quantity=20, target_price=1789.0, constraints={"turn_limit": turns})
+    orgs = {"org1": StubOrg("buyer", 1700.0, step), "org2": StubOrg("seller", open_price + step, step)}
+    sess: Dict[str, Any] = {"version": 0, "checkpoint": None, "backpressure": {}}
+    transcript: List[TranscriptRecord] = []
+
+    async def send(side: Side, message: Message, message_id: str) -> Tuple[Dict[str, Any], TranscriptRecord]:
+        return await orgs[side.name].reply(message)
+
+    engine = NegotiationEngine(
+        f"bench-{n}", task, transcript,
+        buyer=Side("org1", "buyer", orgs["org1"], "t-1"),
+        seller=Side("org2", "seller", orgs["org2"], "t-1"),
+        send=send,
+    )
+    engine.bus.subscribe("entry", lambda record: sess.__setitem__("version", sess["version"] + 1))
+    engine.bus.subscribe("reply", lambda side, payload: sess["backpressure"].__setitem__(side.name, side.agent.backpressure))
+    engine.bus.subscribe("round", lambda progress: sess.__setitem__("checkpoint", dict(progress)))
+    await engine.run()
+    # Org turns sent: the opening quote plus two per round
+    return 1 + 2 * engine.turn
+
+
+async def run(sessions: int, turns: int, open_price: float, step: float, concurrency: int) -> Tuple[float, int]:
+    counter = itertools.count()
+    total_turns = 0
+
+    async def worker() -> None:
+        nonlocal total_turns
+        for n in iter(lambda: next(counter), None):
+            if n >= sessions:
+                return
+            total_turns += await run_session(n, turns, open_price, step)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - t0, total_turns
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=2000)
+    p.add_argument("--turns", type=int, default=7, help="turn_limit of every session")
+    p.add_argument("--open", type=float, default=1999.0, help="seller's opening price")
+    p.add_argument("--step", type=float, default=5.0, help="concession per turn")
+    p.add_argument("--concurrency", type=int, default=100, help="sessions in flight on the loop")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args()
+
+    runs = [asyncio.run(run(args.sessions, args.turns, args.open, args.step, args.concurrency)) for _ in range(args.repeat)]
+    per_turn_us = [1e6 * seconds / turns for seconds, turns in runs]
+    result = {
+        "sessions": args.sessions,
+        "turn_limit": args.turns,
+        "org_turns": runs[0][1],
+        "wall_s": round(statistics.median(s for s, _ in runs), 3),
+        "us_per_turn": round(statistics.median(per_turn_us), 2),
+        "us_per_turn_min": round(min(per_turn_us), 2),
+        "sessions_per_s": round(args.sessions / statistics.median(s for s, _ in runs), 1),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['sessions']} sessions x turn_limit {result['turn_limit']} = {result['org_turns']} org turns")
+    print(f"engine overhead: {result['us_per_turn']:.1f} us/turn (min {result['us_per_turn_min']:.1f}), "
+          f"{result['sessions_per_s']:.0f} sessions/s, wall {result['wall_s']:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Logging overhead per negotiation turn, as seen by the request thread.
+
+Replays the log calls of one broker turn (two ``recv`` records with full message bodies,
+one ``start``-style record and one ``final`` record) ``--turns`` times against several
+handler setups writing to a log file:
+
+- ``sync text``: the previous ``logging.basicConfig`` StreamHandler.
+- ``queue text`` / ``queue json``: ``a2a_common.log_setup`` queue handler; formatting moves to the listener.
+- ``queue json, no bodies``: plus LOG_MESSAGE_BODIES=0.
+- ``queue json, sampled``: plus ``recv=0.1`` sampling.
+
+``caller`` is time spent inside logger calls (what a request pays); ``drained`` includes
+the listener flushing everything. On a fast local file the queue mostly moves work to
+another thread; use ``--sink-latency-us`` to see a sink that blocks, where it matters.
+
+Example:
+    python scripts/bench_logging.py --turns 20000
+    python scripts/bench_logging.py --turns 2000 --sink-latency-us 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict
+
+from a2a_common import log_setup
+
+
+CONTENT = "Offer: $1949.00 for 20 units, delivery in two weeks, payment net 30. " * 2
+RATIONALE = "Stock is healthy and the buyer's counter is within our discount band, so we move slightly. " * 3
+SPEECH = "Boss, this one really best price already la, cannot go lower than this ah." * 2
+
+
+def one_turn(logger: logging.Logger, turn: int) -> None:
+    logger.info("start session=%s sku=%s qty=%s target=%s", "session-bench", "MACBOOK-PRO-14", 20, 1789.0)
+    for role in ("Kumar", "MayLim"):
+        logger.info(
+            "recv %s role=%s content=%s rationale=%s speak=%s",
+            role, role, log_setup.msg_body(CONTENT), log_setup.msg_body(RATIONALE), log_setup.msg_body(SPEECH),
+        )
+    logger.info("final artifact sku=%s qty=%s unit_price=%s total=%s turn=%s", "MACBOOK-PRO-14", 20, 1899.0, 37980.0, turn)
+
+
+class SlowSink:
+    """File wrapper whose writes block like a busy pipe or network log shipper."""
+
+    def __init__(self, f: Any, latency_s: float):
+        self.f = f
+        self.latency_s = latency_s
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency_s)
+        return self.f.write(text)
+
+    def flush(self) -> None:
+        self.f.flush()
+
+
+def run_case(name: str, turns: int, env: Dict[str, str], queued: bool, sink_path: str, latency_us: float) -> Dict[str, Any]:
+    for key in ("LOG_FORMAT", "LOG_SAMPLE", "LOG_MESSAGE_BODIES"):
+        os.environ.pop(key, None)
+    os.environ.update(env)
+    log_setup._BODIES = os.getenv("LOG_MESSAGE_BODIES", "1") != "0"
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.INFO)
+    sink = open(sink_path, "w", encoding="utf-8")
+    stream = SlowSink(sink, latency_us / 1e6) if latency_us else sink
+    listener = None
+    if queued:
+        handler, listener = log_setup.build_handler("bench", "bench", stream=stream)
+    else:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [bench] %(message)s"))
+    root.addHandler(handler)
+    logger = logging.getLogger("bench")
+
+    t0 = time.perf_counter()
+    for turn in range(turns):
+        one_turn(logger, turn)
+    caller = time.perf_counter() - t0
+    if listener is not None:
+        listener.stop()
+    drained = time.perf_counter() - t0
+    dropped = getattr(handler, "dropped", 0)
+    root.handlers.clear()
+    sink.close()
+    return {
+        "case": name,
+        "caller_us_per_turn": round(1e6 * caller / turns, 2),
+        "drained_us_per_turn": round(1e6 * drained / turns, 2),
+        "dropped": dropped,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--turns", type=int, default=20000)
+    p.add_argument("--sink", default=None, help="file the handlers write to (default: a temp file)")
+    p.add_argument("--sink-latency-us", type=float, default=0.0,
+                   help="sleep per write to emulate a blocking sink (stderr pipe, log shipper)")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args()
+    sink_path = args.sink or os.path.join(tempfile.gettempdir(), "bench_logging.log")
+    # Large enough that nothing is dropped; the point is per-call cost, not overflow
+    os.environ["LOG_QUEUE_SIZE"] = str(args.turns * 5)
+
+    cases = [
+        ("sync text", {}, False),
+        ("queue text", {}, True),
+        ("queue json", {"LOG_FORMAT": "json"}, True),
+        ("queue json, no bodies", {"LOG_FORMAT": "json", "LOG_MESSAGE_BODIES": "0"}, True),
+        ("queue json, sampled", {"LOG_FORMAT": "json", "LOG_MESSAGE_BODIES": "0", "LOG_SAMPLE": "recv=0.1,start=0.1"}, True),
+    ]
+    results = [run_case(name, args.turns, env, queued, sink_path, args.sink_latency_us) for name, env, queued in cases]
+    if args.json:
+        print(json.dumps({"turns": args.turns, "sink_latency_us": args.sink_latency_us, "results": results}, indent=2))
+        return
+    print(f"{'case':<24} {'caller us/turn':>15} {'drained us/turn':>16}")
+    for r in results:
+        print(f"{r['case']:<24} {r['caller_us_per_turn']:>15.2f} {r['drained_us_per_turn']:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
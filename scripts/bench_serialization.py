@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Serialization benchmark for the broker<->org wire and /api/transcript.
+
+Builds long transcripts whose messages carry large ``parts`` payloads and times each
+encoding path end to end: the old FastAPI default (jsonable_encoder + stdlib json), pydantic's
+``model_dump_json``, the ``a2a_common.wire`` helpers (orjson/stdlib), msgpack, and the matching
+decode + ``Message`` revalidation the broker does on every reply. orjson and msgpack rows
+are skipped when those packages are not installed.
+
+Example:
+    python scripts/bench_serialization.py --messages 200 --part-kb 16 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "org0-broker"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from a2a_common import wire  # noqa: E402
+from app.schemas import Message, Part, Transcript  # noqa: E402
+
+
+def build_transcript(messages: int, part_kb: int) -> Transcript:
+    rows = max(1, part_kb * 1024 // 96)
+    msgs: List[Message] = []
+    for i in range(messages):
+        role = "MayLim" if i % 2 else "Kumar"
+        quote = {
+            "sku": "MACBOOK-PRO-14",
+            "lines": [
+                {"line": n, "sku": f"SKU-{n:05d}", "qty": n % 50 + 1, "unit_price": 1799.0 + n % 200, "note": "bulk tier"}
+                for n in range(rows)
+            ],
+        }
+        msgs.append(Message(
+            role=role,
+            content=f"Offer: ${1949 - i:.2f}",
+            rationale="Hold margin while moving toward the buyer's target; stock is healthy.",
+            transcript_response="Boss, this one really best price already la.",
+            parts=[Part(type="quote", data=quote), Part(type="text", data="x" * 256)],
+        ))
+    return Transcript(session_id="session-bench", status="completed", transcript=msgs)
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()  # warm up caches and lazy imports
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=200, help="transcript length")
+    p.add_argument("--part-kb", type=int, default=16, help="approximate size of each message's quote part")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args()
+
+    transcript = build_transcript(args.messages, args.part_kb)
+    reply = {"reply": transcript.transcript[-1].model_dump(), "status": "counter", "backpressure": {}}
+
+    cases: Dict[str, Callable[[], Any]] = {
+        "transcript/encode jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(transcript)).encode(),
+        "transcript/encode model_dump_json": lambda: transcript.model_dump_json().encode(),
+        "transcript/encode wire json": lambda: wire.encode(transcript, wire.JSON_MEDIA),
+        "reply/encode stdlib json": lambda: json.dumps(reply, ensure_ascii=False).encode(),
+        "reply/encode wire json": lambda: wire.encode(reply, wire.JSON_MEDIA),
+    }
+    stdlib_body = json.dumps(reply).encode()
+    cases["reply/decode stdlib json+validate"] = lambda: Message(**json.loads(stdlib_body)["reply"])
+    cases["reply/decode wire json+validate"] = lambda: Message(**wire.loads_json(stdlib_body)["reply"])
+    if wire.orjson is not None:
+        dumped = transcript.model_dump()
+        cases["transcript/encode orjson(model_dump)"] = lambda: wire.orjson.dumps(transcript.model_dump())
+        cases["transcript/encode orjson(prebuilt dict)"] = lambda: wire.orjson.dumps(dumped)
+    if wire.msgpack_available():
+        packed = wire.encode(reply, wire.MSGPACK_MEDIA)
+        cases["reply/encode msgpack"] = lambda: wire.encode(reply, wire.MSGPACK_MEDIA)
+        cases["reply/decode msgpack+validate"] = lambda: Message(**wire.decode(packed, wire.MSGPACK_MEDIA)["reply"])
+
+    sizes = {
+        "transcript json bytes": len(transcript.model_dump_json()),
+        "reply json bytes": len(wire.encode(reply, wire.JSON_MEDIA)),
+    }
+    if wire.msgpack_available():
+        sizes["reply msgpack bytes"] = len(wire.encode(reply, wire.MSGPACK_MEDIA))
+
+    results = {name: timed(fn, args.repeat) for name, fn in cases.items()}
+    if args.json:
+        print(json.dumps({
+            "config": vars(args),
+            "orjson": wire.orjson is not None,
+            "msgpack": wire.msgpack_available(),
+            "sizes": sizes,
+            "results": results,
+        }, indent=2))
+        return
+
+    print(f"orjson={'yes' if wire.orjson is not None else 'no'} msgpack={'yes' if wire.msgpack_available() else 'no'}")
+    for name, size in sizes.items():
+        print(f"{name:<42} {size:>12,}")
+    for name, r in results.items():
+        print(f"{name:<42} median {r['median_ms']:>9.3f} ms   min {r['min_ms']:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
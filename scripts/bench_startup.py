@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Cold-start check for the three services: import time and time to first 200, against a budget.
+
+For each app, in fresh interpreters (``--runs`` times, medians reported):
+
+- ``import``: time to ``import app.main`` inside the service directory, plus a check that
+  none of the ``--lazy`` modules (default: ``groq``) were loaded at import;
+- ``ready``: time from spawning ``uvicorn app.main:app`` until ``GET /`` answers 200.
+
+Exits 1 when a median is over ``--import-budget-ms`` / ``--ready-budget-ms`` (defaults from
+STARTUP_IMPORT_BUDGET_MS / STARTUP_READY_BUDGET_MS) or a lazy module was imported eagerly,
+so it can gate a build. ``--prewarm`` sets PREWARM for the spawned servers.
+
+Example:
+    python scripts/bench_startup.py --runs 5
+    python scripts/bench_startup.py --import-budget-ms 800 --ready-budget-ms 2000 --prewarm blocking
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+SERVICES = ["org0-broker", "org1-companyA-maylim", "org2-companyB-kumar"]
+
+IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+print(json.dumps({"s": time.perf_counter() - t0, "loaded": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+def measure_import(service: str, lazy: List[str], env: Dict[str, str]) -> Tuple[float, List[str]]:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE, *lazy],
+        cwd=ROOT / service, env=env, capture_output=True, text=True, timeout=60, check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return result["s"], result["loaded"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_ready(service: str, env: Dict[str, str], timeout_s: float = 30.0) -> float:
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT / service, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout_s:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{service} exited with {proc.returncode} before answering")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as res:
+                    if res.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"{service} not ready after {timeout_s:.0f}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--import-budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500")))
+    p.add_argument("--ready-budget-ms", type=float, default=float(os.getenv("STARTUP_READY_BUDGET_MS", "3000")))
+    p.add_argument("--lazy", nargs="*", default=["groq"], help="modules that must not be imported at startup")
+    p.add_argument("--prewarm", choices=["background", "blocking", "off"], default="background")
+    p.add_argument("--service", action="append", choices=SERVICES, help="limit to these services (repeatable)")
+    args = p.parse_args()
+
+    env = {**os.environ, "PREWARM": args.prewarm}
+    failures = []
+    for service in args.service or SERVICES:
+        imports, loaded = [], set()
+        for _ in range(args.runs):
+            seconds, eager = measure_import(service, args.lazy, env)
+            imports.append(seconds)
+            loaded.update(eager)
+        ready = [measure_ready(service, env) for _ in range(args.runs)]
+        import_ms = 1000.0 * statistics.median(imports)
+        ready_ms = 1000.0 * statistics.median(ready)
+        problems = []
+        if import_ms > args.import_budget_ms:
+            problems.append(f"import {import_ms:.0f} ms > {args.import_budget_ms:.0f} ms")
+        if ready_ms > args.ready_budget_ms:
+            problems.append(f"ready {ready_ms:.0f} ms > {args.ready_budget_ms:.0f} ms")
+        if loaded:
+            problems.append(f"imported at startup: {', '.join(sorted(loaded))}")
+        print(f"{service:22s} import={import_ms:7.1f} ms (min {1000 * min(imports):.1f}) "
+              f"ready={ready_ms:7.1f} ms (min {1000 * min(ready):.1f}) {'OK' if not problems else 'FAIL: ' + '; '.join(problems)}")
+        failures += problems
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
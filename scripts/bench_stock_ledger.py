@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Concurrency check for the stock ledger: many parallel deals, no overselling, few rewrites.
+
+Writes a one-SKU seller catalog to a temp dir and runs ``--deals`` negotiations from ``--threads``
+threads. Each deal reserves ``--quantity`` units, "negotiates" for a random few
+milliseconds, then commits or releases (``--accept-rate``). At the end the script checks:
+
+- stock in the CSV equals the starting stock minus committed units and never went negative;
+- no commit was refused (every accepted deal held its reservation);
+- how many catalog rewrites (flushes) the committed deals cost.
+
+Example:
+    python scripts/bench_stock_ledger.py --deals 2000 --threads 64 --stock 5000 --quantity 5
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from a2a_common.catalog import Catalog
+from a2a_common.stock_ledger import StockLedger
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--deals", type=int, default=2000)
+    p.add_argument("--threads", type=int, default=64)
+    p.add_argument("--stock", type=int, default=5000)
+    p.add_argument("--quantity", type=int, default=5)
+    p.add_argument("--accept-rate", type=float, default=0.7)
+    p.add_argument("--flush-interval-s", type=float, default=0.2)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="stock-ledger-"))
+    csv_path = tmp / "pricing.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["sku", "stock", "unit_price", "max_discount_pct"])
+        w.writerow(["MACBOOK-PRO-14", args.stock, 1999, 0.10])
+    catalog = Catalog(csv_path, {"sku": str, "stock": int, "unit_price": float, "max_discount_pct": float})
+    ledger = StockLedger(catalog, sells=True, journal_path=tmp / "journal.jsonl", flush_interval_s=args.flush_interval_s).start()
+
+    lowest = [args.stock]
+    lock = threading.Lock()
+    committed_units = [0]
+
+    def deal(i: int) -> str:
+        rng = random.Random(args.seed * 1_000_003 + i)
+        task_id = f"t-{i}"
+        if not ledger.reserve(task_id, "MACBOOK-PRO-14", args.quantity):
+            return "refused"
+        time.sleep(rng.uniform(0.001, 0.01))
+        if rng.random() < args.accept_rate:
+            if not ledger.commit(task_id, "MACBOOK-PRO-14", args.quantity):
+                return "commit_refused"
+            with lock:
+                committed_units[0] += args.quantity
+                lowest[0] = min(lowest[0], ledger.on_hand("MACBOOK-PRO-14"))
+            return "committed"
+        ledger.release(task_id)
+        return "released"
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        outcomes = list(pool.map(deal, range(args.deals)))
+    elapsed = time.perf_counter() - t0
+    ledger.stop()
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        final = int(next(csv.DictReader(f))["stock"])
+    counts = {k: outcomes.count(k) for k in ("committed", "released", "refused", "commit_refused")}
+    expected = args.stock - committed_units[0]
+    print(f"deals={args.deals} threads={args.threads} elapsed={elapsed:.2f}s {counts}")
+    print(f"stock start={args.stock} final_csv={final} expected={expected} lowest_on_hand={lowest[0]}")
+    print(f"catalog rewrites={ledger.stats['flushes']} for {counts['committed']} committed deals")
+    ok = final == expected and lowest[0] >= 0 and final >= 0 and counts["commit_refused"] == 0
+    print("OK" if ok else "MISMATCH")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
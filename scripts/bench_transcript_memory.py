@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Memory benchmark: retained transcripts as pydantic Messages vs TranscriptRecords.
+
+Builds ``--sessions`` transcripts of ``--turns`` entries each (the shape the broker keeps
+in ``STATE["sessions"]``), once as ``Message`` models and once as slotted
+``TranscriptRecord``s, and reports traced allocation per representation with tracemalloc.
+
+Example:
+    python scripts/bench_transcript_memory.py --sessions 20000 --turns 12
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "shared"))
+
+from a2a_schemas import Message, Part, TranscriptRecord  # noqa: E402
+
+
+ROLES = ("MayLim", "Kumar", "broker")
+
+
+def make_message(session: int, turn: int, with_parts: bool) -> Message:
+    # Fresh strings per entry, like values decoded off the wire
+    return Message(
+        role="".join(ROLES[turn % 3]),
+        content=f"Offer: ${1949 - turn:.2f}",
+        rationale=f"Hold margin for session {session}; stock is healthy and the buyer is close.",
+        transcript_response="Boss, this one really best price already la.",
+        parts=[Part(type="quote", data={"sku": "MACBOOK-PRO-14", "unit_price": 1949.0 - turn})] if with_parts else [],
+    )
+
+
+def measure(build: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    retained = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return current
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=20000)
+    p.add_argument("--turns", type=int, default=12, help="transcript entries per session")
+    p.add_argument("--parts-every", type=int, default=3, help="attach a quote part to every Nth entry (0 = never)")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args()
+
+    def entries(convert: Callable[[Message], Any]) -> Callable[[], List[List[Any]]]:
+        def build() -> List[List[Any]]:
+            return [
+                [
+                    convert(make_message(s, t, bool(args.parts_every) and t % args.parts_every == 0))
+                    for t in range(args.turns)
+                ]
+                for s in range(args.sessions)
+            ]
+        return build
+
+    results: Dict[str, int] = {
+        "pydantic Message": measure(entries(lambda m: m)),
+        "TranscriptRecord": measure(entries(TranscriptRecord.from_message)),
+    }
+    total = args.sessions * args.turns
+    base = results["pydantic Message"]
+    if args.json:
+        print(json.dumps({
+            "config": vars(args),
+            "bytes": results,
+            "bytes_per_entry": {k: round(v / total, 1) for k, v in results.items()},
+            "reduction": round(1 - results["TranscriptRecord"] / base, 4) if base else 0.0,
+        }, indent=2))
+        return
+
+    print(f"{args.sessions:,} sessions x {args.turns} entries = {total:,} transcript entries")
+    for name, size in results.items():
+        print(f"{name:<18} {size / 2**20:>9.1f} MiB   {size / total:>7.1f} B/entry   {size / base:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
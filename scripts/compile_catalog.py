@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Compile inventory/pricing CSVs into the indexed SQLite catalogs the org servers read.
+
+With no arguments, compiles ``org1-companyA-maylim/data/companyA_inventory.csv`` and
+``org2-companyB-kumar/data/companyB_pricing.csv`` into ``.db`` files next to them. The
+servers also do this on first lookup when the CSV is newer than its ``.db``; running the
+tool ahead of time (e.g. after a catalog drop) keeps that rebuild off the request path.
+
+``--bench N`` writes an N-row synthetic pricing CSV to a temp dir and compares per-lookup
+cost of the old row-by-row ``csv.DictReader`` scan against the compiled catalog.
+
+Example:
+    python scripts/compile_catalog.py
+    python scripts/compile_catalog.py --csv supplier_pricing.csv --db supplier_pricing.db
+    python scripts/compile_catalog.py --bench 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from a2a_common.catalog import Catalog, compile_csv
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+DEFAULT_CSVS = [
+    ROOT / "org1-companyA-maylim" / "data" / "companyA_inventory.csv",
+    ROOT / "org2-companyB-kumar" / "data" / "companyB_pricing.csv",
+]
+# Same converters as INVENTORY / PRICING in each org's groq_decider.py
+COLUMN_TYPES: Dict[str, Callable[[str], Any]] = {
+    "sku": str,
+    "stock": int,
+    "reorder_threshold": int,
+    "reorder_amount": int,
+    "unit_price": float,
+    "max_discount_pct": float,
+}
+
+
+def columns_for(csv_path: Path) -> Dict[str, Callable[[str], Any]]:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f))
+    return {name: COLUMN_TYPES.get(name, str) for name in header}
+
+
+def compile_one(csv_path: Path, db_path: Path) -> None:
+    t0 = time.perf_counter()
+    rows = compile_csv(csv_path, db_path, columns_for(csv_path))
+    print(f"{csv_path} -> {db_path}: {rows} rows in {time.perf_counter() - t0:.2f}s")
+
+
+def scan_lookup(csv_path: Path, sku: str) -> Dict[str, Any]:
+    """The pre-catalog lookup: DictReader plus conversions until the row is found."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("sku") == sku:
+                return {
+                    "sku": row["sku"],
+                    "stock": int(row["stock"]),
+                    "unit_price": float(row["unit_price"]),
+                    "max_discount_pct": float(row["max_discount_pct"]),
+                }
+    return {}
+
+
+def bench(rows: int, lookups: int) -> None:
+    tmp = Path(tempfile.mkdtemp(prefix="catalog-bench-"))
+    csv_path = tmp / "pricing.csv"
+    rng = random.Random(0)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["sku", "stock", "unit_price", "max_discount_pct"])
+        for i in range(rows):
+            w.writerow([f"SKU-{i:08d}", rng.randint(0, 500), round(rng.uniform(5, 5000), 2), round(rng.uniform(0, 0.3), 3)])
+    skus = [f"SKU-{rng.randrange(rows):08d}" for _ in range(lookups)]
+
+    compile_one(csv_path, tmp / "pricing.db")
+    catalog = Catalog(csv_path, columns_for(csv_path), tmp / "pricing.db")
+    t0 = time.perf_counter()
+    catalog.get(skus[0])
+    first_ms = 1e3 * (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for sku in skus:
+        catalog.get(sku)
+    db_us = 1e6 * (time.perf_counter() - t0) / len(skus)
+
+    scans = skus[: max(1, min(20, lookups))]
+    t0 = time.perf_counter()
+    for sku in scans:
+        scan_lookup(csv_path, sku)
+    scan_us = 1e6 * (time.perf_counter() - t0) / len(scans)
+    print(f"rows={rows} csv_scan={scan_us / 1000:.2f} ms/lookup catalog={db_us:.1f} us/lookup "
+          f"(first lookup incl. open {first_ms:.2f} ms) speedup={scan_us / db_us:.0f}x")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--csv", type=Path, help="CSV to compile (default: both org catalogs)")
+    p.add_argument("--db", type=Path, help="output path (default: the CSV path with .db)")
+    p.add_argument("--bench", type=int, metavar="ROWS", help="benchmark lookups on a synthetic catalog of ROWS rows")
+    p.add_argument("--lookups", type=int, default=10000)
+    args = p.parse_args()
+
+    if args.bench:
+        bench(args.bench, args.lookups)
+        return
+    for csv_path in [args.csv] if args.csv else DEFAULT_CSVS:
+        compile_one(csv_path, args.db or csv_path.with_suffix(".db"))
+
+
+if __name__ == "__main__":
+    main()
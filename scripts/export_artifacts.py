@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Bulk export of persisted negotiations, and compaction of the broker's session files.
+
+``export`` streams sessions (one row each: outcome, artifact type, SKU, quantity, price)
+or transcript messages from ``org0-broker/app/state/data`` into numbered JSONL/CSV files of at
+most ``--chunk-rows`` rows, optionally gzipped. Sessions are read one at a time, so memory
+stays flat however many match. ``--since``/``--until`` take ISO dates or epoch seconds.
+
+``compact`` rolls finished sessions older than ``--min-age-s`` into gzip JSONL segments
+under ``app/state/data/segments/`` and deletes their per-session files. Exports and
+``/api/export`` read segments and loose files alike.
+
+Example:
+    python scripts/export_artifacts.py export --kind sessions --format csv --gzip --since 2026-01-01
+    python scripts/export_artifacts.py export --kind messages --sku MACBOOK-PRO-14 --chunk-rows 50000
+    python scripts/export_artifacts.py compact --min-age-s 86400 --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "org0-broker"))
+
+from app.state.export import DATA_DIR, compact, parse_time, write_chunks  # noqa: E402
+
+
+def run_export(args: argparse.Namespace) -> None:
+    t0 = time.perf_counter()
+    written = write_chunks(
+        args.out_dir,
+        args.prefix or args.kind,
+        args.kind,
+        args.format,
+        "gzip" if args.gzip else "none",
+        args.chunk_rows,
+        data_dir=args.data_dir,
+        since=parse_time(args.since),
+        until=parse_time(args.until),
+        sku=args.sku,
+        status=args.status,
+        artifact_type=args.type,
+    )
+    for path, rows in written:
+        print(f"{path}: {rows} rows, {path.stat().st_size} bytes")
+    print(f"{sum(rows for _, rows in written)} rows in {len(written)} file(s), {time.perf_counter() - t0:.2f}s")
+
+
+def run_compact(args: argparse.Namespace) -> None:
+    stats = compact(args.data_dir, args.segment_sessions, args.min_age_s, args.dry_run)
+    prefix = "would compact" if args.dry_run else "compacted"
+    print(f"{prefix} sessions={stats['sessions']} segments={stats['segments']} "
+          f"files_removed={stats['files_removed']} bytes_before={stats['bytes_before']} bytes_after={stats['bytes_after']}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = p.add_subparsers(dest="command", required=True)
+
+    e = sub.add_parser("export", help="write sessions or messages to chunked JSONL/CSV files")
+    e.add_argument("--kind", choices=["sessions", "messages"], default="sessions")
+    e.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    e.add_argument("--gzip", action="store_true")
+    e.add_argument("--since", help="ISO date/datetime or epoch seconds (inclusive)")
+    e.add_argument("--until", help="ISO date/datetime or epoch seconds (exclusive)")
+    e.add_argument("--sku")
+    e.add_argument("--status", choices=["agreed", "no_deal", "error"])
+    e.add_argument("--type", help="artifact type, e.g. quote")
+    e.add_argument("--out-dir", type=Path, default=Path("export"))
+    e.add_argument("--prefix", help="file name prefix (default: the kind)")
+    e.add_argument("--chunk-rows", type=int, default=100_000)
+    e.set_defaults(func=run_export)
+
+    c = sub.add_parser("compact", help="roll old per-session files into gzip segments")
+    c.add_argument("--segment-sessions", type=int, default=1000)
+    c.add_argument("--min-age-s", type=float, default=3600.0)
+    c.add_argument("--dry-run", action="store_true")
+    c.set_defaults(func=run_compact)
+
+    args = p.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Load generator for org0-broker.
+
+Starts many concurrent negotiations with a weighted SKU/quantity/target mix and ramps
+concurrency (1, 2, 4, ...) until throughput stops improving or the error rate crosses a
+threshold. Each step records HDR-style latency histograms for time to the first org
+message and for session completion, and the whole run is written as JSON so results
+can be diffed across releases.
+
+Example:
+    python scripts/loadgen.py --mix MACBOOK-PRO-14:20:1789:3 --mix MACBOOK-PRO-14:5:1850:1 \\
+        --step-seconds 30 --out loadgen-$(git rev-parse --short HEAD).json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+
+class Histogram:
+    """Log-linear latency histogram (HDR style) with bounded relative error.
+
+    Values are bucketed by power-of-two magnitude, then linearly into ``sub_buckets``
+    slots inside each magnitude, so every recorded value is within ``1 / sub_buckets``
+    of its bucket's upper bound regardless of scale.
+    """
+
+    def __init__(self, sub_buckets: int = 128, unit_ms: float = 0.1):
+        self._sub_bits = max(int(math.log2(sub_buckets)), 1)
+        self.sub_buckets = 1 << self._sub_bits
+        self.unit_ms = unit_ms
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.min_ms = math.inf
+        self.max_ms = 0.0
+        self.sum_ms = 0.0
+
+    def _index(self, value_ms: float) -> int:
+        units = max(int(value_ms / self.unit_ms), 0)
+        magnitude = max(units.bit_length() - self._sub_bits, 0)
+        return magnitude * self.sub_buckets + (units >> magnitude)
+
+    def _upper_ms(self, index: int) -> float:
+        magnitude, sub = divmod(index, self.sub_buckets)
+        return ((sub + 1) << magnitude) * self.unit_ms
+
+    def record(self, value_ms: float) -> None:
+        idx = self._index(value_ms)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.total += 1
+        self.sum_ms += value_ms
+        self.min_ms = min(self.min_ms, value_ms)
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, pct: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * pct / 100.0))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(self._upper_ms(idx), self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "min_ms": round(self.min_ms, 2) if self.total else 0.0,
+            "mean_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "percentiles_ms": {
+                f"p{p:g}": round(self.percentile(p), 2) for p in (50, 75, 90, 95, 99, 99.9)
+            },
+            # Sparse bucket dump so two runs can be merged or re-percentiled offline
+            "buckets": [[round(self._upper_ms(i), 2), c] for i, c in sorted(self.counts.items())],
+        }
+
+
+@dataclass
+class MixEntry:
+    sku: str
+    quantity: int
+    target_price: float
+    turn_limit: int
+    weight: float
+
+
+def parse_mix(spec: str, turn_limit: int) -> MixEntry:
+    """``SKU:quantity:target_price[:weight]``."""
+    parts = spec.split(":")
+    if len(parts) not in (3, 4):
+        raise argparse.ArgumentTypeError(f"bad --mix {spec!r}; expected SKU:qty:target[:weight]")
+    weight = float(parts[3]) if len(parts) == 4 else 1.0
+    return MixEntry(parts[0], int(parts[1]), float(parts[2]), turn_limit, weight)
+
+
+@dataclass
+class SessionResult:
+    ok: bool
+    status: str
+    first_message_ms: Optional[float]
+    completion_ms: Optional[float]
+    error: str = ""
+
+
+async def run_session(client: httpx.AsyncClient, entry: MixEntry, poll_s: float, timeout_s: float) -> SessionResult:
+    start = time.perf_counter()
+    attempt = 0
+    try:
+        while True:
+            res = await client.post(
+                "/api/start",
+                params={"wait": "false"},
+                json={
+                    "sku": entry.sku,
+                    "quantity": entry.quantity,
+                    "target_price": entry.target_price,
+                    "turn_limit": entry.turn_limit,
+                    "attempt": attempt,
+                },
+            )
+            # Broker admission control: come back after Retry-After, as long as the session budget allows
+            if res.status_code == 429:
+                wait_s = float(res.headers.get("Retry-After", "1"))
+                if time.perf_counter() - start + wait_s > timeout_s:
+                    return SessionResult(False, "refused", None, None, "429 until session timeout")
+                attempt += 1
+                await asyncio.sleep(wait_s)
+                continue
+            res.raise_for_status()
+            session_id = res.json()["session_id"]
+            break
+    except Exception as e:
+        return SessionResult(False, "start_failed", None, None, f"{type(e).__name__}: {e}")
+
+    first_ms: Optional[float] = None
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed > timeout_s:
+            return SessionResult(False, "timeout", first_ms, None, "session timed out")
+        try:
+            res = await client.get("/api/transcript", params={"session_id": session_id})
+            res.raise_for_status()
+            data = res.json()
+        except Exception as e:
+            return SessionResult(False, "poll_failed", first_ms, None, f"{type(e).__name__}: {e}")
+        now_ms = (time.perf_counter() - start) * 1000.0
+        # transcript[0] is the broker-seeded intro; the first org reply is the next entry
+        if first_ms is None and len(data.get("transcript") or []) > 1:
+            first_ms = now_ms
+        status = data.get("status")
+        if status not in ("queued", "running"):
+            return SessionResult(status == "completed", status or "unknown", first_ms, now_ms)
+        await asyncio.sleep(poll_s)
+
+
+async def run_step(
+    base_url: str,
+    mix: List[MixEntry],
+    concurrency: int,
+    duration_s: float,
+    poll_s: float,
+    timeout_s: float,
+    rng: random.Random,
+) -> Dict[str, Any]:
+    """Keep ``concurrency`` sessions in flight for ``duration_s`` and summarise them."""
+    first_hist = Histogram()
+    done_hist = Histogram()
+    statuses: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    weights = [m.weight for m in mix]
+    deadline = time.perf_counter() + duration_s
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(30.0, connect=5.0), limits=limits) as client:
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                entry = rng.choices(mix, weights=weights)[0]
+                r = await run_session(client, entry, poll_s, timeout_s)
+                statuses[r.status] = statuses.get(r.status, 0) + 1
+                if r.error:
+                    errors[r.error[:120]] = errors.get(r.error[:120], 0) + 1
+                if r.first_message_ms is not None:
+                    first_hist.record(r.first_message_ms)
+                if r.ok and r.completion_ms is not None:
+                    done_hist.record(r.completion_ms)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_s = time.perf_counter() - started
+
+    total = sum(statuses.values())
+    completed = statuses.get("completed", 0)
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 3),
+        "sessions": total,
+        "completed": completed,
+        "error_rate": round((total - completed) / total, 4) if total else 0.0,
+        "throughput_per_s": round(completed / wall_s, 4) if wall_s > 0 else 0.0,
+        "statuses": statuses,
+        "errors": errors,
+        "time_to_first_message": first_hist.summary(),
+        "session_completion": done_hist.summary(),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = [parse_mix(s, args.turn_limit) for s in (args.mix or ["MACBOOK-PRO-14:20:1789"])]
+    rng = random.Random(args.seed)
+    steps: List[Dict[str, Any]] = []
+    stop_reason = "max_concurrency"
+    best = 0.0
+    concurrency = args.start_concurrency
+
+    while concurrency <= args.max_concurrency:
+        step = await run_step(args.url, mix, concurrency, args.step_seconds, args.poll_ms / 1000.0, args.session_timeout, rng)
+        steps.append(step)
+        done = step["session_completion"]["percentiles_ms"]
+        print(
+            f"c={concurrency:<4} sessions={step['sessions']:<5} tput={step['throughput_per_s']:.3f}/s "
+            f"err={step['error_rate']:.2%} p50={done['p50']:.0f}ms p99={done['p99']:.0f}ms",
+            file=sys.stderr,
+        )
+        if step["sessions"] and step["error_rate"] > args.max_error_rate:
+            stop_reason = "error_rate"
+            break
+        if best > 0 and step["throughput_per_s"] < best * (1.0 + args.plateau_gain):
+            stop_reason = "plateau"
+            break
+        best = max(best, step["throughput_per_s"])
+        concurrency *= 2
+
+    saturation = max(steps, key=lambda s: s["throughput_per_s"]) if steps else None
+    return {
+        "tool": "loadgen",
+        "version": 1,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "target": args.url,
+        "config": {
+            "mix": [m.__dict__ for m in mix],
+            "step_seconds": args.step_seconds,
+            "start_concurrency": args.start_concurrency,
+            "max_concurrency": args.max_concurrency,
+            "plateau_gain": args.plateau_gain,
+            "max_error_rate": args.max_error_rate,
+            "session_timeout_s": args.session_timeout,
+            "seed": args.seed,
+        },
+        "stop_reason": stop_reason,
+        "saturation": {
+            "concurrency": saturation["concurrency"],
+            "throughput_per_s": saturation["throughput_per_s"],
+        } if saturation else None,
+        "steps": steps,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Ramp concurrent negotiations against org0-broker.")
+    p.add_argument("--url", default="http://127.0.0.1:8001", help="broker base URL")
+    p.add_argument("--mix", action="append", metavar="SKU:QTY:TARGET[:WEIGHT]",
+                   help="task mix entry; repeat for a weighted mix (default MACBOOK-PRO-14:20:1789)")
+    p.add_argument("--turn-limit", type=int, default=7)
+    p.add_argument("--start-concurrency", type=int, default=1)
+    p.add_argument("--max-concurrency", type=int, default=256)
+    p.add_argument("--step-seconds", type=float, default=20.0, help="how long each concurrency step runs")
+    p.add_argument("--plateau-gain", type=float, default=0.05,
+                   help="stop once doubling concurrency improves throughput by less than this fraction")
+    p.add_argument("--max-error-rate", type=float, default=0.05, help="stop once a step's error rate exceeds this")
+    p.add_argument("--session-timeout", type=float, default=120.0, help="seconds before a session counts as failed")
+    p.add_argument("--poll-ms", type=float, default=100.0, help="transcript polling interval")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", help="write the JSON report here (default stdout)")
+    args = p.parse_args()
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"wrote {args.out} (stop={report['stop_reason']})", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
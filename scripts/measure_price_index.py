@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""A/B the broker's price history: turns and LLM calls per deal with and without it.
+
+Runs ``--deals`` negotiations per arm against a live broker, interleaving the arms so both
+see the same model/rate-limit conditions. The ``history`` arm starts sessions with
+``use_price_history=true`` (the default), the ``cold`` arm with ``false``. With an empty
+index, ``--seed-deals`` closes some deals first so there is history to share.
+
+Per arm it reports deal rate, org turns per session (one LLM decision each) and LLM calls
+per closed deal (org decisions plus the broker conclusion).
+
+Example:
+    python scripts/measure_price_index.py --deals 20 --seed-deals 10 --out price-index-ab.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+from typing import Any, Dict, List
+
+import httpx
+
+
+ORG_ROLES = {"MayLim", "Kumar"}
+
+
+def run_deal(client: httpx.Client, task: Dict[str, Any], use_history: bool) -> Dict[str, Any]:
+    res = client.post("/api/start", json={**task, "use_price_history": use_history})
+    res.raise_for_status()
+    session_id = res.json()["session_id"]
+    data = client.get("/api/transcript", params={"session_id": session_id}).json()
+    entries = data.get("transcript") or []
+    # entries[0] is the broker-seeded intro, spoken as MayLim but not an LLM decision
+    org_turns = sum(1 for m in entries[1:] if m.get("role") in ORG_ROLES)
+    closed = data.get("artifact") is not None
+    return {
+        "session_id": session_id,
+        "status": data.get("status"),
+        "closed": closed,
+        "org_turns": org_turns,
+        "llm_calls": org_turns + (1 if closed else 0),
+        "unit_price": (data.get("artifact") or {}).get("data", {}).get("unit_price"),
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    closed = [r for r in runs if r["closed"]]
+    prices = [r["unit_price"] for r in closed if r["unit_price"] is not None]
+    return {
+        "sessions": len(runs),
+        "deal_rate": round(len(closed) / len(runs), 4) if runs else 0.0,
+        "org_turns_mean": round(statistics.mean(r["org_turns"] for r in runs), 3) if runs else 0.0,
+        "llm_calls_per_deal": round(sum(r["llm_calls"] for r in runs) / len(closed), 3) if closed else None,
+        "unit_price_mean": round(statistics.mean(prices), 2) if prices else None,
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--url", default="http://127.0.0.1:8001")
+    p.add_argument("--sku", default="MACBOOK-PRO-14")
+    p.add_argument("--quantity", type=int, default=20)
+    p.add_argument("--target-price", type=float, default=1789.0)
+    p.add_argument("--turn-limit", type=int, default=7)
+    p.add_argument("--deals", type=int, default=10, help="sessions per arm")
+    p.add_argument("--seed-deals", type=int, default=0, help="sessions run first (with history) to populate the index")
+    p.add_argument("--out", help="write the JSON report here (default stdout)")
+    args = p.parse_args()
+
+    task = {"sku": args.sku, "quantity": args.quantity, "target_price": args.target_price, "turn_limit": args.turn_limit}
+    runs: Dict[str, List[Dict[str, Any]]] = {"cold": [], "history": []}
+    with httpx.Client(base_url=args.url, timeout=httpx.Timeout(300.0, connect=5.0)) as client:
+        for _ in range(args.seed_deals):
+            run_deal(client, task, True)
+        index_before = client.get("/api/price-index", params={"sku": args.sku}).json()
+        for i in range(args.deals):
+            for arm in (("cold", "history") if i % 2 == 0 else ("history", "cold")):
+                r = run_deal(client, task, arm == "history")
+                runs[arm].append(r)
+                print(f"{arm:<8} {r['session_id']} turns={r['org_turns']} closed={r['closed']}", file=sys.stderr)
+
+    cold, warm = summarize(runs["cold"]), summarize(runs["history"])
+    report = {
+        "config": vars(args),
+        "index_at_start": index_before,
+        "cold": cold,
+        "history": warm,
+        "turn_reduction": round(1 - warm["org_turns_mean"] / cold["org_turns_mean"], 4) if cold["org_turns_mean"] else None,
+        "llm_call_reduction": (
+            round(1 - warm["llm_calls_per_deal"] / cold["llm_calls_per_deal"], 4)
+            if cold["llm_calls_per_deal"] and warm["llm_calls_per_deal"] else None
+        ),
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Offline negotiation simulator for tuning acceptance bands, seller floors and turn limits.
+
+Models the two agents from ``groq_decider.py`` as parameterized strategies and plays the
+broker's loop (seller quote, then buyer accept/counter and seller accept/counter per turn,
+up to ``turn_limit``) for millions of negotiations at once with NumPy, no LLM involved:
+
+- Buyer (MayLim): accepts when the offer is within ``band_abs`` dollars or ``band_pct`` of
+  the target (the "+$40 / +2.5%" prompt rule). Otherwise it counters, starting
+  ``buyer_anchor_pct`` below target and closing ``buyer_concession`` of the gap to the offer
+  each turn, never above its acceptance ceiling.
+- Seller (Kumar): never goes below ``floor = unit_price * (1 - max_discount)``. It accepts
+  a counter within ``seller_accept_pct`` of its own offer. Otherwise it gives up
+  ``seller_concession`` of the gap, clamped to the floor.
+- ``noise_pct`` adds Gaussian jitter to the buyer's acceptance threshold, standing in for
+  LLM variance.
+
+Negotiations draw SKUs from the joined ``companyA_inventory.csv`` / ``companyB_pricing.csv``
+catalogs. Targets fall a uniform ``--target-discount`` fraction below list.
+``--synthetic-skus`` widens a small catalog with jittered copies. Every ``--grid`` value
+combination is simulated, and each reports agreement rate, average discount off list and
+the turns-to-close distribution.
+
+Example:
+    python scripts/simulate_negotiations.py --n 2000000 \\
+        --grid band_abs=20,40,80 --grid max_discount=catalog,0.08 --grid turn_limit=5,7,12
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # offline tool only; the services do not need numpy
+    sys.exit("simulate_negotiations.py needs numpy: pip install numpy")
+
+
+ROOT = Path(__file__).resolve().parents[1]
+INVENTORY_CSV = ROOT / "org1-companyA-maylim" / "data" / "companyA_inventory.csv"
+PRICING_CSV = ROOT / "org2-companyB-kumar" / "data" / "companyB_pricing.csv"
+
+# Strategy parameters and their defaults (the current prompts' rules where they state one).
+# max_discount=None means "use the catalog's max_discount_pct".
+DEFAULTS: Dict[str, Any] = {
+    "band_abs": 40.0,
+    "band_pct": 0.025,
+    "turn_limit": 7,
+    "max_discount": None,
+    "buyer_anchor_pct": 0.03,
+    "buyer_concession": 0.35,
+    "seller_open_pct": 0.0,
+    "seller_concession": 0.4,
+    "seller_accept_pct": 0.01,
+    "noise_pct": 0.005,
+}
+
+
+def load_catalog(inventory: Path, pricing: Path) -> Dict[str, np.ndarray]:
+    """SKUs present in both CSVs, as column arrays."""
+    with open(inventory, newline="", encoding="utf-8") as f:
+        stocked = {row["sku"]: int(row["stock"]) for row in csv.DictReader(f)}
+    skus, prices, discounts, stock = [], [], [], []
+    with open(pricing, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("sku") in stocked:
+                skus.append(row["sku"])
+                prices.append(float(row["unit_price"]))
+                discounts.append(float(row["max_discount_pct"]))
+                stock.append(int(row["stock"]))
+    if not skus:
+        sys.exit(f"no SKUs shared between {inventory} and {pricing}")
+    return {
+        "sku": np.array(skus),
+        "unit_price": np.array(prices),
+        "max_discount_pct": np.array(discounts),
+        "stock": np.array(stock),
+    }
+
+
+def synthesize(catalog: Dict[str, np.ndarray], n: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """``n`` SKUs resampled from ``catalog`` with list price (+-30% lognormal) and discount jitter."""
+    pick = rng.integers(0, len(catalog["sku"]), n)
+    return {
+        "sku": np.array([f"{catalog['sku'][i]}~{j}" for j, i in enumerate(pick)]),
+        "unit_price": np.round(catalog["unit_price"][pick] * rng.lognormal(0.0, 0.3, n), 2),
+        "max_discount_pct": np.clip(catalog["max_discount_pct"][pick] + rng.normal(0.0, 0.03, n), 0.0, 0.5),
+        "stock": catalog["stock"][pick],
+    }
+
+
+def simulate_batch(
+    params: Dict[str, Any],
+    catalog: Dict[str, np.ndarray],
+    n: int,
+    target_discount: tuple[float, float],
+    rng: np.random.Generator,
+) -> Dict[str, np.ndarray]:
+    """Play ``n`` negotiations; returns agreed price (NaN if none), list price and close turn (0 if none)."""
+    idx = rng.integers(0, len(catalog["sku"]), n)
+    list_price = catalog["unit_price"][idx]
+    max_discount = catalog["max_discount_pct"][idx] if params["max_discount"] is None else float(params["max_discount"])
+    target = list_price * (1.0 - rng.uniform(target_discount[0], target_discount[1], n))
+    floor = list_price * (1.0 - max_discount)
+    ceiling = target + np.maximum(params["band_abs"], params["band_pct"] * target)
+
+    offer = np.maximum(list_price * (1.0 - params["seller_open_pct"]), floor)
+    bid = target * (1.0 - params["buyer_anchor_pct"])
+    price = np.full(n, np.nan)
+    close_turn = np.zeros(n, dtype=np.int16)
+    active = np.ones(n, dtype=bool)
+
+    for turn in range(1, int(params["turn_limit"]) + 1):
+        # Buyer: accept within the band, else counter (never above what it would accept)
+        jitter = rng.normal(0.0, params["noise_pct"], n) * target if params["noise_pct"] else 0.0
+        buyer_accepts = active & (offer <= ceiling + jitter)
+        price[buyer_accepts] = offer[buyer_accepts]
+        close_turn[buyer_accepts] = turn
+        active &= ~buyer_accepts
+
+        counter = np.minimum(np.minimum(bid, offer), ceiling)
+
+        # Seller: accept a counter close to its own offer (and above floor), else concede toward it
+        seller_accepts = active & (counter >= np.maximum(floor, offer * (1.0 - params["seller_accept_pct"])))
+        price[seller_accepts] = counter[seller_accepts]
+        close_turn[seller_accepts] = turn
+        active &= ~seller_accepts
+
+        offer = np.where(active, np.maximum(floor, offer - params["seller_concession"] * (offer - counter)), offer)
+        bid = np.where(active, bid + params["buyer_concession"] * (offer - bid), bid)
+        if not active.any():
+            break
+
+    return {"price": price, "list_price": list_price, "floor": floor, "close_turn": close_turn}
+
+
+class Tally:
+    """Running totals for one parameter setting across batches."""
+
+    def __init__(self, turn_limit: int):
+        self.turn_limit = turn_limit
+        self.runs = 0
+        self.agreed = 0
+        self.discount_sum = 0.0
+        self.at_floor = 0
+        self.turns = np.zeros(turn_limit + 1, dtype=np.int64)
+
+    def add(self, batch: Dict[str, np.ndarray]) -> None:
+        ok = batch["close_turn"] > 0
+        self.runs += len(ok)
+        self.agreed += int(ok.sum())
+        self.discount_sum += float((1.0 - batch["price"][ok] / batch["list_price"][ok]).sum())
+        self.at_floor += int(np.isclose(batch["price"][ok], batch["floor"][ok]).sum())
+        self.turns += np.bincount(batch["close_turn"][ok], minlength=self.turn_limit + 1)
+
+    def _turn_percentile(self, pct: float) -> Optional[int]:
+        if not self.agreed:
+            return None
+        return int(np.searchsorted(np.cumsum(self.turns), pct / 100.0 * self.agreed))
+
+    def summary(self) -> Dict[str, Any]:
+        closed = self.turns[1:]
+        return {
+            "runs": self.runs,
+            "agreement_rate": round(self.agreed / self.runs, 4) if self.runs else 0.0,
+            "avg_discount_pct": round(100.0 * self.discount_sum / self.agreed, 3) if self.agreed else None,
+            "at_floor_rate": round(self.at_floor / self.agreed, 4) if self.agreed else None,
+            "turns_mean": round(float((closed * np.arange(1, self.turn_limit + 1)).sum()) / self.agreed, 3) if self.agreed else None,
+            "turns_p50": self._turn_percentile(50),
+            "turns_p90": self._turn_percentile(90),
+            # closes per turn, index 0 = turn 1
+            "turns_hist": closed.tolist(),
+        }
+
+
+def parse_grid(specs: List[str]) -> Dict[str, List[Any]]:
+    grid: Dict[str, List[Any]] = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in DEFAULTS or not values:
+            sys.exit(f"--grid expects NAME=v1,v2 with NAME in {', '.join(DEFAULTS)}; got {spec!r}")
+        parsed: List[Any] = []
+        for v in values.split(","):
+            if name == "max_discount" and v == "catalog":
+                parsed.append(None)
+            elif name == "turn_limit":
+                parsed.append(int(v))
+            else:
+                parsed.append(float(v))
+        grid[name] = parsed
+    return grid
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--inventory", type=Path, default=INVENTORY_CSV)
+    p.add_argument("--pricing", type=Path, default=PRICING_CSV)
+    p.add_argument("--synthetic-skus", type=int, default=0, help="replace the catalog with this many jittered SKUs")
+    p.add_argument("--n", type=int, default=1_000_000, help="negotiations per parameter setting")
+    p.add_argument("--batch", type=int, default=250_000, help="negotiations per vectorized batch")
+    p.add_argument("--target-discount", default="0.05:0.15", metavar="LO:HI",
+                   help="buyer target as a fraction below list price, drawn uniformly")
+    p.add_argument("--grid", action="append", default=[], metavar="NAME=v1,v2",
+                   help=f"sweep a parameter ({', '.join(DEFAULTS)}); repeat for a cartesian product")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", help="write the JSON report here (default: table on stdout)")
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    catalog = load_catalog(args.inventory, args.pricing)
+    if args.synthetic_skus:
+        catalog = synthesize(catalog, args.synthetic_skus, rng)
+    lo, _, hi = args.target_discount.partition(":")
+    target_discount = (float(lo), float(hi or lo))
+
+    grid = parse_grid(args.grid)
+    names = list(grid)
+    results = []
+    for combo in itertools.product(*(grid[name] for name in names)):
+        params = {**DEFAULTS, **dict(zip(names, combo))}
+        tally = Tally(int(params["turn_limit"]))
+        t0 = time.perf_counter()
+        for start in range(0, args.n, args.batch):
+            tally.add(simulate_batch(params, catalog, min(args.batch, args.n - start), target_discount, rng))
+        elapsed = time.perf_counter() - t0
+        results.append({
+            "params": {name: params[name] for name in names} or {"defaults": True},
+            **tally.summary(),
+            "sims_per_s": round(args.n / elapsed) if elapsed else None,
+        })
+
+    if args.out:
+        report = {"config": {**vars(args), "inventory": str(args.inventory), "pricing": str(args.pricing)},
+                  "defaults": DEFAULTS, "skus": len(catalog["sku"]), "results": results}
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+        return
+    print(f"{len(catalog['sku'])} SKUs, {args.n} negotiations per setting")
+    print(f"{'params':<48} {'agree':>7} {'disc%':>7} {'floor':>6} {'turns':>6} {'p50':>4} {'p90':>4} {'sims/s':>10}")
+    for r in results:
+        label = " ".join(f"{k}={'catalog' if v is None else v}" for k, v in r["params"].items())
+        print(
+            f"{label:<48} {r['agreement_rate']:>7.3f} {r['avg_discount_pct'] or 0:>7.2f} {r['at_floor_rate'] or 0:>6.2f} "
+            f"{r['turns_mean'] or 0:>6.2f} {r['turns_p50'] or 0:>4} {r['turns_p90'] or 0:>4} {r['sims_per_s']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
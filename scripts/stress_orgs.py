@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Concurrency stress test for an org server: many parallel tasks, no lost turns, no duplicate ids.
+
+Copies the org service (``--org``) to a temp dir, so its task files and stock journal stay
+out of the repo, and drives its ASGI app in-process through httpx. The LLM decider is
+replaced by a stub that sleeps ``--decide-ms`` in the threadpool, so the run exercises the
+handlers, their locking and the task store rather than a model.
+
+1. ``--tasks`` tasks are created at once;
+2. each task is sent ``--messages`` turns at once, and each turn ``--copies`` times (a broker
+   resending a turn it thinks was lost), with all tasks in parallel.
+
+It then checks that:
+
+- every task id is distinct;
+- every task recorded each turn exactly once, in memory and in its task file;
+- each turn reached the decider exactly once;
+- every copy of a turn got the same reply.
+
+The exit status is 1 if any check fails. ``--org-dir`` points the test at another checkout
+of an org service, e.g. to compare against an older revision.
+
+Example:
+    python scripts/stress_orgs.py --org org2 --tasks 1000 --messages 3 --copies 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+ORGS = {"org1": "org1-companyA-maylim", "org2": "org2-companyB-kumar"}
+
+
+class StubDecider:
+    """Stands in for ``dispatch_decision``: counts each turn it is asked about and counters."""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, **case: Any) -> Dict[str, Any]:
+        with self._lock:
+            self.calls[case["partner_message"]] += 1
+        time.sleep(self.delay_s)
+        return {"action": "counter", "price": 1900.0, "rationale": "stress", "transcript_response": "stress"}
+
+
+def load_org(org_dir: Path, workdir: Path) -> Any:
+    """Import a private copy of the org's ``app.main`` rooted in ``workdir``."""
+    target = workdir / org_dir.name
+    shutil.copytree(org_dir, target, ignore=shutil.ignore_patterns("state", "cassettes", "__pycache__", "*.db"))
+    os.environ["AGENT_DIRS"] = ""
+    os.environ["SPECULATE"] = "0"
+    sys.path.insert(0, str(target))
+    return importlib.import_module("app.main")
+
+
+def read_task_file(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        # Interleaved writes of one task file; counts as lost turns
+        return {"messages": [{"content": "<unreadable>"}]}
+
+
+def turn_content(task_id: str, n: int) -> str:
+    # Unique per turn, so the stub can count decisions per turn; the first price is what orgs parse
+    return f"Counter: ${1800 + n}.00 for task {task_id} turn {n}"
+
+
+async def run(main: Any, tasks: int, messages: int, copies: int, quantity: int) -> Tuple[float, float, List[str], Dict[Tuple[str, int], List[Dict[str, Any]]]]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://org", limits=limits, timeout=None) as client:
+        task_body = {"subject": "stress", "sku": "MACBOOK-PRO-14", "quantity": quantity, "target_price": 1789.0, "constraints": {"turn_limit": 7}}
+
+        async def create() -> str:
+            res = await client.post("/a2a/task", json=task_body)
+            res.raise_for_status()
+            return res.json()["task_id"]
+
+        t0 = time.perf_counter()
+        ids = await asyncio.gather(*(create() for _ in range(tasks)))
+        create_s = time.perf_counter() - t0
+
+        async def send(task_id: str, n: int) -> Tuple[Tuple[str, int], Dict[str, Any]]:
+            body = {
+                "task_id": task_id,
+                "message_id": f"{task_id}:{n}",
+                "message": {"role": "broker", "content": turn_content(task_id, n)},
+            }
+            res = await client.post("/a2a/message", json=body)
+            res.raise_for_status()
+            payload = res.json()
+            return (task_id, n), {"status": payload["status"], "content": payload["reply"]["content"]}
+
+        sends = [send(task_id, n) for task_id in set(ids) for n in range(messages) for _ in range(copies)]
+        t0 = time.perf_counter()
+        replies: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        for key, reply in await asyncio.gather(*sends):
+            replies.setdefault(key, []).append(reply)
+        turns_s = time.perf_counter() - t0
+    return create_s, turns_s, ids, replies
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--org", choices=sorted(ORGS), default="org2")
+    p.add_argument("--org-dir", type=Path, default=None, help="org service directory (default: this repo's --org)")
+    p.add_argument("--tasks", type=int, default=1000)
+    p.add_argument("--messages", type=int, default=3, help="turns sent to each task at once")
+    p.add_argument("--copies", type=int, default=2, help="times each turn is sent")
+    p.add_argument("--decide-ms", type=float, default=5.0, help="stub decision latency")
+    p.add_argument("--quantity", type=int, default=0, help="units per task; 0 keeps every turn clear of the seller's stock check")
+    p.add_argument("--verbose", action="store_true", help="keep the org's INFO logs")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    args = p.parse_args()
+
+    org_dir = (args.org_dir or ROOT / ORGS[args.org]).resolve()
+    with tempfile.TemporaryDirectory() as tmp:
+        main_mod = load_org(org_dir, Path(tmp))
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        stub = StubDecider(args.decide_ms / 1000.0)
+        main_mod.dispatch_decision = stub
+        agent = next(iter(main_mod.AGENTS.values()))
+        try:
+            create_s, turns_s, ids, replies = asyncio.run(run(main_mod, args.tasks, args.messages, args.copies, args.quantity))
+        finally:
+            for hosted in main_mod.AGENTS.values():
+                hosted.stop()
+
+        expected = {turn_content(task_id, n) for task_id in set(ids) for n in range(args.messages)}
+        recorded = {task_id: [m["content"] for m in agent.tasks[task_id]["messages"]] for task_id in set(ids) if task_id in agent.tasks}
+        files = {path.stem: read_task_file(path) for path in agent.tasks_dir.glob("*.json")}
+        checks = {
+            "distinct_task_ids": len(set(ids)) == len(ids) == args.tasks,
+            "turns_recorded_once": all(
+                sorted(recorded.get(task_id, [])) == sorted(turn_content(task_id, n) for n in range(args.messages))
+                for task_id in set(ids)
+            ),
+            "turns_persisted_once": all(
+                sorted(m["content"] for m in files.get(task_id, {}).get("messages", [])) == sorted(recorded.get(task_id, []))
+                for task_id in set(ids)
+            ),
+            "one_decision_per_turn": set(stub.calls) == expected and all(n == 1 for n in stub.calls.values()),
+            "copies_agree": all(len({json.dumps(r, sort_keys=True) for r in rs}) == 1 for rs in replies.values()),
+        }
+        requests = len(ids) * args.messages * args.copies
+        result = {
+            "org": org_dir.name,
+            "tasks": args.tasks,
+            "distinct_ids": len(set(ids)),
+            "turn_requests": requests,
+            "decisions": sum(stub.calls.values()),
+            "create_s": round(create_s, 3),
+            "turns_s": round(turns_s, 3),
+            "turn_requests_per_s": round(requests / turns_s, 1) if turns_s else None,
+            "checks": checks,
+        }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['org']}: {args.tasks} tasks created in {result['create_s']:.3f} s ({result['distinct_ids']} distinct ids)")
+        print(f"{requests} turn requests in {result['turns_s']:.3f} s ({result['turn_requests_per_s']}/s), {result['decisions']} decisions")
+        for name, ok in checks.items():
+            print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""Runtime modules shared by the broker and org servers: wire formats, logging, LLM rate limits,
+record/replay cassettes, warmup and profiling, plus the org side's hosted agents, SKU catalog,
+stock ledger, task store, decision batching and speculation."""
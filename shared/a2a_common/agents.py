@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .catalog import Catalog, open_catalog
+from .stock_ledger import StockLedger
+from .task_store import TaskEntries, max_task_number
+from .wire import JSON_MEDIA, MSGPACK_MEDIA, dumps_json, msgpack_available
+
+
+logger = logging.getLogger("agents")
+
+# AGENT_DIRS: more company agents to host in this process, separated by os.pathsep. Each entry is
+# an agent directory (agent.config.json, cards/agent.json, its data file) or a directory of them.
+AGENT_DIRS = [Path(p) for p in os.getenv("AGENT_DIRS", "").split(os.pathsep) if p.strip()]
+
+# agent.config.json keys an agent may set; missing ones fall back to the home agent's values
+SETTINGS = ("role", "data_file", "llm_key_env", "persona", "speaker")
+
+# CARD_MAX_AGE_S: how long callers may reuse a well-known card before revalidating it (with If-None-Match).
+CARD_MAX_AGE_S = int(os.getenv("CARD_MAX_AGE_S", "300"))
+
+# Protocol features this server speaks, advertised on every well-known card so callers pick
+# the fastest ones they share: request/reply body formats, the SSE turn endpoint, multi-line tasks
+FEATURES = {
+    "wire_formats": [JSON_MEDIA] + ([MSGPACK_MEDIA] if msgpack_available() else []),
+    "streaming": True,
+    "line_items": True,
+}
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+class HostedAgent:
+    """One company agent served by this process: its card, persona, LLM key, catalog, stock and tasks.
+
+    Registration only reads the config and card. The catalog and stock ledger are opened by
+    ``open`` on the agent's first request, so companies that see no traffic cost a few small
+    dicts. Persisted tasks are read one at a time as requests name them, and settled ones are
+    archived (see ``TaskEntries``). State lives under the agent's own ``state/`` directory.
+
+    Handlers hold ``task_lock(task_id)`` while they read or change a task's entry, so one
+    task's turns run one at a time while other tasks proceed in parallel.
+    """
+
+    def __init__(self, root: Path, defaults: Dict[str, Any], columns: Dict[str, Callable[[str], Any]], sells: bool):
+        self.root = root
+        self.config = _read_json(root / "agent.config.json")
+        self.card = _read_json(root / "cards" / "agent.json")
+        self.agent_id = str(self.config.get("id") or self.card.get("id") or root.name)
+        self.name = str(self.config.get("name") or self.card.get("name") or self.agent_id)
+        settings = {key: self.config.get(key, defaults.get(key)) for key in SETTINGS}
+        self.role: str = settings["role"]
+        self.data_path = (root / settings["data_file"]).resolve()
+        self.key_env: str = settings["llm_key_env"]
+        # None keeps the decider's built-in persona prompt
+        self.persona: Optional[str] = settings["persona"]
+        self.speaker: str = settings["speaker"]
+        self.columns = columns
+        self.sells = sells
+        # The service's own agent, also served at the root; set by load_agents
+        self.home = False
+        self.tasks_dir = root / "state" / "tasks"
+        self.journal_path = root / "state" / "stock-journal.jsonl"
+        self.tasks = TaskEntries(self.tasks_dir)
+        self._task_ids = itertools.count(1)
+        # Created on first use; an entry goes away once no handler holds or waits on its lock
+        self._task_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.catalog: Optional[Catalog] = None
+        self.ledger: Optional[StockLedger] = None
+        self._open_lock = threading.Lock()
+        self._cards: Dict[str, Tuple[Dict[str, Any], str]] = {}
+
+    def open(self) -> "HostedAgent":
+        if self.ledger is not None:
+            return self
+        with self._open_lock:
+            if self.ledger is None:
+                self.catalog = open_catalog(self.data_path, self.columns)
+                self.tasks_dir.mkdir(parents=True, exist_ok=True)
+                # Task entries load on first use; continue after the highest persisted t-N so restarts never reuse an id
+                last = max_task_number(self.tasks_dir)
+                self._task_ids = itertools.count(1 + last)
+                self.ledger = StockLedger(self.catalog, sells=self.sells, journal_path=self.journal_path).start()
+                logger.info("agent_opened id=%s last_task=%s data=%s", self.agent_id, last, self.data_path)
+        return self
+
+    def new_task_id(self) -> str:
+        """A local task id no other request can get, however many are created at once."""
+        while True:
+            task_id = f"t-{next(self._task_ids)}"
+            if task_id not in self.tasks:
+                return task_id
+
+    def settled(self, task_id: str) -> bool:
+        """Whether ``task_id``'s outcome was recorded (archived tasks included): its stock was
+        committed or released, and the ledger forgets that once the batch is written back."""
+        entry = self.tasks.get(task_id)
+        return entry is not None and entry.get("outcome") is not None
+
+    def task_lock(self, task_id: str) -> asyncio.Lock:
+        """The lock serialising ``task_id``'s turns; use it on the event loop only."""
+        lock = self._task_locks.get(task_id)
+        if lock is None:
+            lock = self._task_locks[task_id] = asyncio.Lock()
+        return lock
+
+    def stop(self) -> None:
+        if self.ledger is not None:
+            self.ledger.stop()
+
+    def describe(self, base_url: str) -> Dict[str, Any]:
+        """The agent's card, with ``endpoint`` pointing at this process (its root for the home agent)."""
+        base = base_url.rstrip("/")
+        return {
+            **self.card,
+            "id": self.agent_id,
+            "name": self.name,
+            "endpoint": base if self.home else f"{base}/agents/{self.agent_id}",
+            "open": self.ledger is not None,
+        }
+
+    def well_known_card(self, base_url: str) -> Tuple[Dict[str, Any], str]:
+        """``(card, etag)``: the card with ``features`` and without ``open``, built once per base URL."""
+        cached = self._cards.get(base_url)
+        if cached is None:
+            card = {**self.describe(base_url), "features": FEATURES}
+            card.pop("open")
+            etag = f'"{hashlib.sha1(dumps_json(card)).hexdigest()[:16]}"'
+            cached = self._cards[base_url] = (card, etag)
+        return cached
+
+
+def _agent_roots(dirs: List[Path]) -> List[Path]:
+    roots = []
+    for d in dirs:
+        if (d / "agent.config.json").is_file():
+            roots.append(d)
+        elif d.is_dir():
+            roots.extend(sorted(c for c in d.iterdir() if (c / "agent.config.json").is_file()))
+        else:
+            logger.warning("agent_dir_missing path=%s", d)
+    return roots
+
+
+def load_agents(
+    home: Path,
+    defaults: Dict[str, Any],
+    columns: Dict[str, Callable[[str], Any]],
+    sells: bool,
+    extra_dirs: List[Path] = AGENT_DIRS,
+) -> Dict[str, HostedAgent]:
+    """Hosted agents by id, the service's own (``home``) first, then those under ``extra_dirs``.
+
+    ``defaults`` fills the SETTINGS the home agent's config leaves out; other agents fall back
+    to the home agent's settings. Agents whose ``role`` differs from the home agent's are
+    left to the other org server. Two agents may not share an id or a data file, since each
+    one's stock ledger rewrites its file.
+    """
+    first = HostedAgent(home, defaults, columns, sells)
+    first.home = True
+    inherited = {**defaults, **{key: first.config[key] for key in SETTINGS if key in first.config}}
+    agents = {first.agent_id: first}
+    data_files = {first.data_path: first.agent_id}
+    for root in _agent_roots(extra_dirs):
+        if root.resolve() == home.resolve():
+            continue
+        agent = HostedAgent(root, inherited, columns, sells)
+        if agent.role != first.role:
+            logger.info("agent_skipped id=%s role=%s", agent.agent_id, agent.role)
+            continue
+        if agent.agent_id in agents:
+            raise ValueError(f"duplicate agent id {agent.agent_id} in {root}")
+        if agent.data_path in data_files:
+            raise ValueError(f"agent {agent.agent_id} shares {agent.data_path} with {data_files[agent.data_path]}")
+        agents[agent.agent_id] = agent
+        data_files[agent.data_path] = agent.agent_id
+    logger.info("agents_registered count=%s home=%s", len(agents), first.agent_id)
+    return agents
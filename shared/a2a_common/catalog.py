@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+logger = logging.getLogger("catalog")
+
+# CATALOG_AUTO_COMPILE=0 skips rebuilding the .db when its CSV is newer (then the CSV is scanned).
+# CATALOG_MMAP_MB sizes SQLite's memory map; mapped pages live in the OS page cache and are
+# shared by every worker process reading the same file.
+AUTO_COMPILE = os.getenv("CATALOG_AUTO_COMPILE", "1") != "0"
+MMAP_BYTES = int(float(os.getenv("CATALOG_MMAP_MB", "256")) * 1024 * 1024)
+
+_SQL_TYPES = {int: "INTEGER", float: "REAL", str: "TEXT"}
+
+
+def _rows(csv_path: Path, columns: Dict[str, Callable[[str], Any]]) -> Iterator[Tuple[Any, ...]]:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield tuple(convert(row[name]) for name, convert in columns.items())
+
+
+def compile_csv(csv_path: Path, db_path: Path, columns: Dict[str, Callable[[str], Any]], chunk: int = 50_000) -> int:
+    """Build ``db_path`` from ``csv_path`` (first column is the key); returns the row count.
+
+    Writes to a temp file and renames it into place, so readers never see a half-built
+    catalog. The table is ``WITHOUT ROWID`` with the key as primary key: rows are stored in
+    key order and a lookup is one B-tree descent.
+    """
+    key = next(iter(columns))
+    tmp = db_path.with_suffix(f"{db_path.suffix}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        cols = ", ".join(f"{name} {_SQL_TYPES.get(t, 'TEXT')}" for name, t in columns.items())
+        conn.execute(f"CREATE TABLE catalog ({cols}, PRIMARY KEY ({key})) WITHOUT ROWID")
+        conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)")
+        insert = f"INSERT OR REPLACE INTO catalog VALUES ({', '.join('?' * len(columns))})"
+        rows = _rows(csv_path, columns)
+        total = 0
+        while True:
+            batch = [r for _, r in zip(range(chunk), rows)]
+            if not batch:
+                break
+            conn.executemany(insert, batch)
+            total += len(batch)
+        stat = csv_path.stat()
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("source", str(csv_path)), ("source_mtime_ns", str(stat.st_mtime_ns)), ("source_size", str(stat.st_size))],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, db_path)
+    return total
+
+
+def source_signature(db_path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of the CSV the catalog was compiled from, or None if unreadable."""
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+        finally:
+            conn.close()
+        return int(meta["source_mtime_ns"]), int(meta["source_size"])
+    except Exception:
+        return None
+
+
+class Catalog:
+    """SKU lookups against a compiled SQLite catalog, falling back to scanning the CSV.
+
+    ``columns`` maps CSV column to converter, key first. Each thread keeps its own
+    read-only connection (FastAPI runs sync handlers on a thread pool). After ``invalidate``
+    a thread closes its old connection on its next lookup; connections of threads that have
+    exited are closed when the next one is opened or on ``invalidate``.
+    """
+
+    def __init__(self, csv_path: Path, columns: Dict[str, Callable[[str], Any]], db_path: Optional[Path] = None):
+        self.csv_path = csv_path
+        self.db_path = db_path or csv_path.with_suffix(".db")
+        self.columns = columns
+        self.key = next(iter(columns))
+        self._local = threading.local()
+        self._generation = 0
+        # Thread ident -> its open connection
+        self._conns: Dict[int, sqlite3.Connection] = {}
+        self._conns_lock = threading.Lock()
+        self._ready: Optional[bool] = None
+        self._ready_lock = threading.Lock()
+
+    def _check(self) -> bool:
+        """Whether the .db is usable; rebuilds it once if the CSV changed since it was compiled."""
+        if self._ready is not None:
+            return self._ready
+        with self._ready_lock:
+            if self._ready is None:
+                fresh = self.db_path.exists()
+                if self.csv_path.exists():
+                    stat = self.csv_path.stat()
+                    fresh = fresh and source_signature(self.db_path) == (stat.st_mtime_ns, stat.st_size)
+                    if not fresh and AUTO_COMPILE:
+                        try:
+                            count = compile_csv(self.csv_path, self.db_path, self.columns)
+                            logger.info("catalog_compiled path=%s rows=%s", self.db_path, count)
+                            fresh = True
+                        except Exception:
+                            logger.exception("catalog_compile_failed path=%s", self.db_path)
+                self._ready = fresh
+        return self._ready
+
+    def warm(self) -> bool:
+        """Compile the catalog if it is stale and run one lookup, so the first request does neither."""
+        if not self._check():
+            return False
+        self._conn().execute(f"SELECT 1 FROM catalog WHERE {self.key} = ?", ("",)).fetchone()
+        return True
+
+    def invalidate(self) -> None:
+        """Re-check freshness on the next lookup (call after rewriting the CSV)."""
+        with self._ready_lock:
+            self._ready = None
+            self._generation += 1
+        with self._conns_lock:
+            self._close_exited_locked()
+
+    def _close_exited_locked(self) -> None:
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [ident for ident in self._conns if ident not in alive]:
+            self._conns.pop(ident).close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation == self._generation:
+            return conn
+        generation = self._generation
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        with self._conns_lock:
+            # This thread's connection from before ``invalidate``, or one left by an exited
+            # thread whose ident was reused; neither is in use
+            old = self._conns.pop(threading.get_ident(), None)
+            if old is not None:
+                old.close()
+            self._conns[threading.get_ident()] = conn
+            self._close_exited_locked()
+        self._local.conn, self._local.generation = conn, generation
+        return conn
+
+    def _as_dict(self, row: Tuple[Any, ...]) -> Dict[str, Any]:
+        return dict(zip(self.columns, row))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._check():
+            row = self._conn().execute(f"SELECT * FROM catalog WHERE {self.key} = ?", (key,)).fetchone()
+            return self._as_dict(row) if row else None
+        if not self.csv_path.exists():
+            return None
+        for row in _rows(self.csv_path, self.columns):
+            if row[0] == key:
+                return self._as_dict(row)
+        return None
+
+    def first(self) -> Optional[Dict[str, Any]]:
+        """First row in CSV order (the single-SKU default the servers used before tasks carried a SKU)."""
+        if not self.csv_path.exists():
+            return None
+        for row in _rows(self.csv_path, self.columns):
+            return self._as_dict(row)
+        return None
+
+    def stage_deltas(self, column: str, deltas: Dict[str, int]) -> Tuple[Path, int]:
+        """Write a copy of the CSV with ``deltas`` (key -> amount) added to ``column``.
+
+        Returns the temp file and the number of rows changed; ``swap_in`` publishes it. The
+        slow part (streaming the whole CSV) happens here, while lookups still see the old data.
+        """
+        convert = self.columns[column]
+        changed = 0
+        tmp = self.csv_path.with_suffix(f"{self.csv_path.suffix}.{os.getpid()}.tmp")
+        with open(self.csv_path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.DictReader(src)
+            writer = csv.DictWriter(dst, fieldnames=reader.fieldnames or list(self.columns), lineterminator="\n")
+            writer.writeheader()
+            for row in reader:
+                delta = deltas.get(row[self.key])
+                if delta:
+                    row[column] = str(convert(row[column]) + delta)
+                    changed += 1
+                writer.writerow(row)
+            dst.flush()
+            os.fsync(dst.fileno())
+        return tmp, changed
+
+    def swap_in(self, staged: Path, column: str, deltas: Dict[str, int]) -> None:
+        """Rename ``staged`` over the CSV, then apply the same ``deltas`` to the ``.db`` in one transaction.
+
+        The db's source signature moves to the new CSV so it is not recompiled. If patching
+        fails (or the process dies in between), the signatures no longer match and the next
+        lookup recompiles from the updated CSV.
+        """
+        os.replace(staged, self.csv_path)
+        if not (self.db_path.exists() and self._ready):
+            self.invalidate()
+            return
+        stat = self.csv_path.stat()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.executemany(
+                        f"UPDATE catalog SET {column} = {column} + ? WHERE {self.key} = ?",
+                        [(delta, key) for key, delta in deltas.items()],
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                        [("source_mtime_ns", str(stat.st_mtime_ns)), ("source_size", str(stat.st_size))],
+                    )
+            finally:
+                conn.close()
+        except Exception:
+            logger.exception("catalog_patch_failed path=%s", self.db_path)
+            self.invalidate()
+
+
+_OPEN: Dict[Path, Catalog] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def open_catalog(csv_path: Path, columns: Dict[str, Callable[[str], Any]]) -> Catalog:
+    """The process-wide Catalog for ``csv_path``, created on first use.
+
+    Every agent hosted in the process goes through here, so a data file is compiled,
+    checked and connected to once however many lookups or agents touch it.
+    """
+    path = csv_path.resolve()
+    with _OPEN_LOCK:
+        catalog = _OPEN.get(path)
+        if catalog is None:
+            catalog = _OPEN[path] = Catalog(path, columns)
+        return catalog
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+logger = logging.getLogger("llm-batch")
+
+SingleFn = Callable[..., Dict[str, Any]]
+BatchFn = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+# A batched reply that does not parse or has the wrong shape is retried case by case. Anything
+# else (RateLimitTimeout after upstream 429s, network or key errors) would fail the single
+# calls too, so it goes straight to every waiter instead of multiplying the calls.
+FALLBACK_ERRORS = (ValueError, TypeError, KeyError, IndexError)
+
+
+class DecisionBatcher:
+    """Micro-batching dispatcher in front of the LLM decider.
+
+    Handlers call ``submit`` from FastAPI's threadpool and block until their decision is
+    ready. A collector thread gathers pending cases until ``max_batch_size`` is reached or
+    ``max_wait_ms`` has elapsed since the first one arrived, then sends them as one batched
+    completion. If the batched reply is malformed (see ``FALLBACK_ERRORS``), every case of
+    that batch is retried individually so one bad batch never fails unrelated negotiations.
+    Other failures, quota exhaustion above all, are raised to every waiter of the batch.
+
+    Cases with different ``group_key`` values (e.g. two hosted agents with their own persona
+    and API key) are collected together but never share a completion.
+    """
+
+    def __init__(
+        self,
+        single_fn: SingleFn,
+        batch_fn: BatchFn,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 50.0,
+        max_inflight_batches: int = 4,
+        group_key: Callable[[Dict[str, Any]], Hashable] = lambda case: None,
+    ):
+        self.single_fn = single_fn
+        self.batch_fn = batch_fn
+        self.group_key = group_key
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[Dict[str, Any], Future]]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_inflight_batches), thread_name_prefix="llm-batch")
+        self._collector = threading.Thread(target=self._collect_loop, name="llm-batch-collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, **case: Any) -> Dict[str, Any]:
+        fut: Future = Future()
+        self._queue.put((case, fut))
+        return fut.result()
+
+    def _collect_loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            groups: Dict[Hashable, List[Tuple[Dict[str, Any], Future]]] = {}
+            for item in batch:
+                groups.setdefault(self.group_key(item[0]), []).append(item)
+            for group in groups.values():
+                self._pool.submit(self._dispatch, group)
+
+    def _dispatch(self, batch: List[Tuple[Dict[str, Any], Future]]) -> None:
+        if len(batch) > 1:
+            try:
+                decisions = self.batch_fn([case for case, _ in batch])
+                if len(decisions) != len(batch):
+                    raise ValueError("batched decision count mismatch")
+            except FALLBACK_ERRORS:
+                logger.exception("batch_malformed size=%s; falling back to single calls", len(batch))
+            except Exception as e:
+                logger.warning("batch_failed size=%s error=%s", len(batch), type(e).__name__)
+                for _, fut in batch:
+                    fut.set_exception(e)
+                return
+            else:
+                for (_, fut), decision in zip(batch, decisions):
+                    fut.set_result(decision)
+                logger.info("batch_ok size=%s", len(batch))
+                return
+        for case, fut in batch:
+            try:
+                fut.set_result(self.single_fn(**case))
+            except Exception as e:
+                fut.set_exception(e)
+
+
+def decision_dispatcher(single_fn: SingleFn, batch_fn: BatchFn) -> SingleFn:
+    """``dispatch_decision`` for a decider: through a batcher when GROQ_BATCH_ENABLED=1, else direct."""
+    batcher: Optional[DecisionBatcher] = None
+    lock = threading.Lock()
+
+    def get_batcher() -> DecisionBatcher:
+        nonlocal batcher
+        with lock:
+            if batcher is None:
+                batcher = DecisionBatcher(
+                    single_fn,
+                    batch_fn,
+                    max_batch_size=int(os.getenv("GROQ_BATCH_MAX_SIZE", "8")),
+                    max_wait_ms=float(os.getenv("GROQ_BATCH_MAX_WAIT_MS", "50")),
+                    # One completion speaks with one persona on one API key
+                    group_key=lambda case: (case.get("key_env"), case.get("persona")),
+                )
+            return batcher
+
+    def dispatch_decision(**case: Any) -> Dict[str, Any]:
+        if os.getenv("GROQ_BATCH_ENABLED", "0") != "1":
+            return single_fn(**case)
+        return get_batcher().submit(**case)
+
+    return dispatch_decision
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+
+# LLM_CASSETTE_MODE: "off" (default), "record" (call Groq and store every exchange) or
+# "replay" (serve stored exchanges only; no network, no API key needed).
+# LLM_CASSETTE_DIR: where exchanges are stored; default cassettes/ in the service directory it runs from.
+CASSETTE_DIR = Path(os.getenv("LLM_CASSETTE_DIR", "cassettes")).resolve()
+
+_KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "temperature", "max_tokens", "stream")
+_WRITE_LOCK = threading.Lock()
+
+
+class CassetteMiss(Exception):
+    """Replay mode found no recorded response for a request."""
+
+
+def cassette_mode() -> str:
+    return os.getenv("LLM_CASSETTE_MODE", "off").lower()
+
+
+def replaying() -> bool:
+    return cassette_mode() == "replay"
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """Stable hash of the parts of a completion request that determine its answer."""
+    material = {k: kwargs.get(k) for k in _KEY_FIELDS}
+    blob = json.dumps(material, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> Path:
+    return CASSETTE_DIR / f"{key}.json"
+
+
+def _write(key: str, kwargs: Dict[str, Any], response: Any) -> None:
+    CASSETTE_DIR.mkdir(parents=True, exist_ok=True)
+    record = {"request": {k: kwargs.get(k) for k in _KEY_FIELDS}, "response": response}
+    path = _path(key)
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    with _WRITE_LOCK:
+        tmp.write_text(json.dumps(record, ensure_ascii=False, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def replay_completion(kwargs: Dict[str, Any]) -> Any:
+    """Recorded response for ``kwargs`` as Groq response objects (a chunk iterator if streamed)."""
+    from groq.types.chat import ChatCompletion, ChatCompletionChunk
+
+    key = request_key(kwargs)
+    path = _path(key)
+    if not path.exists():
+        raise CassetteMiss(f"no cassette for request {key}")
+    response = json.loads(path.read_text(encoding="utf-8"))["response"]
+    if kwargs.get("stream"):
+        return iter([ChatCompletionChunk.model_validate(c) for c in response])
+    return ChatCompletion.model_validate(response)
+
+
+def record_completion(kwargs: Dict[str, Any], response: Any) -> Any:
+    """Store ``response`` under the request hash; streams are stored once fully consumed."""
+    key = request_key(kwargs)
+    if not kwargs.get("stream"):
+        _write(key, kwargs, response.model_dump())
+        return response
+
+    def tee() -> Iterator[Any]:
+        chunks: List[Dict[str, Any]] = []
+        for chunk in response:
+            chunks.append(chunk.model_dump())
+            yield chunk
+        _write(key, kwargs, chunks)
+
+    return tee()
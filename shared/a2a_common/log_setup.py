@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+# LOG_FORMAT: "text" (default, same layout as before) or "json" (one object per line).
+# LOG_MESSAGE_BODIES=0 replaces message content/rationale/speech in logs with their length.
+# LOG_SAMPLE="recv=0.1,reply_out=0.25" keeps that fraction of INFO records per event name.
+# LOG_QUEUE_SIZE bounds the handoff queue; records are dropped (and counted) when it is full.
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+_PLACEHOLDER = re.compile(r"(?:(\w+)=)?%[-#0-9.]*([sdifr])")
+
+
+class lazy:
+    """Log argument computed only if the record is actually formatted.
+
+    ``logger.info("state=%s", lazy(lambda: expensive()))`` costs one object allocation on
+    the hot path; sampled-out or filtered records never call ``expensive``.
+    """
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+    def __str__(self) -> str:
+        return str(self.fn())
+
+    __repr__ = __str__
+
+
+class msg_body:
+    """Message text that honours LOG_MESSAGE_BODIES (full text, or just its length)."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: Optional[str]):
+        self.text = text or ""
+
+    def __str__(self) -> str:
+        return self.text if _BODIES else f"<{len(self.text)} chars>"
+
+    __repr__ = __str__
+
+
+_BODIES = os.getenv("LOG_MESSAGE_BODIES", "1") != "0"
+
+# Log arguments left for the listener to format: immutable scalars, and wrappers deferred on purpose
+_DEFERRED = (str, int, float, bool, type(None), lazy, msg_body)
+
+
+class _Snapshot:
+    """An argument rendered in the caller's thread; formats as that text under %s and %r."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __str__(self) -> str:
+        return self.text
+
+    __repr__ = __str__
+
+
+def event_name(record: logging.LogRecord) -> str:
+    """``extra={"event": ...}`` if given, else the first word of the format string."""
+    name = getattr(record, "event", None)
+    if name:
+        return str(name)
+    msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+    return msg.split(" ", 1)[0]
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of INFO/DEBUG records per event; warnings always pass."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    @classmethod
+    def from_env(cls, spec: Optional[str] = None) -> "SamplingFilter":
+        rates: Dict[str, float] = {}
+        for item in (spec if spec is not None else os.getenv("LOG_SAMPLE", "")).split(","):
+            name, _, rate = item.partition("=")
+            if name.strip() and rate.strip():
+                rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+        return cls(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(event_name(record))
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, service, logger, event, msg and any extras.
+
+    ``key=%s`` pairs in the format string also become top-level fields, so the existing
+    ``"reply_out task=%s status=%s"`` style calls are queryable without being rewritten.
+    """
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+        self._keys: Dict[str, list] = {}
+
+    def _fields(self, record: logging.LogRecord) -> Dict[str, Any]:
+        if not isinstance(record.msg, str) or not isinstance(record.args, tuple):
+            return {}
+        keys = self._keys.get(record.msg)
+        if keys is None:
+            keys = self._keys[record.msg] = [m.group(1) for m in _PLACEHOLDER.finditer(record.msg)]
+        if len(keys) != len(record.args):
+            return {}
+        return {
+            k: v if isinstance(v, (int, float, bool, type(None))) else str(v)
+            for k, v in zip(keys, record.args)
+            if k
+        }
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "event": event_name(record),
+            "msg": record.getMessage(),
+            **self._fields(record),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and key != "event":
+                out[key] = value() if callable(value) else value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Non-blocking handoff to the listener thread.
+
+    The stock ``prepare`` formats the whole message in the caller's thread. Here only
+    arguments that could change before the listener gets to them (dicts, lists, objects) are
+    rendered in the caller; scalars, ``lazy`` and ``msg_body`` values stay as they are, so
+    %-interpolation, lazy fields and JSON encoding still run on the listener thread. The
+    queue is a lock-free ``SimpleQueue``; once ``maxsize`` records are waiting, new ones are
+    dropped (and counted) instead of blocking the caller.
+    """
+
+    def __init__(self, q: "queue.SimpleQueue[logging.LogRecord]", maxsize: int):
+        super().__init__(q)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._conversions: Dict[str, list] = {}
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not isinstance(record.msg, str):
+            record.msg = str(record.msg)
+        args = record.args
+        if not args or (isinstance(args, tuple) and all(isinstance(a, _DEFERRED) for a in args)):
+            return record
+        conversions = self._conversions.get(record.msg)
+        if conversions is None:
+            conversions = self._conversions[record.msg] = [m.group(2) for m in _PLACEHOLDER.finditer(record.msg)]
+        if not isinstance(args, tuple) or len(conversions) != len(args):
+            # Mapping args or a format this does not parse: render it all, as the stock prepare does
+            record.msg, record.args = record.getMessage(), None
+            return record
+        record.args = tuple(
+            a if isinstance(a, _DEFERRED) or conv not in "sr" else _Snapshot(repr(a) if conv == "r" else str(a))
+            for a, conv in zip(args, conversions)
+        )
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+_LOCK = threading.Lock()
+
+
+def build_handler(service: str, tag: str, stream: Any = None) -> tuple[DroppingQueueHandler, logging.handlers.QueueListener]:
+    """Queue handler + started listener writing to ``stream`` (stderr by default)."""
+    sink = logging.StreamHandler(stream or sys.stderr)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        sink.setFormatter(JsonFormatter(service))
+    else:
+        sink.setFormatter(logging.Formatter(f"%(asctime)s %(levelname)s [{tag}] %(message)s"))
+    handler = DroppingQueueHandler(queue.SimpleQueue(), maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    handler.addFilter(SamplingFilter.from_env())
+    listener = logging.handlers.QueueListener(handler.queue, sink, respect_handler_level=True)
+    listener.start()
+    return handler, listener
+
+
+def setup_logging(service: str, tag: str, level: int = logging.INFO) -> logging.Logger:
+    """Route the root logger through one queue handler for this process; returns ``service``'s logger."""
+    global _LISTENER
+    with _LOCK:
+        root = logging.getLogger()
+        if _LISTENER is None and not root.handlers:
+            handler, _LISTENER = build_handler(service, tag)
+            root.addHandler(handler)
+            root.setLevel(level)
+            atexit.register(_LISTENER.stop)
+    return logging.getLogger(service)
+
+
+def dropped_records() -> int:
+    return sum(getattr(h, "dropped", 0) for h in logging.getLogger().handlers)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+
+logger = logging.getLogger("profiling")
+
+# PROFILING=1 turns on the debug-only profiling surface; off, nothing here is installed or run.
+# PROFILE_SAMPLE_HZ: rate of the always-on sampler behind GET /debug/profile.
+# PROFILE_REQUEST_HZ: rate while a single request is profiled (?profile=1 or X-Profile: 1).
+# PROFILE_TRACEMALLOC_FRAMES: >0 starts tracemalloc at startup with that traceback depth;
+# otherwise the first GET /debug/memory starts it (and that snapshot is the baseline).
+PROFILING = os.getenv("PROFILING", "0") == "1"
+SAMPLE_HZ = float(os.getenv("PROFILE_SAMPLE_HZ", "100"))
+REQUEST_HZ = float(os.getenv("PROFILE_REQUEST_HZ", "1000"))
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "0"))
+# Distinct stacks kept by one sampler; rarer ones beyond this are counted under "[other]"
+MAX_STACKS = 20000
+MAX_DEPTH = 64
+
+# Leaf frames of threads parked on a lock, selector or queue; left out of profiles unless idle=1
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    # Log queue listener, and the loop thread while uvloop waits for I/O in C
+    ("handlers.py", "dequeue"),
+    ("runners.py", "run"),
+}
+
+
+def _frame_label(code: Any) -> str:
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{'/'.join(parts[-2:])}:{code.co_name}"
+
+
+class Sampler:
+    """Wall-clock stack sampler over every Python thread, aggregated as folded stacks.
+
+    A daemon thread reads ``sys._current_frames()`` ``hz`` times a second and counts each
+    stack as ``thread;outer;...;leaf``, the collapsed format flamegraph.pl, speedscope and
+    inferno read. Nothing is installed in the sampled threads, so the cost is the sampler's
+    own GIL time: a few percent at 100 Hz with a handful of threads.
+    """
+
+    def __init__(self, hz: float):
+        self.interval = 1.0 / max(hz, 1.0)
+        self.samples = 0
+        self.started_at = time.time()
+        self._stacks: Counter = Counter()
+        self._idle: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Sampler":
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._idle.clear()
+            self.samples = 0
+            self.started_at = time.time()
+
+    def _loop(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    leaf = frame.f_code
+                    idle = (leaf.co_filename.replace("\\", "/").rsplit("/", 1)[-1], leaf.co_name) in _IDLE_LEAVES
+                    stack = []
+                    while frame is not None and len(stack) < MAX_DEPTH:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(f"thread:{names.get(ident, ident)}")
+                    key = ";".join(reversed(stack))
+                    counts = self._idle if idle else self._stacks
+                    if key in counts or len(counts) < MAX_STACKS:
+                        counts[key] += 1
+                    else:
+                        counts["[other]"] += 1
+
+    def folded(self, include_idle: bool = False) -> str:
+        with self._lock:
+            counts = self._stacks + self._idle if include_idle else Counter(self._stacks)
+        return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+class MemoryTracker:
+    """tracemalloc snapshots, each compared with the one before to show what grew."""
+
+    def __init__(self, frames: int):
+        self.frames = max(1, frames)
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info("tracemalloc_started frames=%s", self.frames)
+
+    def report(self, limit: int, group_by: str) -> Dict[str, Any]:
+        started = not tracemalloc.is_tracing()
+        self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        previous, self._previous = self._previous, snapshot
+
+        def line(stat: Any) -> Dict[str, Any]:
+            return {
+                "where": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+                **({"size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+                   if hasattr(stat, "size_diff") else {}),
+            }
+
+        return {
+            "tracing_started_now": started,
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [line(s) for s in snapshot.statistics(group_by)[:limit]],
+            # Since the previous GET /debug/memory; repeat under steady load and look for steady growth
+            "growth": [line(s) for s in snapshot.compare_to(previous, group_by)[:limit]] if previous else None,
+        }
+
+
+def install_profiling(app: FastAPI, stores: Dict[str, Callable[[], int]]) -> None:
+    """Add the per-request toggle, the always-on sampler and the /debug routes to ``app``.
+
+    ``stores`` names the service's long-lived in-memory collections; their sizes are
+    reported next to the tracemalloc statistics.
+    """
+    sampler = Sampler(SAMPLE_HZ)
+    memory = MemoryTracker(TRACEMALLOC_FRAMES or 10)
+
+    def start() -> None:
+        sampler.start()
+        if TRACEMALLOC_FRAMES > 0:
+            memory.start()
+        logger.warning("profiling_enabled sample_hz=%s request_hz=%s", SAMPLE_HZ, REQUEST_HZ)
+
+    app.router.on_startup.append(start)
+    app.router.on_shutdown.append(sampler.stop)
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if request.query_params.get("profile") != "1" and request.headers.get("x-profile") != "1":
+            return await call_next(request)
+        # Samples every thread, so concurrent requests show up too; profile on a quiet server
+        one = Sampler(REQUEST_HZ).start()
+        t0 = time.perf_counter()
+        try:
+            response = await call_next(request)
+            # Drain the body so streamed replies are profiled to the end
+            async for _ in response.body_iterator:
+                pass
+        finally:
+            one.stop()
+        elapsed_ms = 1000.0 * (time.perf_counter() - t0)
+        logger.info("request_profiled path=%s ms=%.1f samples=%s", request.url.path, elapsed_ms, one.samples)
+        return PlainTextResponse(
+            one.folded(include_idle=request.query_params.get("idle") == "1"),
+            headers={
+                "X-Profile-Status": str(response.status_code),
+                "X-Profile-Ms": f"{elapsed_ms:.1f}",
+                "X-Profile-Samples": str(one.samples),
+            },
+        )
+
+    @app.get("/debug/profile", response_class=PlainTextResponse)
+    def dump_profile(idle: bool = False, reset: bool = False):
+        """Folded stacks from the always-on sampler since startup (or the last ``reset=true``)."""
+        body = sampler.folded(include_idle=idle)
+        headers = {"X-Profile-Samples": str(sampler.samples), "X-Profile-Since": f"{sampler.started_at:.0f}"}
+        if reset:
+            sampler.reset()
+        return PlainTextResponse(body, headers=headers)
+
+    @app.get("/debug/memory")
+    def memory_report(limit: int = 25, group_by: str = "lineno"):
+        """Top allocations by ``group_by`` (``lineno``, ``filename`` or ``traceback``) and growth since the last call."""
+        if group_by not in ("lineno", "filename", "traceback"):
+            raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+        report = memory.report(max(1, limit), group_by)
+        report["stores"] = {name: size() for name, size in stores.items()}
+        return report
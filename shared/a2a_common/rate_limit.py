@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_cassette import cassette_mode, record_completion, replay_completion
+
+
+logger = logging.getLogger("llm-rate-limit")
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call cannot get LLM quota within the configured max wait."""
+
+    def __init__(self, retry_after: float, snapshot: Dict[str, Any]):
+        super().__init__(f"LLM quota exhausted; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.snapshot = snapshot
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (0 if it is available now)."""
+        self._refill(now)
+        # Requests larger than the whole bucket are allowed once it is full.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class LlmRateLimiter:
+    """Requests/min and tokens/min buckets for one API key, served in priority order.
+
+    Waiters queue in a heap ordered by priority (higher first, FIFO among equals). Only the
+    head of the queue may draw from the buckets, so a burst of low-value calls cannot starve
+    a high-value deal that is about to hit its turn limit.
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float, max_wait_s: float):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_wait_s = max_wait_s
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int]] = []
+        self._seq = itertools.count()
+        self._waited_total = 0.0
+        self._granted = 0
+        self._throttled = 0
+
+    def acquire(self, est_tokens: int, priority: float = 0.0) -> None:
+        start = time.monotonic()
+        entry = (-priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._heap[0] == entry:
+                        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(est_tokens, now))
+                        if wait == 0.0:
+                            self.requests.take(1)
+                            self.tokens.take(est_tokens)
+                            self._granted += 1
+                            self._waited_total += now - start
+                            return
+                    else:
+                        wait = 0.05
+                    if now - start + wait > self.max_wait_s:
+                        self._throttled += 1
+                        raise RateLimitTimeout(max(wait, 1.0), self._snapshot_locked())
+                    self._cond.wait(timeout=min(wait, 0.25))
+            finally:
+                if entry in self._heap:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                self._cond.notify_all()
+
+    def record_usage(self, est_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the real usage of a completion is known."""
+        if actual_tokens is None:
+            return
+        with self._cond:
+            self.tokens.adjust(actual_tokens - est_tokens)
+
+    def penalize(self, retry_after: float) -> None:
+        """Drain the request bucket after an upstream 429 so queued callers back off too."""
+        with self._cond:
+            self.requests.tokens = -retry_after * self.requests.rate
+            self.requests.updated = time.monotonic()
+
+    def _snapshot_locked(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self.requests._refill(now)
+        self.tokens._refill(now)
+        return {
+            "key": self.name,
+            "queue_depth": len(self._heap),
+            "requests_available": round(max(self.requests.tokens, 0.0), 2),
+            "tokens_available": round(max(self.tokens.tokens, 0.0), 1),
+            "granted": self._granted,
+            "throttled": self._throttled,
+            "avg_wait_ms": round(1000.0 * self._waited_total / self._granted, 1) if self._granted else 0.0,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return self._snapshot_locked()
+
+
+_LIMITERS: Dict[str, LlmRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(key_env: str) -> LlmRateLimiter:
+    """Limiter for the API key held in ``key_env``, configured by ``<key_env>_RPM``/``_TPM``."""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key_env)
+        if limiter is None:
+            limiter = LlmRateLimiter(
+                key_env,
+                rpm=float(os.getenv(f"{key_env}_RPM", "30")),
+                tpm=float(os.getenv(f"{key_env}_TPM", "6000")),
+                max_wait_s=float(os.getenv("GROQ_LIMIT_MAX_WAIT_S", "15")),
+            )
+            _LIMITERS[key_env] = limiter
+        return limiter
+
+
+_CLIENTS: Dict[Tuple[str, str], Any] = {}
+
+
+def get_client(key_env: str) -> Any:
+    """Groq client for the API key held in ``key_env``, created on first use and then reused.
+
+    ``groq`` is imported here instead of at module load: it costs ~0.1 s of every cold start
+    and is not needed until the first LLM call. Reusing the client keeps its connection pool
+    warm across turns.
+    """
+    api_key = os.getenv(key_env) or "cassette-replay"
+    with _LIMITERS_LOCK:
+        client = _CLIENTS.get((key_env, api_key))
+        if client is None:
+            from groq import Groq
+
+            client = _CLIENTS[(key_env, api_key)] = Groq(api_key=api_key)
+        return client
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return chars // 4 + max_tokens
+
+
+def deal_priority(quantity: int, target_price: Optional[float], turns_used: int, turn_limit: int) -> float:
+    """Higher for bigger deals (quantity x target_price) and for sessions near their turn limit."""
+    value = max(quantity, 0) * (target_price or 0.0)
+    urgency = min(turns_used / turn_limit, 1.0) if turn_limit > 0 else 0.0
+    return math.log10(1.0 + value) + 4.0 * urgency
+
+
+def limited_completion(client: Any, key_env: str, priority: float = 0.0, **kwargs: Any) -> Any:
+    """``client.chat.completions.create`` behind the per-key limiter, retrying upstream 429s.
+
+    In cassette replay mode the recorded response is returned without touching the limiter
+    or the network; in record mode every real response is stored before it is returned.
+    """
+    mode = cassette_mode()
+    if mode == "replay":
+        return replay_completion(kwargs)
+    limiter = get_limiter(key_env)
+    est = estimate_tokens(kwargs.get("messages") or [], int(kwargs.get("max_tokens") or 0))
+    retries = int(os.getenv("GROQ_LIMIT_RETRIES", "2"))
+    for attempt in range(retries + 1):
+        limiter.acquire(est, priority)
+        try:
+            res = client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if getattr(e, "status_code", None) != 429:
+                raise
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after") or 2.0)
+            except ValueError:
+                retry_after = 2.0
+            limiter.penalize(retry_after)
+            logger.warning("upstream_429 key=%s attempt=%s retry_after=%s", key_env, attempt, retry_after)
+            if attempt == retries:
+                raise RateLimitTimeout(retry_after, limiter.snapshot())
+            continue
+        usage = getattr(res, "usage", None)
+        limiter.record_usage(est, getattr(usage, "total_tokens", None))
+        if mode == "record":
+            return record_completion(kwargs, res)
+        return res
+    raise RateLimitTimeout(2.0, limiter.snapshot())
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .rate_limit import get_limiter
+
+
+logger = logging.getLogger("speculation")
+
+# SPECULATE=1: after each counter, precompute this agent's decisions for the partner's likely next prices.
+# SPECULATE_CANDIDATES: prices tried per turn, in order: the partner's last price again, split the
+#   difference, that price one step toward us, one step away.
+# SPECULATE_STEP_PCT: that step, as a percent of the partner's last price.
+# SPECULATE_TOLERANCE: dollars an incoming price may differ from a candidate and still use its decision.
+# SPECULATE_WORKERS: threads computing speculative decisions, shared by every hosted agent.
+# SPECULATE_RESERVE_REQUESTS: LLM requests that must stay in the key's bucket; below it nothing is speculated.
+# SPECULATE_TTL_S: unused speculative decisions older than this are dropped.
+SPECULATE = os.getenv("SPECULATE", "0") == "1"
+CANDIDATES = int(os.getenv("SPECULATE_CANDIDATES", "3"))
+STEP_PCT = float(os.getenv("SPECULATE_STEP_PCT", "1.0"))
+TOLERANCE = float(os.getenv("SPECULATE_TOLERANCE", "1.0"))
+WORKERS = int(os.getenv("SPECULATE_WORKERS", "2"))
+RESERVE_REQUESTS = float(os.getenv("SPECULATE_RESERVE_REQUESTS", "5"))
+TTL_S = float(os.getenv("SPECULATE_TTL_S", "60"))
+# Below every real turn in the limiter queue, so speculation never delays one
+SPECULATIVE_PRIORITY = -100.0
+
+# Same price pattern the handlers parse incoming messages with
+PRICE_RE = re.compile(r"(\$|usd\s*)?(\d{3,5})(?:\.(\d{2}))?", re.IGNORECASE)
+
+
+class _Guess:
+    __slots__ = ("price", "future", "started", "finished")
+
+    def __init__(self, price: float):
+        self.price = price
+        self.future: Optional["Future[Dict[str, Any]]"] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+
+class Speculator:
+    """Precomputed next-turn decisions, keyed by (agent, task), used only when the guess was right.
+
+    After an agent counters, ``speculate`` asks the decider what it would answer if the
+    partner came back at a few likely prices, on a small pool of its own and at the lowest
+    limiter priority, and only while the LLM key has spare quota. ``take`` consumes the
+    task's guesses on the next real message: one within TOLERANCE of the real price whose
+    decision still holds at that price is served instead of a fresh LLM call; the rest are
+    thrown away. A hit that is still computing is waited for, which still saves the part
+    already done.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], Tuple[float, List[_Guess]]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self.stats = {"turns": 0, "skipped_budget": 0, "speculated": 0, "hits": 0, "misses": 0, "wasted": 0, "cancelled": 0, "expired": 0}
+        self._saved_s = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix="speculate")
+        return self._executor
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _discard(self, guesses: List[_Guess], keep: Optional[_Guess] = None) -> None:
+        for g in guesses:
+            if g is keep:
+                continue
+            if g.future.cancel():
+                self.stats["cancelled"] += 1
+                self._in_flight -= 1
+            else:
+                self.stats["wasted"] += 1
+
+    def _expire_locked(self, now: float) -> None:
+        for key in [k for k, (at, _) in self._pending.items() if now - at > TTL_S]:
+            _, guesses = self._pending.pop(key)
+            self.stats["expired"] += 1
+            self._discard(guesses)
+
+    def candidates(self, partner_price: float, our_price: float) -> List[float]:
+        toward = 1.0 if our_price > partner_price else -1.0
+        step = partner_price * STEP_PCT / 100.0
+        prices = []
+        for p in (partner_price, (partner_price + our_price) / 2.0, partner_price + toward * step, partner_price - toward * step):
+            p = round(p, 2)
+            if p not in prices:
+                prices.append(p)
+        return prices[: max(0, CANDIDATES)]
+
+    def speculate(
+        self,
+        agent: Any,
+        task_id: str,
+        case: Dict[str, Any],
+        price_key: str,
+        our_price: Any,
+        decide: Callable[..., Dict[str, Any]],
+    ) -> None:
+        """Start guesses for the partner's reply to ``our_price`` (``case`` is the turn just answered)."""
+        partner_price = case.get(price_key)
+        if not SPECULATE or not isinstance(our_price, (int, float)) or not isinstance(partner_price, (int, float)):
+            return
+        entry = agent.tasks.get(task_id) or {}
+        last = (entry.get("messages") or [None])[-1]
+        if not last or not PRICE_RE.search(last.get("content", "")):
+            return
+        prices = self.candidates(float(partner_price), float(our_price))
+        quota = get_limiter(agent.key_env).snapshot()
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            if (
+                not prices
+                or quota["queue_depth"] > 0
+                or quota["requests_available"] < RESERVE_REQUESTS + len(prices)
+                or self._in_flight + len(prices) > 2 * max(1, WORKERS) * max(1, CANDIDATES)
+            ):
+                self.stats["skipped_budget"] += 1
+                return
+            guesses = []
+            for price in prices:
+                guess = _Guess(price)
+                message = {**last, "content": PRICE_RE.sub(f"${price:.2f}", last["content"], count=1), "rationale": "", "transcript_response": ""}
+                guess_case = {
+                    **case,
+                    price_key: price,
+                    "partner_message": message["content"],
+                    "history_text": json.dumps((entry["messages"] + [message])[-4:]),
+                    "priority": SPECULATIVE_PRIORITY,
+                }
+                guess.future = self._pool().submit(self._run, guess, decide, guess_case)
+                guesses.append(guess)
+            self._in_flight += len(guesses)
+            self.stats["speculated"] += len(guesses)
+            old = self._pending.pop((agent.agent_id, task_id), None)
+            if old is not None:
+                self._discard(old[1])
+            self._pending[(agent.agent_id, task_id)] = (time.monotonic(), guesses)
+        logger.info("speculate task=%s agent=%s prices=%s", task_id, agent.agent_id, prices)
+
+    def _run(self, guess: _Guess, decide: Callable[..., Dict[str, Any]], case: Dict[str, Any]) -> Dict[str, Any]:
+        guess.started = time.monotonic()
+        try:
+            return decide(**case)
+        finally:
+            guess.finished = time.monotonic()
+            with self._lock:
+                self._in_flight -= 1
+
+    def _holds(self, decision: Dict[str, Any], guessed: float, price: float, sells: bool) -> bool:
+        """Whether a decision made for ``guessed`` is still sound for the real ``price``."""
+        action = (decision.get("action") or "").lower()
+        better = (lambda a, b: a >= b) if sells else (lambda a, b: a <= b)
+        if action == "accept":
+            # Never accept a price worse for us than the one the decision saw
+            return better(price, guessed)
+        if action == "counter":
+            counter = decision.get("price")
+            return isinstance(counter, (int, float)) and better(counter, price) and counter != price
+        return True
+
+    def take(self, agent: Any, task_id: str, price: Optional[float]) -> Optional[Dict[str, Any]]:
+        """The precomputed decision for this turn's real ``price``, or None to decide afresh."""
+        with self._lock:
+            pending = self._pending.pop((agent.agent_id, task_id), None)
+            if pending is None:
+                return None
+            self.stats["turns"] += 1
+            at, guesses = pending
+            match = None
+            if price is not None and time.monotonic() - at <= TTL_S:
+                close = [g for g in guesses if abs(g.price - price) <= TOLERANCE]
+                match = min(close, key=lambda g: abs(g.price - price)) if close else None
+            # Not started yet: it would take as long as a fresh call, so drop it too
+            if match is not None and not (match.future.running() or match.future.done()):
+                match = None
+            self._discard(guesses, keep=match)
+            if match is None:
+                self.stats["misses"] += 1
+        if match is None:
+            logger.info("speculation_miss task=%s price=%s guesses=%s", task_id, price, [g.price for g in guesses])
+            return None
+        asked = time.monotonic()
+        try:
+            decision = match.future.result(timeout=TTL_S)
+        except Exception:
+            decision = None
+        waited = time.monotonic() - asked
+        with self._lock:
+            if decision is None or not self._holds(decision, match.price, price, agent.sells):
+                self.stats["misses"] += 1
+                self.stats["wasted"] += 1
+                decision = None
+            else:
+                self.stats["hits"] += 1
+                saved = max(0.0, (match.finished or time.monotonic()) - (match.started or asked) - waited)
+                self._saved_s += saved
+        if decision is None:
+            logger.info("speculation_miss task=%s price=%s guessed=%s reason=stale_decision", task_id, price, match.price)
+            return None
+        logger.info("speculation_hit task=%s price=%s guessed=%s saved_ms=%.1f", task_id, price, match.price, 1000.0 * saved)
+        return decision
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            decided = self.stats["hits"] + self.stats["misses"]
+            return {
+                "enabled": SPECULATE,
+                **self.stats,
+                "in_flight": self._in_flight,
+                "pending_tasks": len(self._pending),
+                "hit_rate": round(self.stats["hits"] / decided, 3) if decided else None,
+                "saved_ms_total": round(1000.0 * self._saved_s, 1),
+                "saved_ms_per_hit": round(1000.0 * self._saved_s / self.stats["hits"], 1) if self.stats["hits"] else None,
+                "candidates": CANDIDATES,
+                "step_pct": STEP_PCT,
+                "tolerance": TOLERANCE,
+            }
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .catalog import Catalog
+
+
+logger = logging.getLogger("stock-ledger")
+
+# STOCK_FLUSH_INTERVAL_S: how often committed movements are written back to the catalog.
+# STOCK_RESERVATION_TTL_S: reservations with no outcome after this long are released.
+FLUSH_INTERVAL_S = float(os.getenv("STOCK_FLUSH_INTERVAL_S", "2"))
+RESERVATION_TTL_S = float(os.getenv("STOCK_RESERVATION_TTL_S", "900"))
+
+
+class StockLedger:
+    """Stock reservations and committed movements for one company, written back in batches.
+
+    ``sells=True`` (seller): a reservation holds quantity that other negotiations cannot
+    promise, ``reserve`` fails when the SKU would be oversold, and a commit lowers stock.
+    ``sells=False`` (buyer): reservations only track incoming quantity, and a commit raises
+    stock.
+
+    Commits are appended to a journal and applied to the CSV and compiled catalog every
+    ``FLUSH_INTERVAL_S`` in one rewrite, whatever the number of deals. On startup, journal
+    entries that were not yet applied are replayed into the pending batch.
+
+    Journal entries carry a sequence number. Before a batch's CSV is renamed into place, a
+    marker next to the journal records the batch's last sequence number and the new CSV's
+    (mtime_ns, size). Replay skips the entries the marker covers when the CSV on disk is that
+    file, so a crash between the rename and the journal cleanup never applies a batch twice.
+    Committed task ids are kept only until their batch is written back; repeated outcomes
+    and reservations after that are the caller's to refuse (org servers record each task's
+    outcome and never reserve for a settled task, see ``HostedAgent.settled``).
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        sells: bool,
+        journal_path: Path,
+        column: str = "stock",
+        flush_interval_s: float = FLUSH_INTERVAL_S,
+        reservation_ttl_s: float = RESERVATION_TTL_S,
+    ):
+        self.catalog = catalog
+        self.sells = sells
+        self.column = column
+        self.journal_path = journal_path
+        self.flush_interval_s = flush_interval_s
+        self.reservation_ttl_s = reservation_ttl_s
+        # task_id -> (sku, quantity, expires_at)
+        self.reservations: Dict[str, Tuple[str, int, float]] = {}
+        self.reserved: Dict[str, int] = {}
+        self.pending: Dict[str, int] = {}
+        # Batch being written back: still counted until the catalog reflects it
+        self.flushing: Dict[str, int] = {}
+        # task_id -> delta, for commits not yet written back (pending, then flushing)
+        self.committed: Dict[str, int] = {}
+        self.flushing_tasks: Dict[str, int] = {}
+        self._seq = 0
+        self.marker_path = journal_path.with_suffix(".applied")
+        self.stats = {"reservations": 0, "rejected": 0, "committed": 0, "released": 0, "expired": 0, "flushes": 0}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._replay_journal()
+
+    def _applied_seq(self) -> int:
+        """Last sequence number already in the CSV: the marker's, if the CSV is the file it describes."""
+        try:
+            marker = json.loads(self.marker_path.read_text(encoding="utf-8"))
+            stat = self.catalog.csv_path.stat()
+        except (OSError, ValueError):
+            return 0
+        self._seq = int(marker["seq"])
+        if (stat.st_mtime_ns, stat.st_size) == (marker["csv_mtime_ns"], marker["csv_size"]):
+            return self._seq
+        return 0
+
+    def _replay_journal(self) -> None:
+        # A leftover .flushing file means the process died mid-flush; its entries are
+        # replayed unless the marker shows their CSV rename already happened
+        applied = self._applied_seq()
+        lines = []
+        for path in (self.journal_path.with_suffix(".flushing"), self.journal_path):
+            if path.exists():
+                lines += path.read_text(encoding="utf-8").splitlines()
+        skipped = 0
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            seq = entry.get("seq")
+            if seq is not None:
+                self._seq = max(self._seq, int(seq))
+                if int(seq) <= applied:
+                    skipped += 1
+                    continue
+            self.pending[entry["sku"]] = self.pending.get(entry["sku"], 0) + int(entry["delta"])
+            self.committed[entry["task_id"]] = int(entry["delta"])
+        if self.pending or skipped:
+            logger.info("stock_journal_replayed skus=%s skipped_applied=%s", len(self.pending), skipped)
+
+    def _on_hand(self, sku: str) -> int:
+        row = self.catalog.get(sku) or {}
+        return int(row.get(self.column) or 0) + self.flushing.get(sku, 0) + self.pending.get(sku, 0)
+
+    def on_hand(self, sku: str) -> int:
+        """Catalog stock plus committed movements not yet written back."""
+        with self._lock:
+            return self._on_hand(sku)
+
+    def available(self, sku: str) -> int:
+        """Stock that can still be promised: on hand minus open reservations (seller only)."""
+        with self._lock:
+            return self._on_hand(sku) - (self.reserved.get(sku, 0) if self.sells else 0)
+
+    def reserve(self, task_id: str, sku: str, quantity: int) -> bool:
+        with self._lock:
+            if task_id in self.reservations or task_id in self.committed or task_id in self.flushing_tasks:
+                return True
+            if self.sells and self._on_hand(sku) - self.reserved.get(sku, 0) < quantity:
+                self.stats["rejected"] += 1
+                return False
+            self.reservations[task_id] = (sku, quantity, time.monotonic() + self.reservation_ttl_s)
+            self.reserved[sku] = self.reserved.get(sku, 0) + quantity
+            self.stats["reservations"] += 1
+            return True
+
+    def _drop(self, task_id: str) -> Optional[Tuple[str, int, float]]:
+        held = self.reservations.pop(task_id, None)
+        if held is not None:
+            sku, quantity, _ = held
+            self.reserved[sku] -= quantity
+            if not self.reserved[sku]:
+                del self.reserved[sku]
+        return held
+
+    def commit(self, task_id: str, sku: str, quantity: int) -> bool:
+        """Book a closed deal. Without a live reservation (e.g. after a restart or TTL expiry)
+        the seller re-checks availability first. Repeated commits for a task are no-ops."""
+        return self.commit_all([(task_id, sku, quantity)])
+
+    def commit_all(self, lines: List[Tuple[str, str, int]]) -> bool:
+        """Book a deal's ``(task_id, sku, quantity)`` lines together: all of them or, when the
+        seller cannot cover an unreserved line, none (their reservations stay held)."""
+        with self._lock:
+            lines = [line for line in lines if line[0] not in self.committed and line[0] not in self.flushing_tasks]
+            if self.sells:
+                unreserved: Dict[str, int] = {}
+                for task_id, sku, quantity in lines:
+                    if task_id not in self.reservations:
+                        unreserved[sku] = unreserved.get(sku, 0) + quantity
+                if any(self._on_hand(sku) - self.reserved.get(sku, 0) < qty for sku, qty in unreserved.items()):
+                    self.stats["rejected"] += 1
+                    return False
+            if not lines:
+                return True
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for task_id, sku, quantity in lines:
+                    self._drop(task_id)
+                    delta = -quantity if self.sells else quantity
+                    self.pending[sku] = self.pending.get(sku, 0) + delta
+                    self.committed[task_id] = delta
+                    self.stats["committed"] += 1
+                    self._seq += 1
+                    f.write(json.dumps({"seq": self._seq, "task_id": task_id, "sku": sku, "delta": delta}) + "\n")
+            return True
+
+    def release(self, task_id: str) -> bool:
+        with self._lock:
+            released = self._drop(task_id) is not None
+            if released:
+                self.stats["released"] += 1
+            return released
+
+    def expire(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            stale = [tid for tid, (_, _, expires_at) in self.reservations.items() if expires_at <= now]
+            for tid in stale:
+                self._drop(tid)
+            self.stats["expired"] += len(stale)
+        if stale:
+            logger.info("stock_reservations_expired count=%s", len(stale))
+        return len(stale)
+
+    def flush(self) -> int:
+        """Write pending movements to the catalog in one atomic rewrite; returns SKUs changed."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self.pending = self.pending, {}
+                self.flushing = batch
+                self.flushing_tasks, self.committed = self.committed, {}
+                batch_seq = self._seq
+                journal = self.journal_path.with_suffix(".flushing")
+                if batch and self.journal_path.exists():
+                    os.replace(self.journal_path, journal)
+            if not batch:
+                self._requeue_tasks()
+                return 0
+            try:
+                staged, changed = self.catalog.stage_deltas(self.column, batch)
+                self._write_marker(staged, batch_seq)
+                # Publishing and clearing ``flushing`` happen together, so no lookup counts the batch twice
+                with self._lock:
+                    self.catalog.swap_in(staged, self.column, batch)
+                    self.flushing = {}
+                    self.flushing_tasks = {}
+            except Exception:
+                logger.exception("stock_flush_failed skus=%s", len(batch))
+                self._requeue_tasks()
+                with self._lock:
+                    self.flushing = {}
+                    for sku, delta in batch.items():
+                        self.pending[sku] = self.pending.get(sku, 0) + delta
+                    # Put the unapplied entries back in front of anything journaled meanwhile
+                    if journal.exists():
+                        newer = self.journal_path.read_text(encoding="utf-8") if self.journal_path.exists() else ""
+                        journal.write_text(journal.read_text(encoding="utf-8") + newer, encoding="utf-8")
+                        os.replace(journal, self.journal_path)
+                return 0
+            journal.unlink(missing_ok=True)
+            self.stats["flushes"] += 1
+            logger.info("stock_flushed skus=%s rows=%s", len(batch), changed)
+            return len(batch)
+
+    def _requeue_tasks(self) -> None:
+        with self._lock:
+            self.committed = {**self.flushing_tasks, **self.committed}
+            self.flushing_tasks = {}
+
+    def _write_marker(self, staged: Path, seq: int) -> None:
+        # os.replace keeps the staged file's mtime, so this signature is the CSV's once renamed
+        stat = staged.stat()
+        tmp = self.marker_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"seq": seq, "csv_mtime_ns": stat.st_mtime_ns, "csv_size": stat.st_size}), encoding="utf-8")
+        os.replace(tmp, self.marker_path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval_s):
+            self.expire()
+            self.flush()
+
+    def start(self) -> "StockLedger":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stock-ledger", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "open_reservations": len(self.reservations),
+                "unflushed_commits": len(self.committed) + len(self.flushing_tasks),
+                "reserved": dict(self.reserved),
+                "pending": dict(self.pending),
+            }
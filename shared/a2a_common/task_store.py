@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from a2a_schemas import Task
+
+
+logger = logging.getLogger("agents")
+
+# Settled tasks are moved here, under the agent's tasks directory
+ARCHIVE = "archive"
+
+
+def save_task(task_id: str, entry: Dict[str, Any], tasks_dir: Path) -> None:
+    """Persist one task entry (task, messages, cached replies, settled outcome) with temp file + rename."""
+    task = entry.get("task")
+    payload = {
+        "task": task.model_dump() if task is not None else None,
+        "messages": entry.get("messages", []),
+        "replies": entry.get("replies", {}),
+        "outcome": entry.get("outcome"),
+    }
+    path = tasks_dir / f"{task_id}.json"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_entry(path: Path) -> Optional[Dict[str, Any]]:
+    """A persisted task entry with its Task rebuilt, or None when missing or unreadable."""
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning("task_unreadable path=%s", path)
+        return None
+    return {
+        "task": Task(**raw["task"]) if raw.get("task") else None,
+        "messages": raw.get("messages", []),
+        "replies": raw.get("replies", {}),
+        "outcome": raw.get("outcome"),
+    }
+
+
+def max_task_number(tasks_dir: Path) -> int:
+    """Highest N among persisted ``t-N`` tasks, archived ones included, from file names only."""
+    names = itertools.chain(tasks_dir.glob("t-*.json"), (tasks_dir / ARCHIVE).glob("t-*.json"))
+    return max((int(path.stem[2:]) for path in names if path.stem[2:].isdigit()), default=0)
+
+
+class TaskEntries(MutableMapping):
+    """An agent's task entries by id, read from ``tasks_dir`` on first use rather than all at startup.
+
+    Only tasks still in play stay in memory (``len`` and iteration cover those). ``settle``
+    drops a task whose outcome was saved and moves its file under ``archive/``; looking it up
+    again reads the archived file without keeping it, so a repeated outcome still gets the
+    first one's answer.
+    """
+
+    def __init__(self, tasks_dir: Path):
+        self.tasks_dir = tasks_dir
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Handlers run on the event loop and in the threadpool; one load per task
+        self._lock = threading.Lock()
+
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        entry = self._entries.get(task_id)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                entry = _read_entry(self.tasks_dir / f"{task_id}.json")
+                if entry is not None:
+                    self._entries[task_id] = entry
+        if entry is None:
+            entry = _read_entry(self.tasks_dir / ARCHIVE / f"{task_id}.json")
+        if entry is None:
+            raise KeyError(task_id)
+        return entry
+
+    def __setitem__(self, task_id: str, entry: Dict[str, Any]) -> None:
+        self._entries[task_id] = entry
+
+    def __delitem__(self, task_id: str) -> None:
+        del self._entries[task_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def settle(self, task_id: str) -> None:
+        """Evict a task whose outcome is saved and archive its file."""
+        self._entries.pop(task_id, None)
+        archive = self.tasks_dir / ARCHIVE
+        archive.mkdir(exist_ok=True)
+        try:
+            os.replace(self.tasks_dir / f"{task_id}.json", archive / f"{task_id}.json")
+        except FileNotFoundError:
+            pass
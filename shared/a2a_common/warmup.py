@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Tuple
+
+
+logger = logging.getLogger("warmup")
+
+# PREWARM: "background" (default) starts serving at once and warms in a thread, "blocking"
+# finishes warming before startup completes (ready means warm), "off" leaves it all to first use.
+PREWARM = os.getenv("PREWARM", "background").lower()
+
+
+def _run(steps: Tuple[Tuple[str, Callable[[], Any]], ...]) -> None:
+    for name, step in steps:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning("prewarm_failed step=%s", name, exc_info=True)
+            continue
+        logger.info("prewarm step=%s ms=%.1f", name, 1000.0 * (time.perf_counter() - t0))
+
+
+def prewarm(*steps: Tuple[str, Callable[[], Any]]) -> Callable[[], Awaitable[None]]:
+    """Startup hook running ``(name, fn)`` steps according to PREWARM; failures are only logged."""
+
+    async def hook() -> None:
+        if PREWARM == "off":
+            return
+        if PREWARM == "blocking":
+            await asyncio.to_thread(_run, steps)
+            return
+        threading.Thread(target=_run, args=(steps,), name="prewarm", daemon=True).start()
+
+    return hook
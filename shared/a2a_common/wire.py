@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: msgpack is then never offered or accepted
+    msgpack = None
+
+
+JSON_MEDIA = "application/json"
+MSGPACK_MEDIA = "application/msgpack"
+# Older clients still send the unregistered x- form
+_MSGPACK_ALIASES = (MSGPACK_MEDIA, "application/x-msgpack")
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def loads_json(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed (compact stdlib json otherwise)."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return encode(content, JSON_MEDIA)
+        return dumps_json(content)
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    media = (content_type or "").split(";", 1)[0].strip().lower()
+    return media in _MSGPACK_ALIASES
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """True when the client lists msgpack in Accept and this process can produce it."""
+    if msgpack is None or not accept:
+        return False
+    return any(is_msgpack(item) for item in accept.split(","))
+
+
+def encode(content: Any, media_type: str) -> bytes:
+    if isinstance(content, BaseModel):
+        if media_type == MSGPACK_MEDIA:
+            return msgpack.packb(content.model_dump(mode="json"), use_bin_type=True)
+        if orjson is None:
+            return content.model_dump_json().encode("utf-8")
+        # model_dump + orjson beats pydantic's own JSON writer on large transcripts
+        content = content.model_dump()
+    if media_type == MSGPACK_MEDIA:
+        return msgpack.packb(content, use_bin_type=True, default=str)
+    return dumps_json(content)
+
+
+def decode(body: bytes, content_type: Optional[str]) -> Any:
+    if is_msgpack(content_type):
+        if msgpack is None:
+            raise ValueError("msgpack body received but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return loads_json(body)
+
+
+def wire_response(
+    request: Request,
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Encode ``content`` as msgpack if the caller's Accept asks for it, else as JSON."""
+    media_type = MSGPACK_MEDIA if wants_msgpack(request.headers.get("accept")) else JSON_MEDIA
+    return Response(
+        content=encode(content, media_type),
+        status_code=status_code,
+        headers={**(headers or {}), "Vary": "Accept"},
+        media_type=media_type,
+    )
+
+
+def wire_body(model: Type[M]):
+    """FastAPI dependency that parses a JSON or msgpack request body into ``model``."""
+
+    async def parse(request: Request) -> M:
+        try:
+            data = decode(await request.body(), request.headers.get("content-type"))
+        except ValueError as e:
+            msg = str(e) or f"malformed {type(e).__name__}"
+            raise RequestValidationError([{"type": "value_error", "loc": ("body",), "msg": msg, "input": None}])
+        try:
+            return model.model_validate(data)
+        except ValidationError as e:
+            # Same error shape FastAPI produces for a declared body parameter
+            raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+    return parse
@@ -0,0 +1,14 @@
+from .models import (
+    LINE_DECISION,
+    LINE_ITEM,
+    LINE_OFFER,
+    Artifact,
+    Message,
+    MessageRequest,
+    Part,
+    Task,
+    TaskOutcome,
+    Transcript,
+    line_parts,
+)
+from .records import TranscriptRecord
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+
+class Part(BaseModel):
+    type: str
+    data: Union[Dict[str, Any], str]
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+    rationale: str = ""
+    transcript_response: str = ""
+    parts: List[Part] = Field(default_factory=list)
+
+
+# Part types of multi-SKU tasks: the order lines on the Task, the broker's per-line prices on
+# each turn, and each org's per-line answers on its reply
+LINE_ITEM = "line_item"
+LINE_OFFER = "line_offer"
+LINE_DECISION = "line_decision"
+
+
+class Task(BaseModel):
+    task_id: Optional[str] = None
+    subject: str
+    sku: str
+    quantity: int
+    target_price: Optional[float] = None
+    constraints: Dict[str, Any] = Field(default_factory=dict)
+    context: Dict[str, Any] = Field(default_factory=dict)
+    # Order lines as LINE_ITEM parts ({"line", "sku", "quantity", "target_price"}); when present,
+    # sku/quantity only summarise the order and each line is negotiated on its own
+    parts: List[Part] = Field(default_factory=list)
+
+    def line_items(self) -> List[Dict[str, Any]]:
+        return [p.data for p in self.parts if p.type == LINE_ITEM and isinstance(p.data, dict)]
+
+
+def line_parts(message: Message, kind: str) -> Dict[str, Dict[str, Any]]:
+    """A message's ``kind`` parts by line id."""
+    return {str(p.data["line"]): p.data for p in message.parts if p.type == kind and isinstance(p.data, dict) and "line" in p.data}
+
+
+class MessageRequest(BaseModel):
+    task_id: str
+    message: Message
+    # Broker-assigned id for this turn; a resent id returns the cached reply without an LLM call
+    message_id: Optional[str] = None
+
+
+class Artifact(BaseModel):
+    type: str
+    data: Dict[str, Any]
+
+
+class TaskOutcome(BaseModel):
+    # Broker's final word on a task: "accepted" (with the quote artifact), "rejected" or "expired"
+    status: str
+    artifact: Optional[Artifact] = None
+
+
+class Transcript(BaseModel):
+    session_id: Optional[str]
+    status: str
+    transcript: List[Message]
+    artifact: Optional[Artifact] = None
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Dict, Tuple, Union
+
+from .models import Message
+
+
+PartTuple = Tuple[str, Union[Dict[str, Any], str]]
+_NO_PARTS: Tuple[PartTuple, ...] = ()
+
+
+class TranscriptRecord:
+    """Compact in-memory transcript entry.
+
+    A pydantic ``Message`` carries a per-instance ``__dict__`` plus field-set and
+    private bookkeeping, and every ``Part`` is another model. Sessions keep their whole
+    transcript for their lifetime, so storage uses this slotted record instead: parts are
+    plain ``(type, data)`` tuples, roles are interned, and messages without parts share one
+    empty tuple. Convert with ``from_message``/``to_message`` at the API boundary.
+
+    Attributes mirror ``Message`` so code reading ``.role``/``.content`` works on either.
+    """
+
+    __slots__ = ("role", "content", "rationale", "transcript_response", "parts")
+
+    def __init__(
+        self,
+        role: str,
+        content: str,
+        rationale: str = "",
+        transcript_response: str = "",
+        parts: Tuple[PartTuple, ...] = _NO_PARTS,
+    ):
+        self.role = sys.intern(role)
+        self.content = content
+        self.rationale = rationale
+        self.transcript_response = transcript_response
+        self.parts = parts or _NO_PARTS
+
+    @classmethod
+    def from_message(cls, message: Message) -> "TranscriptRecord":
+        return cls(
+            message.role,
+            message.content,
+            message.rationale,
+            message.transcript_response,
+            tuple((p.type, p.data) for p in message.parts),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TranscriptRecord":
+        """Trusted input only (our own journal); untrusted data goes through ``Message`` first."""
+        return cls(
+            data["role"],
+            data["content"],
+            data.get("rationale", ""),
+            data.get("transcript_response", ""),
+            tuple((p["type"], p["data"]) for p in data.get("parts") or ()),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "rationale": self.rationale,
+            "transcript_response": self.transcript_response,
+            "parts": [{"type": t, "data": d} for t, d in self.parts],
+        }
+
+    def to_message(self) -> Message:
+        return Message.model_validate(self.to_dict())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TranscriptRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"TranscriptRecord(role={self.role!r}, content={self.content!r})"
@@ -0,0 +1,33 @@
+import json
+
+from a2a_common.agents import load_agents
+from a2a_common.task_store import save_task
+
+DEFAULTS = {"role": "seller", "data_file": "pricing.csv", "llm_key_env": "GROQ_API_KEY", "persona": None, "speaker": "Kumar"}
+
+
+def agent_dir(path, agent_id):
+    (path / "cards").mkdir(parents=True)
+    (path / "agent.config.json").write_text(json.dumps({"id": agent_id, "data_file": f"{agent_id}.csv"}), encoding="utf-8")
+    (path / "cards" / "agent.json").write_text(json.dumps({"id": agent_id, "name": agent_id}), encoding="utf-8")
+    return path
+
+
+def test_home_agent_card_advertises_the_root_endpoint(tmp_path):
+    agents = load_agents(agent_dir(tmp_path / "home", "kumar"), DEFAULTS, {}, True, [agent_dir(tmp_path / "other", "lee")])
+    card, _ = agents["kumar"].well_known_card("http://org2:8102/")
+    assert card["endpoint"] == "http://org2:8102"
+    card, _ = agents["lee"].well_known_card("http://org2:8102/")
+    assert card["endpoint"] == "http://org2:8102/agents/lee"
+
+
+def test_task_is_settled_once_its_outcome_is_recorded_even_after_archiving(tmp_path):
+    (agent,) = load_agents(agent_dir(tmp_path / "home", "kumar"), DEFAULTS, {}, True, []).values()
+    agent.tasks_dir.mkdir(parents=True)
+    agent.tasks["t-1"] = {"task": None, "messages": [], "replies": {}}
+    assert not agent.settled("t-1") and not agent.settled("t-2")
+    agent.tasks["t-1"]["outcome"] = {"body": {"ok": True}, "status_code": 200}
+    save_task("t-1", agent.tasks["t-1"], agent.tasks_dir)
+    agent.tasks.settle("t-1")
+    # The ledger has forgotten the commit once flushed; the archived outcome still refuses a reserve
+    assert agent.settled("t-1")
@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+
+import pytest
+
+from a2a_common.catalog import Catalog
+
+COLUMNS = {"sku": str, "stock": int, "unit_price": float}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    csv_path = tmp_path / "pricing.csv"
+    csv_path.write_text("sku,stock,unit_price\nA,10,100\nB,5,200\n", encoding="utf-8")
+    return Catalog(csv_path, COLUMNS)
+
+
+def closed(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_lookup_compiles_and_reads_db(catalog):
+    assert catalog.get("A") == {"sku": "A", "stock": 10, "unit_price": 100.0}
+    assert catalog.get("missing") is None
+    assert catalog.db_path.exists()
+
+
+def test_invalidate_closes_this_threads_connection_on_next_lookup(catalog):
+    catalog.get("A")
+    old = catalog._conn()
+    catalog.invalidate()
+    assert catalog.get("B")["stock"] == 5
+    assert closed(old)
+    assert list(catalog._conns.values()) == [catalog._conn()]
+
+
+def test_invalidate_closes_connections_of_exited_threads(catalog):
+    conns = []
+    worker = threading.Thread(target=lambda: (catalog.get("A"), conns.append(catalog._conn())))
+    worker.start()
+    worker.join()
+    assert not closed(conns[0])
+    catalog.invalidate()
+    assert closed(conns[0])
+    assert catalog._conns == {}
+
+
+def test_stage_and_swap_in_patch_csv_and_db(catalog):
+    catalog.get("A")
+    staged, changed = catalog.stage_deltas("stock", {"A": -3})
+    catalog.swap_in(staged, "stock", {"A": -3})
+    assert changed == 1
+    assert catalog.get("A")["stock"] == 7
+    assert "A,7,100" in catalog.csv_path.read_text(encoding="utf-8")
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from a2a_common.llm_batch import DecisionBatcher
+from a2a_common.rate_limit import RateLimitTimeout
+
+
+def run_batch(batch_fn, size=3):
+    """Submit ``size`` cases at once; returns (results or exceptions, single calls made)."""
+    singles = []
+
+    def single_fn(**case):
+        singles.append(case["n"])
+        return {"action": "accept", "n": case["n"]}
+
+    batcher = DecisionBatcher(single_fn, batch_fn, max_batch_size=size, max_wait_ms=2000)
+    results = [None] * size
+
+    def submit(n):
+        try:
+            results[n] = batcher.submit(n=n)
+        except Exception as e:
+            results[n] = e
+
+    threads = [threading.Thread(target=submit, args=(n,)) for n in range(size)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    return results, singles
+
+
+def test_batch_answers_every_case():
+    results, singles = run_batch(lambda cases: [{"action": "counter", "n": c["n"]} for c in cases])
+    assert sorted(r["n"] for r in results) == [0, 1, 2]
+    assert singles == []
+
+
+def test_malformed_batch_falls_back_to_single_calls():
+    results, singles = run_batch(lambda cases: cases[:1])
+    assert sorted(r["n"] for r in results) == [0, 1, 2]
+    assert sorted(singles) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("error", [RateLimitTimeout(3.0, {"requests": 0}), ConnectionError("groq down")])
+def test_quota_and_upstream_errors_reach_every_waiter_without_retries(error):
+    def batch_fn(cases):
+        raise error
+
+    results, singles = run_batch(batch_fn)
+    assert results == [error] * 3
+    assert singles == []
@@ -0,0 +1,49 @@
+import io
+import logging
+
+from a2a_common.log_setup import build_handler, lazy
+
+
+def log_through_queue(emit):
+    """Run ``emit(logger)`` through a queue handler; returns the written lines once drained."""
+    stream = io.StringIO()
+    handler, listener = build_handler("test", "test", stream)
+    logger = logging.getLogger("test-log-setup")
+    logger.propagate = False
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        emit(logger)
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+    return [line.split("[test] ", 1)[1] for line in stream.getvalue().splitlines()]
+
+
+def test_mutable_args_are_logged_as_they_were_at_the_call():
+    def emit(logger):
+        lines = {"L1": "open"}
+        logger.info("lines=%s ids=%r turn=%d", lines, ["t-1"], 3)
+        lines["L1"] = "agreed"
+
+    assert log_through_queue(emit) == ["lines={'L1': 'open'} ids=['t-1'] turn=3"]
+
+
+def test_mapping_args_are_formatted_in_the_caller():
+    def emit(logger):
+        state = {"status": "open"}
+        logger.info("status=%(status)s", state)
+        state["status"] = "settled"
+
+    assert log_through_queue(emit) == ["status=open"]
+
+
+def test_lazy_args_are_left_for_the_listener():
+    calls = []
+    handler, listener = build_handler("test", "test", io.StringIO())
+    listener.stop()
+    value = lazy(lambda: calls.append("formatted") or "warm")
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "state=%s task=%s", (value, "t-1"), None)
+    assert handler.prepare(record).args == (value, "t-1")
+    assert calls == []
+    assert record.getMessage() == "state=warm task=t-1"
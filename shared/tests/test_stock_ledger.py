@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from a2a_common.catalog import Catalog
+from a2a_common.stock_ledger import StockLedger
+
+COLUMNS = {"sku": str, "stock": int, "unit_price": float}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    csv_path = tmp_path / "pricing.csv"
+    csv_path.write_text("sku,stock,unit_price\nA,10,100\nB,5,200\n", encoding="utf-8")
+    return Catalog(csv_path, COLUMNS)
+
+
+def ledger(catalog, tmp_path, sells=True):
+    return StockLedger(catalog, sells=sells, journal_path=tmp_path / "state" / "stock-journal.jsonl", flush_interval_s=60)
+
+
+def test_seller_reservations_hold_stock(catalog, tmp_path):
+    seller = ledger(catalog, tmp_path)
+    assert seller.reserve("t-1", "A", 6)
+    assert not seller.reserve("t-2", "A", 6)
+    assert seller.available("A") == 4
+    assert seller.release("t-1")
+    assert seller.reserve("t-2", "A", 6)
+
+
+def test_commit_is_idempotent_and_flushed_to_csv(catalog, tmp_path):
+    seller = ledger(catalog, tmp_path)
+    seller.reserve("t-1", "A", 3)
+    assert seller.commit("t-1", "A", 3)
+    assert seller.commit("t-1", "A", 3)
+    assert seller.on_hand("A") == 7
+    assert seller.flush() == 1
+    assert catalog.get("A")["stock"] == 7
+    assert seller.committed == {} and seller.flushing_tasks == {}
+    assert not (tmp_path / "state" / "stock-journal.jsonl").exists()
+
+
+def test_buyer_commit_adds_stock(catalog, tmp_path):
+    buyer = ledger(catalog, tmp_path, sells=False)
+    buyer.reserve("t-1", "B", 50)
+    buyer.commit("t-1", "B", 50)
+    buyer.flush()
+    assert catalog.get("B")["stock"] == 55
+
+
+def test_commit_without_reservation_rechecks_stock(catalog, tmp_path):
+    seller = ledger(catalog, tmp_path)
+    assert not seller.commit("t-1", "B", 6)
+    assert seller.commit("t-2", "B", 5)
+
+
+def test_unflushed_commits_are_replayed(catalog, tmp_path):
+    ledger(catalog, tmp_path).commit("t-1", "A", 4)
+    restarted = ledger(catalog, tmp_path)
+    assert restarted.pending == {"A": -4}
+    assert restarted.commit("t-1", "A", 4)
+    restarted.flush()
+    assert catalog.get("A")["stock"] == 6
+
+
+def test_crash_after_csv_rename_is_not_replayed_twice(catalog, tmp_path):
+    seller = ledger(catalog, tmp_path)
+    seller.commit("t-1", "A", 4)
+    seller.flush()
+    # Died after the rename but before the journal cleanup: the batch is back on disk
+    flushing = tmp_path / "state" / "stock-journal.flushing"
+    flushing.write_text(json.dumps({"seq": 1, "task_id": "t-1", "sku": "A", "delta": -4}) + "\n", encoding="utf-8")
+    restarted = ledger(catalog, tmp_path)
+    assert restarted.pending == {}
+    assert restarted.commit("t-2", "A", 1)
+    assert json.loads((tmp_path / "state" / "stock-journal.jsonl").read_text(encoding="utf-8"))["seq"] == 2
+
+
+def test_crash_before_csv_rename_is_replayed(catalog, tmp_path):
+    seller = ledger(catalog, tmp_path)
+    seller.commit("t-1", "A", 4)
+    staged, _ = catalog.stage_deltas("stock", {"A": -4})
+    seller._write_marker(staged, 1)
+    staged.unlink()
+    restarted = ledger(catalog, tmp_path)
+    assert restarted.pending == {"A": -4}
+
+
+def test_commit_all_books_every_line_or_none(catalog, tmp_path):
+    seller = ledger(catalog, tmp_path)
+    seller.reserve("t-1/1", "A", 2)
+    assert not seller.commit_all([("t-1/1", "A", 2), ("t-1/2", "B", 6)])
+    assert seller.pending == {} and "t-1/1" in seller.reservations
+    assert seller.commit_all([("t-1/1", "A", 2), ("t-1/2", "B", 5)])
+    assert seller.pending == {"A": -2, "B": -5}
@@ -0,0 +1,30 @@
+from a2a_schemas import Task
+
+from a2a_common.task_store import TaskEntries, max_task_number, save_task
+
+TASK = Task(subject="Buy laptops", sku="MACBOOK-PRO-14", quantity=20, target_price=1789.0)
+
+
+def test_entries_load_on_first_lookup(tmp_path):
+    save_task("t-1", {"task": TASK, "messages": [{"role": "broker", "content": "quote"}]}, tmp_path)
+    save_task("t-7", {"task": TASK}, tmp_path)
+    tasks = TaskEntries(tmp_path)
+    assert len(tasks) == 0
+    assert tasks["t-1"]["task"] == TASK
+    assert tasks.get("t-1") is tasks["t-1"]
+    assert list(tasks) == ["t-1"]
+    assert tasks.get("t-2") is None and "t-2" not in tasks
+    assert max_task_number(tmp_path) == 7
+
+
+def test_settled_task_is_evicted_and_archived(tmp_path):
+    tasks = TaskEntries(tmp_path)
+    tasks["t-3"] = {"task": TASK, "messages": [], "replies": {}, "outcome": {"body": {"ok": True}, "status_code": 200}}
+    save_task("t-3", tasks["t-3"], tmp_path)
+    tasks.settle("t-3")
+    assert len(tasks) == 0
+    assert not (tmp_path / "t-3.json").exists()
+    # A repeated outcome still finds the first answer, without the entry staying resident
+    assert tasks["t-3"]["outcome"]["body"] == {"ok": True}
+    assert len(tasks) == 0
+    assert max_task_number(tmp_path) == 3